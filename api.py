@@ -1,33 +1,182 @@
-from src.solvers.sat_solver import SatSudokuValidator  # noqa
-from src.model.requests import SolveRequest, ValidateRequest
-from src.model.responses import SolveResponse, ValidateResponse
+import json
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager
+from typing import Annotated
+from src.service.batch import SolveBatch, parse_ndjson
+from src.service.parsing import BINARY_TYPE, read_request, request_body
+from src.service.profiling import PROFILE_HEADER, new_profile_path, requested_profile
+from src.service.executor import ExecutorOverloaded, get_executor, shutdown_executor
+from src.service.metrics import CONTENT_TYPE, get_metrics
+from src.service.negotiation import (
+    SolutionFormat,
+    accepts_gzip,
+    choose_format,
+    solution_response,
+)
+from src.service.tasks import count_solutions as count_task, list_solutions
+from src.service.solve import solve, solve_profiled
+from src.service.tasks import validate_puzzle
+from src.service.request_log import get_request_log
+from src.service.timing import RequestTiming
+from src.solvers.cache import get_cache
+from src.model.requests import CountRequest, SolveRequest, ValidateRequest
+from src.model.responses import (
+    CacheStatus,
+    CountResponse,
+    ExecutorStatus,
+    SolveResponse,
+    ValidateResponse,
+)
 
 import uvicorn
 
-from fastapi import FastAPI, HTTPException  # noqa
+from fastapi import FastAPI, Header, HTTPException, Request, Response  # noqa
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from src.model.grid import SudokuGrid  # noqa
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await get_executor().warm_up()
+    yield
+    shutdown_executor()
 
-@app.post("/solve", response_model=SolveResponse)
-def solve_sudoku(req: SolveRequest) -> SolveResponse:
-    puzzle = SudokuGrid.from_list(req.puzzle)
-    time_limit = req.time_limit
-    solver_type = req.solver
 
+app = FastAPI(lifespan=lifespan)
+
+
+class TimeRequests:
+    """
+    Times the phases of every request (see `RequestTiming`), the endpoints
+    add theirs to `request.state.timing`. The phases are sent back in the
+    `Server-Timing` header and written to the access log and, for a slow
+    request, to the slow requests log, see `get_request_log`.
+    A streamed body is not included in the time.
+
+    It's a plain ASGI middleware, as `@app.middleware("http")` hides
+    the client's disconnect from `Request.is_disconnected`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        scope.setdefault("state", {})["timing"] = timing
+        status = 500
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing.finish()
+                MutableHeaders(scope=message).append("Server-Timing", timing.header())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if "total" not in timing.phases:
+                timing.finish()
+            get_request_log().record(scope["method"], scope["path"], status, timing)
+
+
+app.add_middleware(TimeRequests)
+
+
+def overloaded(ex: ExecutorOverloaded) -> HTTPException:
+    """
+    Translates the executor's rejection into `503 Service Unavailable`.
+    """
+    return HTTPException(
+        status_code=503,
+        detail="OVERLOADED",
+        headers={"Retry-After": str(ex.retry_after)},
+    )
+
+
+@app.post(
+    "/solve",
+    response_model=SolveResponse,
+    openapi_extra={"requestBody": request_body(SolveRequest)},
+    responses={
+        200: {
+            "content": {
+                SolutionFormat.LINE.value: {},
+                SolutionFormat.BINARY.value: {},
+            }
+        },
+        406: {"description": "None of the accepted formats fits the solution"},
+    },
+)
+async def solve_sudoku(
+    request: Request,
+    accept: Annotated[str | None, Header()] = None,
+    accept_encoding: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Solves the puzzle. It's sent as a `SolveRequest` object, or as packed cells
+    (`application/octet-stream`) with the size in the `X-Sudoku-Size` header
+    and the options in the query string, see `read_request`.
+
+    The solution is sent as JSON unless the `Accept` header
+    prefers the single-line format (`text/plain`, grids up to 35x35)
+    or the packed cells (`application/octet-stream`), see `SolutionFormat`.
+    The body is gzipped if the client accepts it.
+    The solver is cancelled if the client disconnects before the answer.
+
+    If profiling is enabled (`SUDOKU_PROFILE_DIR`), a request with the
+    `X-Sudoku-Profile: pstats` (or `collapsed`) header is solved under
+    the profiler, bypassing the cache. The profile is stored in the directory
+    and its name is sent back in the same header, see `solve_profiled`.
+    """
+    timing: RequestTiming = request.state.timing
+    req = await read_request(request, SolveRequest, timing)
+    solution_format = choose_format(accept, req.grid.size)
+    if solution_format is None:
+        raise HTTPException(status_code=406, detail="NOT ACCEPTABLE")
+    headers: dict[str, str] = {}
     try:
-        result = solver_type.solve(puzzle, time_limit)
+        profile = requested_profile(request)
+        if profile is None:
+            result, solved_by = await solve(
+                req, timing=timing, disconnected=request.is_disconnected
+            )
+        else:
+            headers[PROFILE_HEADER], path = new_profile_path(profile)
+            binary = request.headers.get("content-type", "").startswith(BINARY_TYPE)
+            body = await request.body()
+            result, solved_by = await solve_profiled(
+                req,
+                body,
+                binary,
+                solution_format,
+                path,
+                timing,
+                disconnected=request.is_disconnected,
+            )
         if result is None:
-            raise HTTPException(status_code=400, detail="INFEASIBLE")
-        solved_as_list = result.to_list()
-        return SolveResponse(solution=solved_as_list)
+            raise HTTPException(status_code=400, detail="INFEASIBLE", headers=headers)
+        with timing.measure("serialize"):
+            response = solution_response(
+                result, solved_by, solution_format, accepts_gzip(accept_encoding)
+            )
+        response.headers.update(headers)
+        return response
+    except ExecutorOverloaded as ex:
+        raise overloaded(ex)
     except TimeoutError:
-        raise HTTPException(status_code=400, detail="TIMEOUT")
+        raise HTTPException(status_code=400, detail="TIMEOUT", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e), headers=headers)
 
     # TODO:
     # Solve the problem defined in the request.
@@ -49,11 +198,73 @@ def solve_sudoku(req: SolveRequest) -> SolveResponse:
     # raise NotImplementedError("not implemented yet")
 
 
-@app.post("/validate", response_model=ValidateResponse)
-def validate_sudoku(req: ValidateRequest) -> ValidateResponse:
-    sudoku = SudokuGrid.from_list(req.puzzle)
-    validator = SatSudokuValidator(sudoku)
-    return ValidateResponse(valid=validator.has_unique_solution())
+@app.post("/solve/batch")
+async def solve_batch(request: Request) -> StreamingResponse:
+    """
+    Solves many puzzles at once, in parallel.
+
+    The body is either a JSON list or an NDJSON stream
+    (`Content-Type: application/x-ndjson`) of the `BatchItem` objects.
+    The response is an NDJSON stream of `BatchResult` objects,
+    in the order the puzzles were solved. Use `index` or `id`
+    to match them with the input. A puzzle that can't be solved
+    (or even parsed) doesn't affect the rest of the batch.
+    """
+    batch = SolveBatch()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            async for item in parse_ndjson(request.stream()):
+                batch.submit(item)
+        else:
+            try:
+                body = json.loads(await request.body())
+            except ValueError:
+                raise HTTPException(
+                    status_code=400, detail="the body is not valid JSON"
+                )
+            if not isinstance(body, list):
+                raise HTTPException(
+                    status_code=400, detail="expected a list of puzzles"
+                )
+            for item in body:
+                batch.submit(item)
+    except BaseException:
+        batch.cancel()
+        raise
+
+    return StreamingResponse(batch.results(), media_type="application/x-ndjson")
+
+
+@app.post(
+    "/validate",
+    response_model=ValidateResponse,
+    openapi_extra={"requestBody": request_body(ValidateRequest)},
+)
+async def validate_sudoku(request: Request) -> Response:
+    """
+    Checks whether the puzzle has a unique solution.
+    The puzzle is sent as for `/solve`.
+    """
+    timing: RequestTiming = request.state.timing
+    req = await read_request(request, ValidateRequest, timing)
+    try:
+        executor = get_executor()
+        valid = await executor.run(
+            validate_puzzle,
+            req.grid,
+            time_limit=req.time_limit,
+            timing=timing,
+            disconnected=request.is_disconnected,
+        )
+        with timing.measure("serialize"):
+            body = ValidateResponse(valid=valid).model_dump_json()
+        return Response(body, media_type="application/json")
+    except ExecutorOverloaded as ex:
+        raise overloaded(ex)
+    except TimeoutError:
+        raise HTTPException(status_code=400, detail="TIMEOUT")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
     # TODO:
     # Check if the puzzle in the request is valid (has unique solution)
     # - build the SudokuGrid from the list representation
@@ -67,5 +278,98 @@ def validate_sudoku(req: ValidateRequest) -> ValidateResponse:
     # raise NotImplementedError("not implemented yet")
 
 
+@app.post(
+    "/count",
+    response_model=CountResponse,
+    openapi_extra={"requestBody": request_body(CountRequest)},
+)
+async def count_solutions(request: Request) -> Response:
+    """
+    Counts the solutions of the puzzle, up to `cap`.
+    The puzzle is sent as for `/solve`.
+    If `solutions` is positive, the response is NDJSON:
+    the first `solutions` solutions, one per line,
+    followed by a line with the count. The solutions are enumerated
+    in the shared executor either way.
+    """
+    timing: RequestTiming = request.state.timing
+    req = await read_request(request, CountRequest, timing)
+    try:
+        executor = get_executor()
+        if req.solutions > 0:
+            solutions, count, timed_out = await executor.run(
+                list_solutions,
+                req.grid,
+                req.cap,
+                req.solutions,
+                time_limit=req.time_limit,
+                timing=timing,
+                disconnected=request.is_disconnected,
+            )
+            return StreamingResponse(
+                _stream_solutions(solutions, count, req.cap, timed_out),
+                media_type="application/x-ndjson",
+            )
+        count = await executor.run(
+            count_task,
+            req.grid,
+            req.cap,
+            time_limit=req.time_limit,
+            timing=timing,
+            disconnected=request.is_disconnected,
+        )
+        with timing.measure("serialize"):
+            body = CountResponse(count=count, capped=count == req.cap).model_dump_json()
+        return Response(body, media_type="application/json")
+    except ExecutorOverloaded as ex:
+        raise overloaded(ex)
+    except TimeoutError:
+        raise HTTPException(status_code=400, detail="TIMEOUT")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _stream_solutions(
+    solutions: list[SudokuGrid], count: int, cap: int, timed_out: bool
+) -> Iterator[str]:
+    """
+    Yields NDJSON lines with the solutions and then the count.
+    If the time ran out while counting, the found solutions are followed
+    by a timeout line instead, as the status is already sent.
+    """
+    for solution in solutions:
+        yield SolveResponse(solution=solution.to_list()).model_dump_json() + "\n"
+    if timed_out:
+        yield json.dumps({"detail": "TIMEOUT"}) + "\n"
+        return
+    yield CountResponse(count=count, capped=count == cap).model_dump_json() + "\n"
+
+
+@app.get("/status", response_model=ExecutorStatus)
+async def executor_status() -> ExecutorStatus:
+    """
+    Reports the load of the solver processes, e.g. for autoscaling.
+    """
+    return get_executor().status()
+
+
+@app.get("/cache", response_model=CacheStatus)
+async def cache_status() -> CacheStatus:
+    """
+    Reports the size and the hit rate of the solution cache.
+    """
+    return get_cache().status()
+
+
+@app.get("/metrics", response_class=Response)
+async def metrics() -> Response:
+    """
+    Serves the counters of the solver runs (search nodes, backtracks,
+    phase times, ...) as histograms by the solver and the grid size,
+    in the Prometheus text format. Set `SUDOKU_STATS=0` to stop collecting them.
+    """
+    return Response(get_metrics().render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -1,15 +1,39 @@
 import argparse
+import contextlib
+import csv
+import json
+import multiprocessing
 import pathlib
+import resource
 import sys
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from collections.abc import Callable
+from multiprocessing.connection import Connection
+from typing import Any
+
+import numpy as np
+from src.solvers.dancing_links_pool import start_pool
+from src.solvers.sat_pool import MAX_WARM_SIZE, start_sat_pool
+from src.solvers.sat_solver import (
+    AtMostOneEncoding,
+    SatEncoding,
+    SatSudokuSolver,
+)
 from src.solvers.solver_type import SudokuSolverType
-from src.model.grid import SudokuGrid
+from src.solvers.stats import SolverStats
+from src.model.grid import LINE_DIGITS, SudokuGrid
+from src.utils.profiling import ProfileFormat, profiling
 from timeit import default_timer as timer
 
+CELL_SLACK = 10.0
+"""extra time (in seconds) a cell gets for starting up before it's killed"""
+
 
 def parse_arguments() -> argparse.Namespace:
     """
     Parses the command line arguments.
-    Run `python main.py -h` to learn about them.
+    Run `python benchmark.py -h` to learn about them.
 
     Returns
     --------
@@ -26,14 +50,98 @@ def parse_arguments() -> argparse.Namespace:
         dest="time_limit",
         type=float,
         default=60.0,
-        help="time limit for the each solver (in seconds)",
+        help="time limit for the each solver run (in seconds)",
     )
     arg_parser.add_argument(
         "--repetitions",
         "-r",
         type=int,
         default=10,
-        help="how many times do we repeat an experiment",
+        help="how many times every puzzle is solved by every solver",
+    )
+    arg_parser.add_argument(
+        "--warmup",
+        "-w",
+        type=int,
+        default=1,
+        help="how many runs before the measured ones are discarded",
+    )
+    arg_parser.add_argument(
+        "--solvers",
+        "-s",
+        type=SudokuSolverType,
+        nargs="+",
+        choices=list(SudokuSolverType),
+        default=list(SudokuSolverType),
+        help="solvers to be compared (default: all of them)",
+    )
+    arg_parser.add_argument(
+        "--presolve",
+        "-p",
+        action="store_true",
+        help="additionally run every solver after filling the naked and hidden singles",
+    )
+    arg_parser.add_argument(
+        "--dlx-workers",
+        dest="dlx_workers",
+        type=int,
+        default=None,
+        help="number of the dancing links worker processes (default: number of CPUs)",
+    )
+    arg_parser.add_argument(
+        "--json",
+        dest="json_path",
+        type=pathlib.Path,
+        default=None,
+        help="write the results to a JSON file, it can serve as a baseline later",
+    )
+    arg_parser.add_argument(
+        "--csv",
+        dest="csv_path",
+        type=pathlib.Path,
+        default=None,
+        help="write the results to a CSV file",
+    )
+    arg_parser.add_argument(
+        "--baseline",
+        type=pathlib.Path,
+        default=None,
+        help="JSON results of an earlier run to compare with",
+    )
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown of the median counted as a regression (default: 0.1)",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        default=None,
+        metavar="DIR",
+        help="profile the measured runs of every cell into DIR, "
+        "the profiler slows the runs down",
+    )
+    arg_parser.add_argument(
+        "--profile-format",
+        dest="profile_format",
+        type=ProfileFormat,
+        choices=list(ProfileFormat),
+        default=ProfileFormat.PSTATS,
+        help="with --profile, pstats or collapsed stacks for flame graphs "
+        "(default: pstats)",
+    )
+    arg_parser.add_argument(
+        "--sat-encodings",
+        dest="sat_encodings",
+        action="store_true",
+        help="compare the SAT encodings instead of the solvers",
+    )
+    arg_parser.add_argument(
+        "--text-formats",
+        dest="text_formats",
+        action="store_true",
+        help="measure parsing and rendering of the puzzles instead of solving them",
     )
     arg_parser.add_argument(
         "puzzle_paths",
@@ -47,48 +155,387 @@ def parse_arguments() -> argparse.Namespace:
 def get_puzzle(filepath: pathlib.Path) -> SudokuGrid:
     with open(filepath) as f:
         lines = f.readlines()
+    if len(lines) == 1 and "," not in lines[0]:
+        return SudokuGrid.from_line(lines[0])
     return SudokuGrid.from_text(lines)
 
 
-def main() -> int:
-    args = parse_arguments()
-    puzzles = [get_puzzle(puzzle_path) for puzzle_path in args.puzzle_paths]
-    results = {}
+def compare_sat_encodings(puzzle_paths: list[pathlib.Path], time_limit: float) -> None:
+    """
+    Prints size of the CNF, encoding time (loading the solver included)
+    and solving time for every SAT encoding option, every option
+    is encoded once.
 
-    for solver_type in SudokuSolverType:
-        try:
+    Parameters
+    -----------
+    puzzle_paths: list[pathlib.Path]
+        paths to the benchmark puzzles
+    time_limit: float
+        time limit for the each solver run (in seconds)
+    """
+    print("puzzle\tencoding\tredundant\tvariables\tclauses\tencode\tsolve")
+    for puzzle_path in puzzle_paths:
+        puzzle = get_puzzle(puzzle_path)
+        for at_most_one in AtMostOneEncoding:
+            for redundant in (False, True):
+                encoding = SatEncoding(at_most_one, redundant)
+                stats = SolverStats()
+                try:
+                    SatSudokuSolver.solve(puzzle, time_limit, encoding, stats=stats)
+                    solve_took = f"{stats.solve_time:.4f}"
+                except TimeoutError:
+                    solve_took = "timeout"
+                print(
+                    f"{puzzle_path.name}\t{at_most_one}\t{redundant}\t"
+                    f"{stats.variables}\t{stats.clauses}\t"
+                    f"{stats.encode_time:.4f}\t{solve_took}"
+                )
+
+
+def compare_text_formats(puzzle_paths: list[pathlib.Path], repetitions: int) -> None:
+    """
+    Prints the median time of parsing and rendering every puzzle
+    in the comma-separated, pretty and single-line formats.
+
+    Parameters
+    -----------
+    puzzle_paths: list[pathlib.Path]
+        paths to the benchmark puzzles
+    repetitions: int
+        how many times every operation is measured
+    """
+
+    def measure(operation: Callable[[], Any]) -> str:
+        times = []
+        for _ in range(repetitions):
             start = timer()
-            for puzzle, _ in zip(puzzles, range(args.repetitions)):
-                solution = solver_type.solve(puzzle, args.time_limit)
+            operation()
+            times.append(timer() - start)
+        return f"{np.median(times) * 1000:.3f}"
+
+    print("puzzle\tsize\tbytes\tfrom_text\tto_text\tstr\tfrom_line\tto_line")
+    for puzzle_path in puzzle_paths:
+        with open(puzzle_path) as f:
+            lines = f.readlines()
+        puzzle = SudokuGrid.from_text(lines)
+        from_line = to_line = "-"
+        if puzzle.size <= len(LINE_DIGITS):
+            line = puzzle.to_line()
+            from_line = measure(partial(SudokuGrid.from_line, line))
+            to_line = measure(puzzle.to_line)
+        print(
+            f"{puzzle_path.name}\t{puzzle.size}\t{sum(map(len, lines))}\t"
+            f"{measure(partial(SudokuGrid.from_text, lines))}\t"
+            f"{measure(puzzle.to_text)}\t{measure(puzzle.__str__)}\t"
+            f"{from_line}\t{to_line}"
+        )
+
+
+@dataclass
+class CellResult:
+    """
+    Outcome of benchmarking a single solver on a single puzzle.
+
+    Attributes:
+    -----------
+    puzzle: str
+        name of the puzzle file
+    solver: str
+        the solver, with `+presolve` suffix if the singles were filled first
+    status: str
+        - `ok` - all the runs found a solution
+        - `infeasible` - the solver found no solution
+        - `timeout` - a run exceeded the time limit
+        - `error` - the solver raised an exception
+        - `stuck` - the solver ignored the time limit and had to be killed
+    times: list[float]
+        durations (in seconds) of the measured runs that finished
+    nodes: int | None
+        number of the search nodes of the last run, if the solver counts them
+    max_rss_kib: int | None
+        peak resident memory of the process running the cell
+    detail: str | None
+        the error message, if any
+
+    Properties:
+    -----------
+    min: float | None
+        the fastest run
+    median: float | None
+        the median run
+    p95: float | None
+        the 95th percentile of the runs
+    """
+
+    puzzle: str
+    solver: str
+    status: str
+    times: list[float] = field(default_factory=list)
+    nodes: int | None = None
+    max_rss_kib: int | None = None
+    detail: str | None = None
+
+    @property
+    def min(self) -> float | None:
+        return min(self.times) if self.times else None
+
+    @property
+    def median(self) -> float | None:
+        return float(np.median(self.times)) if self.times else None
+
+    @property
+    def p95(self) -> float | None:
+        return float(np.percentile(self.times, 95)) if self.times else None
+
+    def to_dict(self) -> dict:
+        """
+        Returns the result together with the statistics, ready for JSON or CSV.
+        """
+        return asdict(self) | {"min": self.min, "median": self.median, "p95": self.p95}
+
+
+def _solve(
+    solver_type: SudokuSolverType,
+    puzzle: SudokuGrid,
+    time_limit: float,
+    presolve: bool,
+) -> tuple[SudokuGrid | None, int]:
+    """
+    Solves the puzzle, counting the search nodes (the decisions of the SAT solver).
+
+    Returns
+    --------
+    solution: SudokuGrid | None
+        the solution, `None` if it has not been found
+    nodes: int
+        number of the search nodes, `0` if the engine doesn't count them
+    """
+    stats = SolverStats()
+    solution = solver_type.solve(puzzle, time_limit, presolve, stats=stats)
+    return solution, stats.nodes
+
+
+def _run_cell(
+    connection: Connection,
+    puzzle: SudokuGrid,
+    solver_type: SudokuSolverType,
+    presolve: bool,
+    time_limit: float,
+    warmup: int,
+    repetitions: int,
+    dlx_workers: int | None,
+    profile_path: pathlib.Path | None = None,
+) -> None:
+    """
+    Benchmarks the solver on the puzzle, runs in a separate process.
+    Sends back `(status, times, nodes, max_rss_kib, detail)`.
+    The measured runs are profiled into `profile_path` if given.
+    """
+    if solver_type == SudokuSolverType.DANCING_LINKS:
+        start_pool(dlx_workers)
+    if solver_type == SudokuSolverType.SAT_INCREMENTAL and puzzle.size <= MAX_WARM_SIZE:
+        start_sat_pool([puzzle.size])
+    times: list[float] = []
+    nodes = None
+    status, detail = "ok", None
+    with contextlib.ExitStack() as profiler:
+        try:
+            for run in range(warmup + repetitions):
+                if run == warmup and profile_path is not None:
+                    profiler.enter_context(profiling(profile_path))
+                start = timer()
+                solution, nodes = _solve(solver_type, puzzle, time_limit, presolve)
+                took = timer() - start
                 if solution is None:
-                    results[solver_type] = "failure"
-            took = timer() - start
-            average_took = took / args.repetitions
-            results[solver_type] = average_took
+                    status = "infeasible"
+                    break
+                if run >= warmup:
+                    times.append(took)
         except TimeoutError:
-            results[solver_type] = "timeout"
-            continue
-        except Exception:
-            results[solver_type] = "failure"
-            continue
+            status = "timeout"
+        except Exception as ex:
+            status, detail = "error", str(ex)
 
-    good_results = sorted(
-        [
-            (solver, time)
-            for (solver, time) in results.items()
-            if isinstance(time, float)
-        ],
-        key=lambda r: r[1],
+    max_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connection.send((status, times, nodes, max_rss_kib, detail))
+
+
+def benchmark_cell(
+    puzzle_path: pathlib.Path,
+    solver_type: SudokuSolverType,
+    presolve: bool,
+    args: argparse.Namespace,
+) -> CellResult:
+    """
+    Benchmarks the solver on the puzzle in a fresh process,
+    so a stuck solver or a crash affects only this cell of the matrix,
+    and the memory is measured separately for every cell.
+
+    Parameters
+    -----------
+    puzzle_path: pathlib.Path
+        path to the benchmark puzzle
+    solver_type: SudokuSolverType
+        the solver to be measured
+    presolve: bool
+        whether to fill the naked and hidden singles first
+    args: argparse.Namespace
+        the command line arguments
+
+    Returns
+    --------
+    result: CellResult
+        timing, nodes and memory of the cell
+    """
+    label = f"{solver_type}+presolve" if presolve else str(solver_type)
+    result = CellResult(puzzle=puzzle_path.name, solver=label, status="stuck")
+    profile_path = None
+    if args.profile is not None:
+        args.profile.mkdir(parents=True, exist_ok=True)
+        name = f"{puzzle_path.stem}-{label}{args.profile_format.suffix}"
+        profile_path = args.profile / name
+    context = multiprocessing.get_context("forkserver")
+    connection, child = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_cell,
+        args=(
+            child,
+            get_puzzle(puzzle_path),
+            solver_type,
+            presolve,
+            args.time_limit,
+            args.warmup,
+            args.repetitions,
+            args.dlx_workers,
+            profile_path,
+        ),
     )
+    process.start()
+    child.close()
+
+    runs = args.warmup + args.repetitions
+    try:
+        if connection.poll(runs * args.time_limit + CELL_SLACK):
+            outcome = connection.recv()
+            result.status, result.times, result.nodes = outcome[:3]
+            result.max_rss_kib, result.detail = outcome[3:]
+            process.join(CELL_SLACK)
+    except EOFError:
+        result.status, result.detail = "error", "the benchmark process died"
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        connection.close()
+    return result
+
+
+def find_regressions(
+    results: list[CellResult], baseline: list[dict], threshold: float
+) -> list[str]:
+    """
+    Compares the results with the baseline.
+
+    A cell regressed if it succeeded in the baseline and doesn't anymore,
+    or its median is slower by more than `threshold` (relatively).
+    Cells missing from the baseline are ignored.
+
+    Parameters
+    -----------
+    results: list[CellResult]
+        the current results
+    baseline: list[dict]
+        the results of an earlier run, as written by `--json`
+    threshold: float
+        allowed relative slowdown of the median, e.g. `0.1` for 10%
+
+    Returns
+    --------
+    regressions: list[str]
+        descriptions of the regressed cells
+    """
+    previous = {(cell["puzzle"], cell["solver"]): cell for cell in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result.puzzle, result.solver))
+        if before is None or before["status"] != "ok":
+            continue
+        name = f"{result.puzzle} {result.solver}"
+        if result.status != "ok":
+            regressions.append(f"{name}: {result.status} (was ok)")
+        elif result.median > before["median"] * (1 + threshold):
+            regressions.append(
+                f"{name}: median {result.median:.4f}s (was {before['median']:.4f}s)"
+            )
+    return regressions
+
+
+def print_results(results: list[CellResult]) -> None:
+    """
+    Prints the benchmark matrix, one cell per line.
+    """
+
+    def seconds(value: float | None) -> str:
+        return "-" if value is None else f"{value:.4f}"
+
+    print("puzzle\tsolver\tstatus\truns\tmin\tmedian\tp95\tnodes\tmax_rss_kib")
+    for result in results:
+        print(
+            f"{result.puzzle}\t{result.solver}\t{result.status}\t{len(result.times)}\t"
+            f"{seconds(result.min)}\t{seconds(result.median)}\t{seconds(result.p95)}\t"
+            f"{'-' if result.nodes is None else result.nodes}\t"
+            f"{'-' if result.max_rss_kib is None else result.max_rss_kib}"
+        )
+
+
+def write_csv(results: list[CellResult], path: pathlib.Path) -> None:
+    """
+    Writes the results to a CSV file, the run times are separated by spaces.
+    """
+    rows = [result.to_dict() for result in results]
+    for row in rows:
+        row["times"] = " ".join(f"{took:.6f}" for took in row["times"])
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main() -> int:
+    args = parse_arguments()
+    if args.sat_encodings:
+        compare_sat_encodings(args.puzzle_paths, args.time_limit)
+        return 0
+    if args.text_formats:
+        compare_text_formats(args.puzzle_paths, args.repetitions)
+        return 0
+    if args.repetitions < 1:
+        print("at least one repetition is needed", file=sys.stderr)
+        return 2
+
+    variants = [(solver_type, False) for solver_type in args.solvers]
+    if args.presolve:
+        variants += [(solver_type, True) for solver_type in args.solvers]
+
+    results = []
+    for puzzle_path in args.puzzle_paths:
+        for solver_type, presolve in variants:
+            results.append(benchmark_cell(puzzle_path, solver_type, presolve, args))
+    print_results(results)
 
-    bad_results = [
-        (solver, msg) for (solver, msg) in results.items() if isinstance(msg, str)
-    ]
+    if args.json_path is not None:
+        with open(args.json_path, "w") as f:
+            json.dump([result.to_dict() for result in results], f, indent=2)
+    if args.csv_path is not None:
+        write_csv(results, args.csv_path)
 
-    for solver, result in bad_results:
-        print(f"{solver}: \t{result} sec")
-    for solver, msg in good_results:
-        print(f"{solver}: \t{msg}")
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
     return 0
 
 
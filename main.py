@@ -1,8 +1,22 @@
 import argparse
+import multiprocessing
+import os
 import pathlib
 import sys
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import numpy.typing as npt
+from src.model.corpus import Corpus, CorpusKind, Result, ResultStatus, ResultStore
+from src.service.metrics import SolverMetrics
+from src.solvers.dancing_links_pool import start_pool
+from src.solvers.sat_solver import AtMostOneEncoding, SatEncoding, SatSudokuValidator
 from src.solvers.solver_type import SudokuSolverType
-from src.model.grid import SudokuGrid
+from src.solvers.stats import SolverStats
+from src.model.grid import InconsistentGrid, SudokuGrid
+from src.utils.profiling import profiling
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -35,26 +49,390 @@ def parse_arguments() -> argparse.Namespace:
         default=60.0,
         help="time limit for the solver (in seconds)",
     )
+    arg_parser.add_argument(
+        "--presolve",
+        "-p",
+        action="store_true",
+        help="fill the naked and hidden singles before running the solver",
+    )
+    arg_parser.add_argument(
+        "--at-most-one",
+        dest="at_most_one",
+        type=AtMostOneEncoding,
+        choices=list(AtMostOneEncoding),
+        default=AtMostOneEncoding.PAIRWISE,
+        help="encoding of the at-most-one constraints used by the SAT solver",
+    )
+    arg_parser.add_argument(
+        "--redundant",
+        action="store_true",
+        help="add the redundant at-least-one clauses to the SAT encoding",
+    )
+    arg_parser.add_argument(
+        "--engines",
+        type=SudokuSolverType,
+        nargs="+",
+        choices=[engine for engine in SudokuSolverType if engine != "portfolio"],
+        default=None,
+        help="engines raced by the portfolio algorithm (default: SUDOKU_PORTFOLIO)",
+    )
+    arg_parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the counters of the solver (search nodes, backtracks, "
+        "phase times, ...) to stderr, with --output aggregated by the grid size",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        default=None,
+        metavar="FILE",
+        help="profile reading and solving (or counting) the puzzle into FILE, "
+        "collapsed stacks for flame graphs if it ends with .folded or .collapsed, "
+        "pstats otherwise",
+    )
+    arg_parser.add_argument(
+        "--count",
+        "-c",
+        type=int,
+        default=None,
+        metavar="CAP",
+        help="count the solutions (up to CAP) instead of solving the puzzle",
+    )
+    arg_parser.add_argument(
+        "--show",
+        type=int,
+        default=0,
+        metavar="K",
+        help="with --count, print the first K solutions found",
+    )
+    arg_parser.add_argument(
+        "--output",
+        "-o",
+        type=pathlib.Path,
+        default=None,
+        metavar="DIR",
+        help="solve all the puzzles of a corpus, a directory or a file with one "
+        "puzzle per line, the results are stored in DIR and a rerun resumes",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="with --output, number of the solver processes (default: number of CPUs)",
+    )
+    arg_parser.add_argument(
+        "--chunk-size",
+        dest="chunk_size",
+        type=int,
+        default=64,
+        help="with --output, number of the puzzles sent to a worker at once",
+    )
+    arg_parser.add_argument(
+        "--to-corpus",
+        dest="to_corpus",
+        type=pathlib.Path,
+        default=None,
+        metavar="CORPUS",
+        help="convert the puzzles to a binary corpus instead of solving them",
+    )
     arg_parser.add_argument(
         "puzzle_path",
         type=pathlib.Path,
-        help="path to the file containing a sudoku puzzle",
+        help="path to the file containing a sudoku puzzle "
+        "(or puzzles, see --output and --to-corpus)",
     )
     return arg_parser.parse_args()
 
 
-def get_puzzle(filepath: pathlib.Path) -> SudokuGrid:
+def get_puzzle(filepath: pathlib.Path, check: bool = True) -> SudokuGrid:
     with open(filepath) as f:
         lines = f.readlines()
-    return SudokuGrid.from_text(lines)
+    if len(lines) == 1 and "," not in lines[0]:
+        return SudokuGrid.from_line(lines[0], check)
+    return SudokuGrid.from_text(lines, check)
 
 
-def main() -> int:
-    args = parse_arguments()
-    puzzle = get_puzzle(args.puzzle_path)
+def iter_puzzles(path: pathlib.Path) -> Iterator[tuple[int, int, npt.NDArray]]:
+    """
+    Reads the puzzles one by one, the corpora are read through a memory map.
+    The puzzles are checked for repeated values only when they are solved.
+
+    Parameters
+    -----------
+    path: pathlib.Path
+        - a binary corpus
+        - a directory with the puzzle files, taken in the order of their names
+        - a text file with one puzzle per line in the single-line format
+
+    Returns
+    --------
+    puzzles: Iterator[tuple[int, int, npt.NDArray]]
+        the index of the puzzle, its size and the cells row by row
+    """
+    if path.is_dir():
+        files = sorted(child for child in path.iterdir() if child.is_file())
+        for index, file in enumerate(files):
+            puzzle = get_puzzle(file, check=False)
+            yield index, puzzle.size, puzzle.cells()
+    elif Corpus.is_corpus(path):
+        corpus = Corpus.open(path)
+        cells = corpus.records()["cells"]
+        for index in range(len(cells)):
+            yield index, corpus.size, cells[index]
+    else:
+        with open(path) as f:
+            lines = (line for line in f if line.strip())
+            for index, line in enumerate(lines):
+                puzzle = SudokuGrid.from_line(line, check=False)
+                yield index, puzzle.size, puzzle.cells()
+
 
+def convert_to_corpus(path: pathlib.Path, corpus_path: pathlib.Path) -> int:
+    """
+    Writes the puzzles into a new binary corpus, they have to be of the same size.
+    An existing file is not overwritten, a partially written one is removed.
+
+    Returns
+    --------
+    exit_code: int
+        `0` on success, `1` if there are no puzzles, they differ in size
+        or the corpus exists already
+    """
+    corpus = None
+    batch = []
     try:
-        solution = args.algorithm.solve(puzzle, args.time_limit)
+        for _, size, cells in iter_puzzles(path):
+            if corpus is None:
+                corpus = Corpus.create(corpus_path, size, CorpusKind.PUZZLES)
+            if size != corpus.size:
+                raise ValueError(
+                    f"a corpus holds puzzles of a single size, got {size}x{size}"
+                )
+            batch.append(cells)
+            if len(batch) == 4096:
+                append_puzzles(corpus, batch)
+        if corpus is None:
+            print("no puzzles found")
+            return 1
+        append_puzzles(corpus, batch)
+    except FileExistsError:
+        print(f"{corpus_path} exists already")
+        return 1
+    except BaseException as ex:
+        # a partial corpus would only stand in the way of the next attempt
+        if corpus is not None:
+            corpus_path.unlink(missing_ok=True)
+        if isinstance(ex, ValueError):
+            print(ex)
+            return 1
+        raise
+    print(len(corpus))
+    return 0
+
+
+def append_puzzles(corpus: Corpus, batch: list[npt.NDArray]) -> None:
+    """
+    Appends the puzzles to the corpus and empties the batch.
+    """
+    records = corpus.new_records(len(batch))
+    for position, cells in enumerate(batch):
+        records["cells"][position] = cells
+    corpus.append(records)
+    batch.clear()
+
+
+def solve_chunk(
+    chunk: list[tuple[int, int, npt.NDArray]],
+    algorithm: SudokuSolverType,
+    time_limit: float,
+    presolve: bool,
+    encoding: SatEncoding,
+    measure: bool = False,
+) -> tuple[list[Result], SolverMetrics | None]:
+    """
+    Solves a chunk of the puzzles one after another, runs in a worker process.
+
+    Returns
+    --------
+    results: list[Result]
+        the outcome of every puzzle of the chunk
+    metrics: SolverMetrics | None
+        counters of the runs, only if `measure` is set
+    """
+    results: list[Result] = []
+    metrics = SolverMetrics() if measure else None
+    for index, size, cells in chunk:
+        stats = SolverStats() if measure else None
+        try:
+            puzzle = SudokuGrid(np.asarray(cells).reshape(size, size))
+            solution = algorithm.solve(puzzle, time_limit, presolve, encoding, stats)
+        except InconsistentGrid:
+            results.append((index, size, ResultStatus.INFEASIBLE, None))
+            continue
+        except TimeoutError:
+            results.append((index, size, ResultStatus.TIMEOUT, None))
+        except Exception:
+            results.append((index, size, ResultStatus.ERROR, None))
+        else:
+            if solution is None:
+                results.append((index, size, ResultStatus.INFEASIBLE, None))
+            else:
+                results.append((index, size, ResultStatus.SOLVED, solution.cells()))
+        if metrics is not None and stats is not None:
+            outcome = results[-1][2].name.lower()
+            metrics.record(algorithm, size, outcome, stats)
+    return results, metrics
+
+
+def _init_solver(dlx: bool) -> None:
+    """
+    Prepares a solver process of the stream: dancing links runs
+    in its own process, one per solver process is enough.
+    """
+    if dlx:
+        start_pool(1)
+
+
+def solve_stream(args: argparse.Namespace) -> int:
+    """
+    Solves all the puzzles from `args.puzzle_path` in a pool of processes.
+    The results are stored as soon as a chunk is solved, the puzzles
+    solved by a previous (e.g. interrupted) run are skipped.
+
+    Returns
+    --------
+    exit_code: int
+        `0` on success, `1` if a solver process died, `130` if interrupted
+    """
+    store = ResultStore(args.output)
+    encoding = SatEncoding(args.at_most_one, args.redundant)
+    settings = (args.algorithm, args.time_limit, args.presolve, encoding, args.stats)
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_solver,
+        initargs=(args.algorithm == SudokuSolverType.DANCING_LINKS,),
+    )
+
+    pending: set[Future] = set()
+    skipped = 0
+    metrics = SolverMetrics()
+
+    def collect() -> None:
+        nonlocal pending
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        broken = None
+        for future in finished:
+            try:
+                results, chunk_metrics = future.result()
+            except BrokenProcessPool as ex:
+                # the other chunks are stored first, so they aren't solved again
+                broken = ex
+                continue
+            store.write(results)
+            if chunk_metrics is not None:
+                metrics.merge(chunk_metrics)
+        if broken is not None:
+            raise broken
+
+    try:
+        chunk = []
+        for index, size, cells in iter_puzzles(args.puzzle_path):
+            if store.done(index):
+                skipped += 1
+                continue
+            chunk.append((index, size, np.array(cells)))
+            if len(chunk) < args.chunk_size:
+                continue
+            if len(pending) >= 2 * args.workers:
+                collect()
+            pending.add(pool.submit(solve_chunk, chunk, *settings))
+            chunk = []
+        if chunk:
+            pending.add(pool.submit(solve_chunk, chunk, *settings))
+        while pending:
+            collect()
+    except KeyboardInterrupt:
+        print("interrupted, run again to resume", file=sys.stderr)
+        return 130
+    except BrokenProcessPool:
+        print("a solver process died, run again to resume", file=sys.stderr)
+        return 1
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    print(f"skipped (done before)\t{skipped}")
+    for status, count in store.counts().items():
+        print(f"{status.name.lower()}\t{count}")
+    if args.stats:
+        print(metrics.summary(), file=sys.stderr)
+    return 0
+
+
+def count_solutions(puzzle: SudokuGrid, cap: int, shown: int, time_limit: float) -> int:
+    """
+    Prints the first `shown` solutions and the number of solutions (up to `cap`).
+
+    Returns
+    --------
+    exit_code: int
+        `0` on success, `2` on timeout
+    """
+    validator = SatSudokuValidator(puzzle, time_limit)
+    count = 0
+    try:
+        for solution in validator.solutions(cap):
+            if count < shown:
+                print(solution)
+            count += 1
+    except TimeoutError:
+        print("TIMEOUT")
+        return 2
+
+    print(f">={count}" if count == cap else count)
+    return 0
+
+
+def print_stats(stats: SolverStats) -> None:
+    """
+    Prints the counters of a single run to stderr, one per line.
+    """
+    for name, value in stats.items():
+        shown = f"{value:.6f}" if isinstance(value, float) else value
+        print(f"{name}\t{shown}", file=sys.stderr)
+
+
+def solve_single(args: argparse.Namespace) -> int:
+    """
+    Solves (or counts the solutions of) the puzzle from `args.puzzle_path`
+    and prints the outcome.
+
+    Returns
+    --------
+    exit_code: int
+        - `0` if solved
+        - `1` if infeasible
+        - `2` on timeout
+    """
+    try:
+        puzzle = get_puzzle(args.puzzle_path)
+    except InconsistentGrid as ex:
+        print(ex, file=sys.stderr)
+        print("INFEASIBLE")
+        return 1
+    if args.count is not None:
+        return count_solutions(puzzle, args.count, args.show, args.time_limit)
+
+    stats = SolverStats() if args.stats else None
+    try:
+        encoding = SatEncoding(args.at_most_one, args.redundant)
+        solution, engine = args.algorithm.solve_by_engine(
+            puzzle, args.time_limit, args.presolve, encoding, args.engines, stats
+        )
+        if args.algorithm == SudokuSolverType.PORTFOLIO:
+            print(f"solved by {engine}", file=sys.stderr)
 
         if solution is None:
             print("INFEASIBLE")
@@ -62,10 +440,30 @@ def main() -> int:
     except TimeoutError:
         print("TIMEOUT")
         return 2
+    finally:
+        if stats is not None:
+            print_stats(stats)
 
     print(solution)
     return 0
 
 
+def main() -> int:
+    args = parse_arguments()
+    if args.profile is not None and (
+        args.output is not None or args.to_corpus is not None
+    ):
+        print("--profile works with a single puzzle only", file=sys.stderr)
+        return 2
+    if args.to_corpus is not None:
+        return convert_to_corpus(args.puzzle_path, args.to_corpus)
+    if args.output is not None:
+        return solve_stream(args)
+    if args.profile is not None:
+        with profiling(args.profile):
+            return solve_single(args)
+    return solve_single(args)
+
+
 if __name__ == "__main__":
     sys.exit(main())
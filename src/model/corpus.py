@@ -0,0 +1,367 @@
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+import numpy as np
+import numpy.typing as npt
+from src.model.grid import SudokuGrid
+
+MAGIC = b"SDKC"
+VERSION = 1
+HEADER = np.dtype(
+    [
+        ("magic", "S4"),
+        ("version", "u1"),
+        ("kind", "u1"),
+        ("reserved", "V2"),
+        ("size", "<u2"),
+        ("padding", "V6"),
+    ]
+)
+"""the 16 bytes at the beginning of every corpus file"""
+
+
+class CorpusKind(IntEnum):
+    """
+    Type of the records stored in a corpus.
+    """
+
+    PUZZLES = 0
+    RESULTS = 1
+
+
+class ResultStatus(IntEnum):
+    """
+    Outcome of solving a puzzle of a corpus, as stored in the results.
+    """
+
+    SOLVED = 1
+    INFEASIBLE = 2
+    TIMEOUT = 3
+    ERROR = 4
+
+
+Result = tuple[int, int, ResultStatus, npt.NDArray | None]
+"""index of the puzzle, its size, the status and the cells of the solution"""
+
+
+@dataclass(frozen=True, slots=True)
+class Corpus:
+    """
+    A binary file with many puzzles (or solutions) of the same size.
+
+    The file starts with a 16-byte header (magic `SDKC`, version, kind, size),
+    followed by fixed-width records. A record of puzzles holds the cells
+    row by row, one byte each (two little-endian bytes for grids larger than
+    255x255). A record of results is prefixed by the index of the puzzle
+    (8 bytes) and the `ResultStatus` (1 byte). The records are only appended,
+    so the file can be read through `np.memmap` while it grows.
+
+    Attributes:
+    -----------
+    path: Path
+        path to the file
+    size: int
+        size of the grids, e.g. `9` for the classical sudoku
+    kind: CorpusKind
+        whether the records are puzzles or results
+
+    Properties:
+    -----------
+    record_dtype: np.dtype
+        structured dtype of a single record
+
+    Methods:
+    --------
+    __len__() -> int:
+        returns the number of the complete records
+    records() -> npt.NDArray:
+        returns a read-only memory map of the records
+    new_records(count: int) -> npt.NDArray:
+        returns zeroed records to be filled and appended
+    append(records: npt.NDArray) -> None:
+        appends the records at the end of the file
+    to_grid(cells: npt.NDArray) -> SudokuGrid:
+        turns the cells of a record into a grid
+
+    Static Methods:
+    ---------------
+    create(path: Path, size: int, kind: CorpusKind) -> Corpus:
+        creates an empty corpus
+    open(path: Path) -> Corpus:
+        opens an existing corpus
+    is_corpus(path: Path) -> bool:
+        checks whether the file is a corpus
+    """
+
+    path: Path
+    size: int
+    kind: CorpusKind
+
+    @property
+    def record_dtype(self) -> np.dtype:
+        cell_dtype = np.dtype("u1" if self.size <= 255 else "<u2")
+        cells = ("cells", cell_dtype, (self.size * self.size,))
+        if self.kind == CorpusKind.PUZZLES:
+            return np.dtype([cells])
+        return np.dtype([("index", "<u8"), ("status", "u1"), cells])
+
+    def __len__(self) -> int:
+        records_bytes = self.path.stat().st_size - HEADER.itemsize
+        return max(records_bytes, 0) // self.record_dtype.itemsize
+
+    def records(self) -> npt.NDArray:
+        """
+        Maps the complete records into memory, a torn record at the end
+        (e.g. after an interrupted append) is left out.
+
+        Returns
+        --------
+        records: npt.NDArray
+            a read-only structured array of the records
+        """
+        count = len(self)
+        if count == 0:
+            return np.empty(0, dtype=self.record_dtype)
+        return np.memmap(
+            self.path,
+            dtype=self.record_dtype,
+            mode="r",
+            offset=HEADER.itemsize,
+            shape=(count,),
+        )
+
+    def new_records(self, count: int) -> npt.NDArray:
+        """
+        Returns zeroed records to be filled and appended.
+
+        Parameters
+        -----------
+        count: int
+            number of the records
+
+        Returns
+        --------
+        records: npt.NDArray
+            a structured array of the records
+        """
+        return np.zeros(count, dtype=self.record_dtype)
+
+    def append(self, records: npt.NDArray) -> None:
+        """
+        Appends the records at the end of the file.
+        A torn record left by an interrupted append is overwritten.
+
+        Parameters
+        -----------
+        records: npt.NDArray
+            a structured array of `record_dtype`
+        """
+        complete = HEADER.itemsize + len(self) * self.record_dtype.itemsize
+        with open(self.path, "r+b") as f:
+            f.truncate(complete)
+            f.seek(complete)
+            f.write(records.astype(self.record_dtype, copy=False).tobytes())
+
+    def to_grid(self, cells: npt.NDArray) -> SudokuGrid:
+        """
+        Turns the cells of a record into a grid,
+        without copying them when the record is already in the grid's dtype.
+
+        Parameters
+        -----------
+        cells: npt.NDArray
+            the `cells` field of a record
+
+        Returns
+        --------
+        grid: SudokuGrid
+            a sudoku grid, read-only if the records are memory-mapped
+        """
+        return SudokuGrid(np.asarray(cells).reshape(self.size, self.size))
+
+    @staticmethod
+    def create(path: Path, size: int, kind: CorpusKind) -> Corpus:
+        """
+        Creates an empty corpus, an existing file is not overwritten.
+
+        Parameters
+        -----------
+        path: Path
+            path to the new file
+        size: int
+            size of the grids
+        kind: CorpusKind
+            whether the records are puzzles or results
+
+        Returns
+        --------
+        corpus: Corpus
+            the new corpus
+        """
+        header = np.zeros(1, dtype=HEADER)
+        header["magic"] = MAGIC
+        header["version"] = VERSION
+        header["kind"] = kind
+        header["size"] = size
+        with open(path, "xb") as f:
+            f.write(header.tobytes())
+        return Corpus(Path(path), size, kind)
+
+    @staticmethod
+    def open(path: Path) -> Corpus:
+        """
+        Opens an existing corpus.
+
+        Parameters
+        -----------
+        path: Path
+            path to the file
+
+        Returns
+        --------
+        corpus: Corpus
+            the corpus stored in the file
+        """
+        with open(path, "rb") as f:
+            raw = f.read(HEADER.itemsize)
+        if len(raw) < HEADER.itemsize or not raw.startswith(MAGIC):
+            raise ValueError(f"{path} is not a sudoku corpus")
+        header = np.frombuffer(raw, dtype=HEADER)[0]
+        if header["version"] != VERSION:
+            raise ValueError(f"unsupported corpus version {header['version']}")
+        return Corpus(Path(path), int(header["size"]), CorpusKind(header["kind"]))
+
+    @staticmethod
+    def is_corpus(path: Path) -> bool:
+        """
+        Checks whether the file is a corpus.
+
+        Parameters
+        -----------
+        path: Path
+            path to the file
+
+        Returns
+        --------
+        is_corpus: bool
+            `True` if the file starts with the corpus magic
+        """
+        if not os.path.isfile(path):
+            return False
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+
+
+class ResultStore:
+    """
+    Results of solving a stream of puzzles, kept in a directory
+    with a results corpus per grid size, e.g. `9x9.sdkc`.
+
+    The results are appended as soon as they are known,
+    so an interrupted run can be resumed: the puzzles with
+    a stored result (whatever the status) are not solved again.
+
+    Attributes:
+    -----------
+    directory: Path
+        the directory with the results corpora
+
+    Methods:
+    --------
+    done(index: int) -> bool:
+        checks whether the puzzle already has a result
+    write(results: list[Result]) -> None:
+        appends the results
+    counts() -> dict[ResultStatus, int]:
+        returns the number of the stored results per status
+    """
+
+    directory: Path
+    _corpora: dict[int, Corpus]
+    _done: npt.NDArray[np.bool_]
+    _counts: dict[ResultStatus, int]
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._corpora = {}
+        self._done = np.zeros(0, dtype=bool)
+        self._counts = {status: 0 for status in ResultStatus}
+        for path in sorted(self.directory.glob("*.sdkc")):
+            corpus = Corpus.open(path)
+            if corpus.kind != CorpusKind.RESULTS:
+                continue
+            self._corpora[corpus.size] = corpus
+            records = corpus.records()
+            self._mark(np.asarray(records["index"]))
+            statuses = np.bincount(records["status"], minlength=len(ResultStatus) + 1)
+            for status in ResultStatus:
+                self._counts[status] += int(statuses[status])
+
+    def _mark(self, indexes: npt.NDArray) -> None:
+        if indexes.size == 0:
+            return
+        needed = int(indexes.max()) + 1
+        if needed > self._done.size:
+            grown = np.zeros(max(needed, 2 * self._done.size), dtype=bool)
+            grown[: self._done.size] = self._done
+            self._done = grown
+        self._done[indexes] = True
+
+    def done(self, index: int) -> bool:
+        """
+        Checks whether the puzzle already has a result.
+
+        Parameters
+        -----------
+        index: int
+            position of the puzzle in the stream
+
+        Returns
+        --------
+        done: bool
+            `True` if the result is stored
+        """
+        return index < self._done.size and bool(self._done[index])
+
+    def write(self, results: list[Result]) -> None:
+        """
+        Appends the results, grouped by the grid size.
+
+        Parameters
+        -----------
+        results: list[Result]
+            the results of the puzzles
+        """
+        by_size: dict[int, list[Result]] = {}
+        for result in results:
+            by_size.setdefault(result[1], []).append(result)
+
+        for size, group in by_size.items():
+            corpus = self._corpora.get(size)
+            if corpus is None:
+                path = self.directory / f"{size}x{size}.sdkc"
+                corpus = Corpus.create(path, size, CorpusKind.RESULTS)
+                self._corpora[size] = corpus
+            records = corpus.new_records(len(group))
+            for position, (index, _, status, cells) in enumerate(group):
+                records["index"][position] = index
+                records["status"][position] = status
+                if cells is not None:
+                    records["cells"][position] = cells
+                self._counts[status] += 1
+            corpus.append(records)
+            self._mark(records["index"])
+
+    def counts(self) -> dict[ResultStatus, int]:
+        """
+        Returns the number of the stored results per status.
+
+        Returns
+        --------
+        counts: dict[ResultStatus, int]
+            the number of the results of every status
+        """
+        return dict(self._counts)
@@ -1,9 +1,115 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from enum import StrEnum, auto
+from functools import cache
 import math
 import numpy as np
 import numpy.typing as npt
-from src.utils.all_different import all_different_except  # noqa
+from src.utils.all_different import repeated_in_groups
+
+LINE_DIGITS = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+"""symbols of the values `1, 2, ...` in the single-line format"""
+
+_LINE_VALUES = np.full(256, 255, dtype=np.uint8)
+for _value, _symbol in enumerate(LINE_DIGITS, start=1):
+    _LINE_VALUES[ord(_symbol)] = _LINE_VALUES[ord(_symbol.lower())] = _value
+_LINE_VALUES[ord("0")] = _LINE_VALUES[ord(".")] = 0
+
+
+def cell_dtype(size: int) -> np.dtype:
+    """
+    Returns the smallest unsigned dtype holding the values of a grid,
+    i.e. `0` for the empty cells and `1, ..., size`.
+
+    Parameters
+    -----------
+    size: int
+        size of the grid, e.g. `9` for the classical sudoku
+
+    Returns
+    --------
+    dtype: np.dtype
+        `np.uint8` for grids up to 255x255, `np.uint16` otherwise
+    """
+    return np.dtype(np.uint8 if size <= np.iinfo(np.uint8).max else np.uint16)
+
+
+class Unit(StrEnum):
+    """
+    A group of cells holding distinct values.
+    """
+
+    ROW = auto()
+    COLUMN = auto()
+    BLOCK = auto()
+
+
+@dataclass(frozen=True, slots=True)
+class Conflict:
+    """
+    A value repeated within a unit of the grid.
+
+    Attributes:
+    -----------
+    unit: Unit
+        the kind of the unit
+    index: int
+        index of the row, the column or the block
+    value: int
+        the repeated value
+    """
+
+    unit: Unit
+    index: int
+    value: int
+
+    def __str__(self) -> str:
+        return f"value {self.value} repeats in {self.unit} {self.index}"
+
+
+class InconsistentGrid(ValueError):
+    """
+    Raised when values repeat within rows, columns or blocks of a grid.
+
+    Attributes:
+    -----------
+    conflicts: list[Conflict]
+        all the repeated values
+    """
+
+    conflicts: list[Conflict]
+
+    def __init__(self, conflicts: list[Conflict]) -> None:
+        super().__init__(conflicts)
+        self.conflicts = conflicts
+
+    def __str__(self) -> str:
+        return "; ".join(map(str, self.conflicts))
+
+
+@cache
+def _units(size: int) -> npt.NDArray[np.intp]:
+    """
+    Labels the cells with their units, numbered rows first,
+    then columns, then blocks.
+
+    Parameters
+    -----------
+    size: int
+        size of the grid
+
+    Returns
+    --------
+    units: npt.NDArray[np.intp]
+        an array of shape `(3, size, size)`, `units[k, r, c]` is the unit
+        of the `k`-th kind containing the cell `(r, c)`
+    """
+    block_size = math.isqrt(size)
+    rows, cols = np.indices((size, size))
+    blocks = (rows // block_size) * block_size + cols // block_size
+    units = np.stack([rows, size + cols, 2 * size + blocks])
+    units.flags.writeable = False
+    return units
 
 
 @dataclass(frozen=True, slots=True)
@@ -62,9 +168,10 @@ class SudokuGrid:
 
     Protected Attributes:
     ---------------------
-    _array: npt.NDArray[np.uint]
+    _array: npt.NDArray[np.unsignedinteger]
         Underlying representation of the grid.
-        Uses dtype=np.uint to ensure its values are non-negative integer numbers.
+        Uses the smallest unsigned dtype fitting the size (see `cell_dtype`),
+        other arrays are converted on construction. A 9x9 grid takes 81 bytes.
 
     Properties:
     -----------
@@ -75,7 +182,7 @@ class SudokuGrid:
 
     Methods:
     --------
-    __getitem__(coords: tuple[int, int]) -> np.uint:
+    __getitem__(coords: tuple[int, int]) -> np.unsignedinteger:
         returns a value at the given coordinates
     __setitem__(coords: tuple[int,int], value: int) -> None:
         puts a value in the given cell of the grid
@@ -83,18 +190,38 @@ class SudokuGrid:
         enumerates over the grid cells
     block_index(cell_row: int, cell_column: int) -> int:
         returns block index of the given cell
-    block(block_index: int) -> npt.NDArray[np.uint]
+    block(block_index: int) -> npt.NDArray[np.unsignedinteger]
         returns a block of the grid with the given index
+    cells() -> npt.NDArray[np.unsignedinteger]
+        returns a read-only flat view of the cells
+    conflicts() -> list[Conflict]
+        finds the values repeated within rows, columns or blocks
     copy() -> SudokuGrid:
         returns a copy of the grid
+    view() -> SudokuGrid:
+        returns a read-only grid sharing the cells
+    to_text() -> str:
+        returns the comma-separated textual representation
+    to_line(empty: str) -> str:
+        returns the single-line representation
+    to_bytes() -> bytes:
+        returns the packed binary representation
 
     Static Methods:
     ---------------
     from_text(lines: list[str]) -> SudokuGrid:
         creates the grid from a textual representation
+    from_line(line: str) -> SudokuGrid:
+        creates the grid from a single-line representation
+    from_cells(cells: npt.ArrayLike, size: int) -> SudokuGrid:
+        creates the grid from a flat array of the cells
+    from_bytes(data: bytes, size: int) -> SudokuGrid:
+        creates the grid from the packed binary representation
+    trusted(array: npt.NDArray[np.unsignedinteger]) -> SudokuGrid:
+        wraps an already checked array, skipping the checks
     """
 
-    _array: npt.NDArray[np.uint]
+    _array: npt.NDArray[np.unsignedinteger]
 
     def __post_init__(self) -> None:
         grid_shape = self._array.shape
@@ -108,11 +235,17 @@ class SudokuGrid:
         if not float(math.sqrt(size)).is_integer():
             raise ValueError("The grid-array should be divisible into blocks")
 
-        # TODO:
-        # - add checking whether values do not repeat in rows, columns or blocks
-        #   raise ValueError as always
-        # tip. use `all_different_except` from `src.utils.all_different`
-        pass
+        array = self._array
+        if array.size and (array.min() < 0 or array.max() > size):
+            raise ValueError("The grid-array values should be between 0 and the size")
+
+        dtype = cell_dtype(size)
+        if array.dtype != dtype:
+            object.__setattr__(self, "_array", array.astype(dtype))
+
+        conflicts = self.conflicts()
+        if conflicts:
+            raise InconsistentGrid(conflicts)
 
     @property
     def size(self) -> int:
@@ -178,18 +311,32 @@ class SudokuGrid:
         """
         return np.ndenumerate(self._array)
 
-    def flatten(self) -> npt.NDArray[np.uint]:
+    def flatten(self) -> npt.NDArray[np.unsignedinteger]:
         """
         Returns a 1D copy of the grid array.
         See: https://numpy.org/doc/2.2/reference/generated/numpy.ndarray.flatten.html
 
         Returns
         --------
-        flat_grid: npt.NDArray[np.uint]
+        flat_grid: npt.NDArray[np.unsignedinteger]
             a flat copy of the array
         """
         return self._array.flatten()
 
+    def cells(self) -> npt.NDArray[np.unsignedinteger]:
+        """
+        Returns the cells row by row without copying them,
+        for reading only, unlike `flatten`.
+
+        Returns
+        --------
+        cells: npt.NDArray[np.unsignedinteger]
+            a read-only flat view of the array
+        """
+        cells = self._array.reshape(-1)
+        cells.flags.writeable = False
+        return cells
+
     def block_index(self, cell_row: int, cell_column: int) -> int:
         """
         Returns a block index for a given cell.
@@ -211,7 +358,7 @@ class SudokuGrid:
         row_component = (cell_row // block_size) * block_size
         return col_component + row_component
 
-    def block(self, block_index: int) -> npt.NDArray[np.uint]:
+    def block(self, block_index: int) -> npt.NDArray[np.unsignedinteger]:
         """
         Returns a single block with a given index.
 
@@ -222,7 +369,7 @@ class SudokuGrid:
 
         Returns
         --------
-        block: npt.NDArray[np.uint]
+        block: npt.NDArray[np.unsignedinteger]
             a numpy array with values from the specified block
         """
         block_size = self.block_size
@@ -234,6 +381,28 @@ class SudokuGrid:
         col_to = col_from + block_size
         return self._array[row_from:row_to, col_from:col_to]
 
+    def conflicts(self) -> list[Conflict]:
+        """
+        Finds the values repeated within rows, columns or blocks,
+        the whole grid is checked in a single pass.
+
+        Returns
+        --------
+        conflicts: list[Conflict]
+            the repeated values ordered by the unit, empty for a consistent grid
+        """
+        size = self.size
+        given = self._array != 0
+        units, values = repeated_in_groups(
+            self._array[given], _units(size)[:, given], 3 * size, size + 1
+        )
+        kinds, indexes = np.divmod(units, size)
+        unit_kinds = list(Unit)
+        return [
+            Conflict(unit_kinds[kind], int(index), int(value))
+            for kind, index, value in zip(kinds, indexes, values)
+        ]
+
     def copy(self) -> SudokuGrid:
         """
         Creates copy of the grid.
@@ -243,7 +412,22 @@ class SudokuGrid:
         copy: SudokuGrid
             a copy of the current grid
         """
-        return SudokuGrid(self._array.copy())
+        return SudokuGrid.trusted(self._array.copy())
+
+    def view(self) -> SudokuGrid:
+        """
+        Creates a read-only grid sharing the cells with the current one,
+        for the code that only reads the puzzle. Writing to the view
+        raises `ValueError`.
+
+        Returns
+        -------
+        view: SudokuGrid
+            a read-only view of the current grid
+        """
+        array = self._array.view()
+        array.flags.writeable = False
+        return SudokuGrid.trusted(array)
 
     def __str__(self) -> str:
         """
@@ -274,27 +458,88 @@ class SudokuGrid:
         block_size = self.block_size
         cell_width = len(str(self._array.max()))
         h_line = "-" * ((1 + cell_width) * grid_size + 2 * block_size + 1)
-        v_line = "|"
-
-        text_grid = f"{h_line}\n"
-        for row in range(grid_size):
-            text_grid += v_line
-            for col in range(0, grid_size, block_size):
-                text_grid += " "
-                elements = self._array[row, col : col + block_size]
-                text_grid += ",".join(
-                    ["{el: >{w}}".format(el=el, w=cell_width) for el in elements]
-                )
-                text_grid += f" {v_line}"
+
+        cells = self._symbols(cell_width).tolist()
+        lines = [h_line]
+        for row, elements in enumerate(cells):
+            blocks = (
+                ",".join(elements[col : col + block_size])
+                for col in range(0, grid_size, block_size)
+            )
+            lines.append(f"| {' | '.join(blocks)} |")
             if (row + 1) % block_size == 0:
-                text_grid += f"\n{h_line}\n"
-            else:
-                text_grid += "\n"
+                lines.append(h_line)
+        return "\n".join(lines) + "\n"
+
+    def _symbols(self, width: int = 0) -> npt.NDArray[np.object_]:
+        """
+        Formats every cell, each distinct value is formatted only once.
+
+        Parameters
+        -----------
+        width: int
+            minimal width of a cell, the values are right-aligned
+
+        Returns
+        --------
+        symbols: npt.NDArray[np.object_]
+            a grid of strings
+        """
+        values = range(int(self._array.max(initial=0)) + 1)
+        symbols = np.array([f"{value:>{width}}" for value in values], dtype=object)
+        return symbols[self._array]
+
+    def to_text(self) -> str:
+        """
+        Returns the grid in the basic textual representation,
+        the one read by `from_text`.
+
+        Returns
+        --------
+        text: str
+            comma-separated values, one row per line
+        """
+        rows = self._symbols().tolist()
+        return "\n".join(",".join(row) for row in rows) + "\n"
 
-        return text_grid
+    def to_line(self, empty: str = "0") -> str:
+        """
+        Returns the grid in the single-line format common in puzzle
+        collections, e.g. 81 characters for the classical sudoku.
+        The values are written as `1-9` followed by `A-Z`.
+
+        Parameters
+        -----------
+        empty: str
+            a character used for the empty cells
+
+        Returns
+        --------
+        line: str
+            the cells row by row, one character each
+        """
+        if self.size > len(LINE_DIGITS):
+            raise ValueError(
+                f"grids larger than {len(LINE_DIGITS)}x{len(LINE_DIGITS)} "
+                "don't fit the single-line format"
+            )
+        symbols = np.frombuffer((empty + LINE_DIGITS).encode("ascii"), np.uint8)
+        return symbols[self._array.ravel()].tobytes().decode("ascii")
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the cells row by row, packed in the grid's dtype:
+        one byte per cell (two little-endian bytes for grids larger than 255x255).
+
+        Returns
+        --------
+        data: bytes
+            `size * size` cells
+        """
+        return self._array.astype(self._array.dtype.newbyteorder("<")).tobytes()
 
     @staticmethod
-    def from_text(lines: list[str]) -> SudokuGrid:
+    def from_text(lines: list[str], check: bool = True) -> SudokuGrid:
         """
         Reads a grid from basic textual representation, e.g.
 
@@ -314,20 +559,72 @@ class SudokuGrid:
         -----------
         lines: list[str]
             lines containing the textual representation
+        check: bool
+            whether to check the values repeated within the units
 
         Returns
         ---------
         grid: SudokuGrid
             a new sudoku grid
         """
+        rows = [line.strip() for line in lines if line.strip()]
+        size = len(rows)
+        if size == 0 or any(row.count(",") != size - 1 for row in rows):
+            raise ValueError("the text doesn't contain a valid sudoku grid")
         try:
-            lines_with_numbers = [[int(el) for el in line.split(",")] for line in lines]
-            return SudokuGrid(np.array(lines_with_numbers, np.uint))
+            values = np.fromstring(",".join(rows), dtype=np.int64, sep=",")
+            if (
+                values.size != size * size
+                or (values < 0).any()
+                or (values > size).any()
+            ):
+                raise ValueError("unexpected number of values or values out of range")
+            grid = values.reshape(size, size).astype(cell_dtype(size))
+            return SudokuGrid(grid) if check else SudokuGrid.trusted(grid)
+        except InconsistentGrid:
+            raise
         except Exception as ex:
             raise ValueError("the text doesn't contain a valid sudoku grid") from ex
 
     @staticmethod
-    def from_list(puzzle: list[list[str]]) -> SudokuGrid:
+    def from_line(line: str, check: bool = True) -> SudokuGrid:
+        """
+        Reads a grid from the single-line format common in puzzle collections,
+        e.g. the classical sudoku written as 81 characters:
+
+        ```
+        450780900020403600086120000060097130230504008007201400302070009908000006075000240
+        ```
+
+        The values are written as `1-9` followed by `A-Z` (case-insensitive),
+        the empty cells as `0` or `.`.
+
+        Parameters
+        -----------
+        line: str
+            the cells row by row, one character each
+        check: bool
+            whether to check the values repeated within the units
+
+        Returns
+        ---------
+        grid: SudokuGrid
+            a new sudoku grid
+        """
+        try:
+            codes = np.frombuffer(line.strip().encode("ascii"), dtype=np.uint8)
+        except UnicodeEncodeError as ex:
+            raise ValueError("the line doesn't contain a valid sudoku grid") from ex
+        values = _LINE_VALUES[codes]
+        size = math.isqrt(values.size)
+        invalid = (values == 255).any() or (values > size).any()
+        if size == 0 or size * size != values.size or invalid:
+            raise ValueError("the line doesn't contain a valid sudoku grid")
+        grid = values.reshape(size, size)
+        return SudokuGrid(grid) if check else SudokuGrid.trusted(grid)
+
+    @staticmethod
+    def from_list(puzzle: list[list[int]], check: bool = True) -> SudokuGrid:
         """
         Reads a grid from the basic list representation, e.g.
 
@@ -347,6 +644,9 @@ class SudokuGrid:
         -----------
         puzzle: list[list[int]]
             list of puzzle rows
+        check: bool
+            whether to check the values repeated within the units,
+            `False` for a puzzle validated before, e.g. when the request was parsed
 
         Returns
         ---------
@@ -354,10 +654,81 @@ class SudokuGrid:
             a new sudoku grid
         """
         try:
-            return SudokuGrid(np.array(puzzle, np.uint))
+            array = np.array(puzzle, cell_dtype(len(puzzle)))
+            return SudokuGrid(array) if check else SudokuGrid.trusted(array)
+        except InconsistentGrid:
+            raise
         except Exception as ex:
             raise ValueError("the text doesn't contain a valid sudoku grid") from ex
 
+    @staticmethod
+    def from_cells(cells: npt.ArrayLike, size: int) -> SudokuGrid:
+        """
+        Reads a grid from its cells row by row, e.g. `[4,5,0,7,8,0,9,0,0,0,2,...]`.
+
+        Parameters
+        -----------
+        cells: npt.ArrayLike
+            `size * size` values, a flat list or array
+        size: int
+            size of the grid
+
+        Returns
+        ---------
+        grid: SudokuGrid
+            a new sudoku grid
+        """
+        array = np.asarray(cells)
+        if array.ndim != 1 or size < 1 or array.size != size * size:
+            raise ValueError(f"expected {size * size} cells of a {size}x{size} grid")
+        return SudokuGrid(array.reshape(size, size))
+
+    @staticmethod
+    def from_bytes(data: bytes, size: int) -> SudokuGrid:
+        """
+        Reads a grid from the packed binary representation written by `to_bytes`,
+        the cells are used without copying if they are in the grid's dtype.
+
+        Parameters
+        -----------
+        data: bytes
+            the cells row by row, one byte each
+            (two little-endian bytes for grids larger than 255x255)
+        size: int
+            size of the grid
+
+        Returns
+        ---------
+        grid: SudokuGrid
+            a new (read-only) sudoku grid
+        """
+        dtype = cell_dtype(size).newbyteorder("<")
+        if size < 1 or len(data) != size * size * dtype.itemsize:
+            raise ValueError(
+                f"expected {size * size} packed cells of {dtype.itemsize} bytes"
+            )
+        return SudokuGrid.from_cells(np.frombuffer(data, dtype), size)
+
+    @staticmethod
+    def trusted(array: npt.NDArray[np.unsignedinteger]) -> SudokuGrid:
+        """
+        Wraps an array known to form a consistent grid, skipping the checks,
+        e.g. a copy of another grid or a solution found by a solver.
+
+        Parameters
+        -----------
+        array: npt.NDArray[np.unsignedinteger]
+            a square array of the dtype given by `cell_dtype`
+
+        Returns
+        ---------
+        grid: SudokuGrid
+            a sudoku grid backed by the array
+        """
+        grid = object.__new__(SudokuGrid)
+        object.__setattr__(grid, "_array", array)
+        return grid
+
     def to_list(self) -> list[list[int]]:
         """
         Translates grid to a list-based representation:
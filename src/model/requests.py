@@ -1,48 +1,82 @@
-from typing import Annotated
-from pydantic import AfterValidator, BaseModel, Field
-from src.model.grid import SudokuGrid  # noqa
+from timeit import default_timer as timer
+from typing import Annotated, Self
+from pydantic import BaseModel, Field, PrivateAttr, ValidationInfo, model_validator
+from src.model.grid import SudokuGrid
+from src.solvers.sat_solver import AtMostOneEncoding
 from src.solvers.solver_type import SudokuSolverType
 import numpy as np  # noqa
 
 
-def ensure_puzzle_is_valid(puzzle: list[list[int]]) -> list[list[int]]:
-    """
-    Makes sure the list representation corresponds to a sudoku grid.
-    Raises ValueError if there is a problem with the puzzle.
-
-    Parameters
-    ----------
-    puzzle: list[list[int]]
-        sudoku array represented as a list of lists (rows)
-
-    Returns
-    -------
-    puzzle: list[list[int]]
-        the input puzzle if it's valid
-    """
-
-    # TODO:
-    # Implement the validator.
-    # tips.
-    # - check if list contains only nonnegative number
-    # - then try to create a sudoku grid
-    #
-    # If everything is ok, return the same puzzle you get as the input
-    pass
-    return puzzle
-
-
 SudokuAsList = Annotated[
     list[list[int]],
-    AfterValidator(ensure_puzzle_is_valid),
-    Field(..., description="2D list representing the sudoku grid"),
+    Field(description="2D list representing the sudoku grid"),
 ]
 """An annotated type representing a sudoku represented with lists
    Read more: https://docs.pydantic.dev/2.0/usage/validators/#annotated-validators
 """
 
+GRID_CONTEXT = "grid"
+"""key of the validation context holding a puzzle decoded from a binary body"""
+
+
+class PuzzleRequest(BaseModel):
+    """
+    Base of the requests carrying a puzzle. The puzzle is given as exactly one of:
+    - `puzzle` - a list of rows
+    - `line` - the single-line format, e.g. 81 characters for the classical sudoku
+    - `cells` together with `size` - a flat list of the cells row by row
+    - packed cells in a binary body, passed in the validation context
+      under `GRID_CONTEXT`, see `src.service.parsing`
+
+    The puzzle is checked once, while the request is validated,
+    and kept as `grid` for the rest of the request.
+    """
+
+    puzzle: SudokuAsList | None = None
+    line: str | None = Field(
+        default=None, description="The sudoku in the single-line format"
+    )
+    cells: list[int] | None = Field(
+        default=None, description="Cells of the sudoku row by row, requires `size`"
+    )
+    size: int | None = Field(default=None, gt=0, description="Size of the `cells`")
+    _grid: SudokuGrid = PrivateAttr()
+    _grid_time: float = PrivateAttr(default=0.0)
+
+    @model_validator(mode="after")
+    def _read_grid(self, info: ValidationInfo) -> Self:
+        decoded = info.context.get(GRID_CONTEXT) if info.context else None
+        given = [self.puzzle, self.line, self.cells, decoded]
+        if sum(form is not None for form in given) != 1:
+            raise ValueError("give the puzzle in exactly one form")
+        start = timer()
+        if self.puzzle is not None:
+            self._grid = SudokuGrid.from_list(self.puzzle)
+        elif self.line is not None:
+            self._grid = SudokuGrid.from_line(self.line)
+        elif self.cells is not None:
+            if self.size is None:
+                raise ValueError("`cells` require the `size`")
+            self._grid = SudokuGrid.from_cells(self.cells, self.size)
+        elif isinstance(decoded, SudokuGrid):
+            self._grid = decoded
+        else:
+            raise ValueError("the decoded puzzle is not a grid")
+        self._grid_time = timer() - start
+        return self
+
+    @property
+    def grid(self) -> SudokuGrid:
+        """the checked puzzle"""
+        return self._grid
+
+    @property
+    def grid_time(self) -> float:
+        """time (in seconds) spent building and checking the grid from the request"""
+        return self._grid_time
 
-class SolveRequest(BaseModel):
+
+class SolveRequest(PuzzleRequest):
     """
     Represents a request to solve a given puzzle.
     """
@@ -51,12 +85,58 @@ class SolveRequest(BaseModel):
         default=SudokuSolverType.SAT, description="Solver to be used"
     )
     time_limit: float = Field(default=10.0, gt=0, description="Time limit in seconds")
-    puzzle: SudokuAsList
+    presolve: bool = Field(
+        default=False,
+        description="Whether to fill the naked and hidden singles before the search",
+    )
+    at_most_one: AtMostOneEncoding = Field(
+        default=AtMostOneEncoding.PAIRWISE,
+        description="Encoding of the at-most-one constraints (SAT solver only)",
+    )
+    redundant_constraints: bool = Field(
+        default=False,
+        description="Whether to add redundant at-least-one clauses (SAT solver only)",
+    )
+    portfolio: list[SudokuSolverType] | None = Field(
+        default=None,
+        description="Engines raced by the portfolio solver, the configured ones if not given",
+    )
+    cache: bool = Field(
+        default=False,
+        description="Whether to look the puzzle up in the solution cache, "
+        "worth it for hard puzzles only, canonicalizing a 9x9 one takes milliseconds",
+    )
+
+
+class BatchItem(SolveRequest):
+    """
+    Represents a single puzzle of the batch solve request.
+    """
+
+    id: str | None = Field(
+        default=None, description="Caller's key echoed back with the result"
+    )
 
 
-class ValidateRequest(BaseModel):
+class ValidateRequest(PuzzleRequest):
     """
     Represents a request to validate a given puzzle.
     """
 
-    puzzle: SudokuAsList
+    time_limit: float = Field(default=10.0, gt=0, description="Time limit in seconds")
+
+
+class CountRequest(PuzzleRequest):
+    """
+    Represents a request to count the solutions of a given puzzle.
+    """
+
+    cap: int = Field(
+        default=2, ge=1, le=10_000, description="Maximal number of solutions to count"
+    )
+    solutions: int = Field(
+        default=0,
+        ge=0,
+        description="How many of the found solutions to stream back as NDJSON",
+    )
+    time_limit: float = Field(default=10.0, gt=0, description="Time limit in seconds")
@@ -1,4 +1,6 @@
+from enum import StrEnum, auto
 from pydantic import BaseModel
+from src.solvers.solver_type import SudokuSolverType
 
 
 class SolveResponse(BaseModel):
@@ -8,6 +10,85 @@ class SolveResponse(BaseModel):
 
     solution: list[list[int]]
     """Solved sudoku represented as a list of lists"""
+    solved_by: SudokuSolverType | None = None
+    """Engine that found the solution, `None` if it was taken from the cache"""
+
+
+class BatchStatus(StrEnum):
+    """
+    Outcome of solving a single puzzle of a batch.
+    """
+
+    SOLVED = auto()
+    INFEASIBLE = auto()
+    TIMEOUT = auto()
+    INVALID = auto()
+    ERROR = auto()
+
+
+class BatchResult(BaseModel):
+    """
+    Represent a result of a single puzzle of the batch solve request.
+    """
+
+    index: int
+    """Position of the puzzle in the batch"""
+    id: str | None = None
+    """Caller's key of the puzzle, if provided"""
+    status: BatchStatus
+    """Outcome of the solver"""
+    solution: list[list[int]] | None = None
+    """Solved sudoku, only if the status is `solved`"""
+    solved_by: SudokuSolverType | None = None
+    """Engine that gave the answer, only if it wasn't taken from the cache"""
+    detail: str | None = None
+    """Description of the problem, only if the status is `invalid` or `error`"""
+
+
+class ExecutorStatus(BaseModel):
+    """
+    Represent the current load of the solver processes.
+    """
+
+    workers: int
+    """Number of the solver processes"""
+    max_pending: int
+    """How many requests may be queued or running at once"""
+    pending: int
+    """Number of the requests queued or running right now"""
+    queued: int
+    """Number of the requests waiting for a free solver process"""
+    completed: int
+    """Number of the requests completed so far"""
+    rejected: int
+    """Number of the requests rejected because of the full queue"""
+    mean_wait: float
+    """Average time (in seconds) a request waited for a solver process"""
+    max_wait: float
+    """Longest time (in seconds) a request waited for a solver process"""
+    mean_run: float
+    """Average time (in seconds) a solver process spent on a request"""
+
+
+class CacheStatus(BaseModel):
+    """
+    Represent the current state of the solution cache.
+    """
+
+    entries: int
+    """Number of the cached puzzles"""
+    bytes: int
+    """Approximate memory taken by the entries"""
+    max_bytes: int
+    """Memory budget of the cache"""
+    max_size: int
+    """Size of the largest puzzles being cached"""
+    hits: int
+    """Number of the puzzles answered from the cache"""
+    misses: int
+    """Number of the cacheable puzzles not found in the cache"""
+    skipped: int
+    """Number of the puzzles too large or too symmetric to be cached"""
 
 
 class ValidateResponse(BaseModel):
@@ -17,3 +98,14 @@ class ValidateResponse(BaseModel):
 
     valid: bool
     """Whether the sudoku is valid"""
+
+
+class CountResponse(BaseModel):
+    """
+    Represent a response to the count request.
+    """
+
+    count: int
+    """Number of the solutions found, never more than the requested cap"""
+    capped: bool
+    """Whether the search stopped at the cap, i.e. there may be more solutions"""
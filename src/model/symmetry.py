@@ -0,0 +1,260 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import cache
+import itertools
+import math
+import numpy as np
+import numpy.typing as npt
+from src.model.grid import SudokuGrid, cell_dtype
+
+
+@cache
+def _line_orders(block_size: int) -> npt.NDArray[np.intp]:
+    """
+    Enumerates all the orders of rows (or columns) that keep a sudoku valid,
+    i.e. permutations of the bands and of the rows within every band.
+
+    Parameters
+    -----------
+    block_size: int
+        size of the block, e.g. `3` for the classical sudoku
+
+    Returns
+    --------
+    orders: npt.NDArray[np.intp]
+        an array of shape `(block_size! ** (block_size + 1), size)`,
+        `orders[k, i]` is the original line put at the position `i`
+    """
+    inner = list(itertools.permutations(range(block_size)))
+    orders = [
+        [
+            band * block_size + lines[i]
+            for band, lines in zip(bands, within)
+            for i in range(block_size)
+        ]
+        for bands in inner
+        for within in itertools.product(inner, repeat=block_size)
+    ]
+    result = np.array(orders, dtype=np.intp)
+    result.flags.writeable = False
+    return result
+
+
+def _smallest(lines: npt.NDArray) -> npt.NDArray[np.bool_]:
+    """
+    Finds the lexicographically smallest lines.
+
+    Parameters
+    -----------
+    lines: npt.NDArray
+        a 2-dimensional array, one line per row
+
+    Returns
+    --------
+    smallest: npt.NDArray[np.bool_]
+        a mask of the rows equal to the smallest one
+    """
+    best = np.ones(len(lines), dtype=bool)
+    for col in range(lines.shape[1]):
+        best &= lines[:, col] == lines[best, col].min()
+    return best
+
+
+@dataclass(frozen=True, slots=True)
+class Canonical:
+    """
+    Canonical form of a sudoku puzzle with respect to the transformations
+    keeping sudoku valid: relabeling the values, transposition,
+    permuting bands (stacks) and rows (columns) within a band (stack).
+
+    The canonical form is the lexicographically smallest transformed grid,
+    where empty cells are greater than any value, and the values are
+    relabeled in the order of their first appearance.
+    Isomorphic puzzles have the same canonical form.
+
+    Attributes:
+    -----------
+    grid: npt.NDArray[np.uint8]
+        the canonical form of the puzzle
+    transposed: bool
+        whether the puzzle is transposed first
+    rows: npt.NDArray[np.intp]
+        `rows[i]` is the row of the (transposed) puzzle put at the row `i`
+    cols: npt.NDArray[np.intp]
+        `cols[j]` is the column of the (transposed) puzzle put at the column `j`
+    labels: npt.NDArray[np.intp]
+        `labels[value]` is the canonical label of the value, `labels[0] == 0`
+
+    Properties:
+    -----------
+    key: bytes
+        a hashable representation of the canonical form
+
+    Methods:
+    --------
+    to_canonical(self, grid: SudokuGrid) -> npt.NDArray[np.uint8]:
+        applies the transformation to a grid
+    from_canonical(self, grid: npt.NDArray[np.uint8]) -> SudokuGrid:
+        applies the inverse transformation to a canonical grid
+    """
+
+    grid: npt.NDArray[np.uint8]
+    transposed: bool
+    rows: npt.NDArray[np.intp]
+    cols: npt.NDArray[np.intp]
+    labels: npt.NDArray[np.intp]
+
+    @property
+    def key(self) -> bytes:
+        return self.grid.tobytes()
+
+    def to_canonical(self, grid: SudokuGrid) -> npt.NDArray[np.uint8]:
+        """
+        Applies the transformation to a grid, e.g. to the puzzle's solution.
+
+        Parameters
+        -----------
+        grid: SudokuGrid
+            a grid of the same size as the puzzle
+
+        Returns
+        --------
+        transformed: npt.NDArray[np.uint8]
+            the transformed grid
+        """
+        array = grid.cells().reshape(grid.size, grid.size).astype(np.intp)
+        if self.transposed:
+            array = array.T
+        return self.labels[array[np.ix_(self.rows, self.cols)]].astype(np.uint8)
+
+    def from_canonical(self, grid: npt.NDArray[np.uint8]) -> SudokuGrid:
+        """
+        Applies the inverse transformation to a canonical grid,
+        e.g. to the canonical puzzle's solution.
+
+        Parameters
+        -----------
+        grid: npt.NDArray[np.uint8]
+            a grid of the same size as the canonical form
+
+        Returns
+        --------
+        original: SudokuGrid
+            the grid transformed back
+        """
+        values = np.empty_like(self.labels)
+        values[self.labels] = np.arange(len(self.labels))
+        array = np.empty(grid.shape, dtype=cell_dtype(len(grid)))
+        array[np.ix_(self.rows, self.cols)] = values[grid.astype(np.intp)]
+        if self.transposed:
+            array = array.T.copy()
+        return SudokuGrid.trusted(array)
+
+    @staticmethod
+    def of(puzzle: SudokuGrid, max_states: int = 200_000) -> Canonical | None:
+        """
+        Computes the canonical form of the puzzle.
+
+        The rows of the result are fixed one at a time. All the partial
+        transformations giving the smallest prefix so far are kept,
+        the rest is pruned. Highly symmetric puzzles may keep too many
+        of them, in such a case the computation is abandoned. So are
+        the puzzles with fewer givens than their size, right away,
+        as nearly all the transformations tie on them (e.g. on the empty grid).
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle
+        max_states: int
+            the maximal number of partial transformations to be kept
+
+        Returns
+        --------
+        canonical: Canonical | None
+            - the canonical form of the puzzle
+            - `None` if there were more than `max_states` candidates
+              or too few givens
+        """
+        size = puzzle.size
+        block_size = puzzle.block_size
+        if 2 * math.factorial(block_size) ** (block_size + 1) * size > max_states:
+            return None
+        if np.count_nonzero(puzzle.cells()) < size:
+            return None
+
+        empty = size + 1
+        array = puzzle.cells().reshape(size, size).astype(np.intp)
+        grids = np.stack([array, array.T])
+        orders = _line_orders(block_size)
+        band_of = np.arange(size) // block_size
+
+        # a state: transposition, column order, rows chosen so far, labels
+        states = len(orders)
+        transposed = np.repeat([0, 1], states)
+        col_order = np.tile(np.arange(states), 2)
+        rows = np.empty((2 * states, 0), dtype=np.intp)
+        labels = np.zeros((2 * states, size + 1), dtype=np.intp)
+        next_label = np.ones(2 * states, dtype=np.intp)
+        canonical = np.empty((size, size), dtype=np.intp)
+
+        for position in range(size):
+            if position % block_size == 0:
+                used = band_of[rows[:, ::block_size]]
+                allowed = ~(band_of[None, :, None] == used[:, None, :]).any(axis=2)
+            else:
+                allowed = band_of[None, :] == band_of[rows[:, -1]][:, None]
+                allowed &= ~(np.arange(size)[None, :, None] == rows[:, None, :]).any(
+                    axis=2
+                )
+            source, row = np.nonzero(allowed)
+            if len(source) > max_states:
+                return None
+
+            values = grids[
+                transposed[source, None], row[:, None], orders[col_order[source]]
+            ]
+
+            # the values in a row are distinct, so the line is decided mostly
+            # by where the empty cells are, that's much cheaper to compare
+            best = _smallest(values == 0)
+            source, row, values = source[best], row[best], values[best]
+
+            transposed = transposed[source]
+            col_order = col_order[source]
+            rows = np.column_stack([rows[source], row])
+            labels = labels[source]
+            next_label = next_label[source]
+
+            line = np.full(values.shape, empty, dtype=np.intp)
+            candidates = np.arange(len(source))
+            for col in range(size):
+                value = values[:, col]
+                fresh = (value != 0) & (labels[candidates, value] == 0)
+                labels[candidates[fresh], value[fresh]] = next_label[fresh]
+                next_label += fresh
+                given = value != 0
+                line[given, col] = labels[candidates[given], value[given]]
+
+            best = _smallest(line)
+
+            transposed = transposed[best]
+            col_order = col_order[best]
+            rows = rows[best]
+            labels = labels[best]
+            next_label = next_label[best]
+            canonical[position] = line[best][0]
+
+        # the values missing from the puzzle get the remaining labels in order
+        final = labels[0]
+        missing = np.flatnonzero(final[1:] == 0) + 1
+        final[missing] = np.arange(next_label[0], next_label[0] + len(missing))
+
+        canonical[canonical == empty] = 0
+        return Canonical(
+            grid=canonical.astype(np.uint8),
+            transposed=bool(transposed[0]),
+            rows=rows[0],
+            cols=orders[col_order[0]],
+            labels=final,
+        )
@@ -0,0 +1,170 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from functools import partial
+from typing import Any
+
+from pydantic import ValidationError
+from src.model.requests import BatchItem
+from src.model.responses import BatchResult, BatchStatus
+from src.service.solve import solve
+
+
+async def _solve(index: int, raw: Any) -> BatchResult:
+    """
+    Validates the raw item and solves it in the shared executor,
+    unless it's found in the solution cache.
+    The batch waits for free slots instead of being rejected,
+    the time limit of an item starts when it is submitted to the pool.
+    Every failure is reported in the result instead of being raised.
+
+    Parameters
+    -----------
+    index: int
+        position of the puzzle in the batch
+    raw: Any
+        the item as decoded from the JSON
+
+    Returns
+    --------
+    result: BatchResult
+        the outcome of the solver
+    """
+    try:
+        item = BatchItem.model_validate(raw)
+    except ValidationError as ex:
+        item_id = raw.get("id") if isinstance(raw, dict) else None
+        return BatchResult(
+            index=index,
+            id=item_id if isinstance(item_id, str) else None,
+            status=BatchStatus.INVALID,
+            detail=str(ex),
+        )
+
+    result = BatchResult(index=index, id=item.id, status=BatchStatus.SOLVED)
+    try:
+        solution, result.solved_by = await solve(item, wait=True)
+    except TimeoutError:
+        result.status = BatchStatus.TIMEOUT
+        return result
+    except Exception as ex:
+        result.status = BatchStatus.ERROR
+        result.detail = str(ex)
+        return result
+
+    if solution is None:
+        result.status = BatchStatus.INFEASIBLE
+    else:
+        result.solution = solution.to_list()
+    return result
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Decodes a stream of newline delimited JSON documents.
+    Blank lines are skipped, a malformed line is yielded as `None`,
+    so it is reported as an invalid item.
+
+    Parameters
+    -----------
+    chunks: AsyncIterator[bytes]
+        the raw body of the request
+
+    Returns
+    --------
+    items: AsyncIterator[Any]
+        the decoded documents
+    """
+
+    def decode(line: bytes) -> Any:
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield decode(line)
+    if buffer.strip():
+        yield decode(buffer)
+
+
+class SolveBatch:
+    """
+    A batch of puzzles solved concurrently in the shared executor.
+    The puzzles are submitted one by one as they are read,
+    the results are streamed back in the order of completion.
+
+    Methods:
+    --------
+    submit(self, raw: Any) -> None:
+        schedules solving of the next item of the batch
+    results(self) -> AsyncIterator[str]:
+        yields the results as NDJSON lines
+    cancel(self) -> None:
+        cancels the items that are not done yet
+    """
+
+    _submitted: int
+    _results: asyncio.Queue[BatchResult]
+    _tasks: set[asyncio.Task]
+
+    def __init__(self) -> None:
+        self._submitted = 0
+        self._results = asyncio.Queue()
+        self._tasks = set()
+
+    def submit(self, raw: Any) -> None:
+        """
+        Schedules solving of the next item of the batch.
+
+        Parameters
+        -----------
+        raw: Any
+            the item as decoded from the JSON
+        """
+        task = asyncio.create_task(_solve(self._submitted, raw))
+        self._tasks.add(task)
+        task.add_done_callback(partial(self._collect, self._submitted))
+        self._submitted += 1
+
+    def _collect(self, index: int, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        ex = task.exception()
+        if ex is not None:
+            # the results are counted, a lost one would leave the stream waiting
+            self._results.put_nowait(
+                BatchResult(index=index, status=BatchStatus.ERROR, detail=str(ex))
+            )
+        else:
+            self._results.put_nowait(task.result())
+
+    async def results(self) -> AsyncIterator[str]:
+        """
+        Yields the results of all the submitted items.
+
+        Returns
+        --------
+        lines: AsyncIterator[str]
+            serialized `BatchResult` objects, one per line
+        """
+        try:
+            for _ in range(self._submitted):
+                result = await self._results.get()
+                yield result.model_dump_json(exclude_none=True) + "\n"
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """
+        Cancels the items that are not done yet.
+        Puzzles already running in the pool are finished anyway.
+        """
+        for task in list(self._tasks):
+            task.cancel()
@@ -0,0 +1,439 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from src.model.responses import ExecutorStatus
+from src.service.timing import RequestTiming
+from src.solvers.cancellation import CancelFlag, CancelFlags, cancel_scope
+from src.solvers.dancing_links_pool import start_pool
+from src.solvers.sat_pool import start_sat_pool
+
+WORKERS_VARIABLE = "SUDOKU_SOLVER_WORKERS"
+MAX_PENDING_VARIABLE = "SUDOKU_MAX_PENDING"
+GRACE_PERIOD = 1.0
+"""how long (in seconds) to wait past the deadline for a solver to give up"""
+DISCONNECT_POLL_INTERVAL = 0.1
+"""how often (in seconds) to check whether the client is still waiting"""
+
+
+class ExecutorOverloaded(Exception):
+    """
+    Raised when there are too many pending tasks to accept a new one.
+
+    Attributes:
+    -----------
+    retry_after: int
+        suggested number of seconds to wait before retrying
+    """
+
+    retry_after: int
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("too many pending requests")
+        self.retry_after = retry_after
+
+
+def _init_worker() -> None:
+    """
+    Prepares a worker process: solving is sequential there,
+    so a single pre-warmed dancing links process is enough.
+    The warm SAT solvers are built for the configured sizes.
+    """
+    start_pool(1)
+    start_sat_pool()
+
+
+def _ready() -> None:
+    """
+    A no-op task used to start the worker processes.
+    """
+
+
+def _run_until(
+    deadline: float, flag: CancelFlag | None, task: Callable[..., Any], *args
+) -> tuple[float, Any, bool]:
+    """
+    Runs the task in a worker process with the time left until the deadline.
+    The monotonic clock is shared by all the processes of the host.
+    The solvers of the task watch the cancel flag, a task cancelled
+    while queued doesn't start at all.
+
+    Parameters
+    -----------
+    deadline: float
+        `time.monotonic()` value the task has to finish by
+    flag: CancelFlag | None
+        raised by the service to cancel the task
+    task: Callable[..., Any]
+        the task, it takes the time limit as the last argument
+    *args: Any
+        the other arguments of the task
+
+    Returns
+    --------
+    started: float
+        `time.monotonic()` value when the task started
+    result: Any
+        result of the task, `None` on timeout
+    timed_out: bool
+        whether the task ran out of time or it has been cancelled
+        (or it had none left at the start)
+    """
+    started = time.monotonic()
+    time_limit = deadline - started
+    if time_limit <= 0 or (flag is not None and flag.is_set()):
+        return started, None, True
+    try:
+        with cancel_scope(flag):
+            return started, task(*args, time_limit), False
+    except TimeoutError:
+        return started, None, True
+
+
+class SolverExecutor:
+    """
+    A process pool running the CPU-bound tasks of the service,
+    with a bounded number of pending tasks.
+
+    Every task gets a deadline when it's submitted,
+    so the time spent in the queue counts towards its time limit.
+    It also gets a cancel flag in shared memory, raised when its client
+    disconnects or it overruns the grace period, so an abandoned task
+    stops at the next check of its solver instead of running to the deadline.
+
+    Attributes:
+    -----------
+    workers: int
+        number of the worker processes
+    max_pending: int
+        how many tasks may be queued or running at once
+    rejected: int
+        number of the tasks rejected because of the full queue
+
+    Methods:
+    --------
+    warm_up(self) -> None:
+        starts all the worker processes
+    run(self, task, *args, time_limit: float, wait: bool, timing: RequestTiming,
+        disconnected: Callable[[], Awaitable[bool]]) -> Any:
+        runs the task in the pool
+    status(self) -> ExecutorStatus:
+        returns the current load of the executor
+    shutdown(self) -> None:
+        stops the worker processes
+    """
+
+    workers: int
+    max_pending: int
+    rejected: int
+    _pool: ProcessPoolExecutor | None
+    _flags: CancelFlags | None
+    _pending: int
+    _slot_freed: asyncio.Condition
+    _completed: int
+    _total_wait: float
+    _max_wait: float
+    _total_run: float
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        if workers < 1 or max_pending < 1:
+            raise ValueError("the executor needs at least one worker and one slot")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rejected = 0
+        self._pool = None
+        self._flags = None
+        self._pending = 0
+        self._slot_freed = asyncio.Condition()
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_worker,
+            )
+        return self._pool
+
+    def _get_flags(self) -> CancelFlags:
+        # a flag per pending task, they're released when the task ends
+        if self._flags is None:
+            self._flags = CancelFlags(self.max_pending)
+        return self._flags
+
+    async def warm_up(self) -> None:
+        """
+        Starts all the worker processes, so the first requests
+        don't spend their time limit on it.
+        """
+        pool = self._get_pool()
+        futures = [pool.submit(_ready) for _ in range(self.workers)]
+        await asyncio.gather(*map(asyncio.wrap_future, futures))
+
+    def retry_after(self) -> int:
+        """
+        Estimates when a slot for a new task frees up.
+
+        Returns
+        --------
+        seconds: int
+            time needed to drain the queue at the average pace, at least `1`
+        """
+        if self._completed == 0:
+            return 1
+        mean_run = self._total_run / self._completed
+        return max(1, math.ceil(mean_run * self._pending / self.workers))
+
+    async def run(
+        self,
+        task: Callable[..., Any],
+        *args,
+        time_limit: float,
+        wait: bool = False,
+        timing: RequestTiming | None = None,
+        disconnected: Callable[[], Awaitable[bool]] | None = None,
+    ) -> Any:
+        """
+        Runs the task in the pool.
+
+        Parameters
+        -----------
+        task: Callable[..., Any]
+            a picklable function, it takes the time limit as the last argument
+        *args: Any
+            the other arguments of the task
+        time_limit: float
+            amount of time (in seconds) available for queueing and running
+        wait: bool
+            what to do when the queue is full:
+            - `True` - wait for a free slot, the deadline starts afterwards
+            - `False` - raise `ExecutorOverloaded`
+        timing: RequestTiming | None
+            phases of the request, receives `queue` (waiting for a slot and
+            a process) and `worker` (running the task, sending the result back
+            included)
+        disconnected: Callable[[], Awaitable[bool]] | None
+            checks whether the client has gone away (e.g. `Request.is_disconnected`),
+            the task is cancelled then; `None` if there's no client
+
+        Returns
+        --------
+        result: Any
+            the result of the task
+
+        Raises
+        -------
+        executor_overloaded: ExecutorOverloaded
+            when the queue is full and `wait` is `False`
+        timeout_error: TimeoutError
+            when the available time runs out or the client has disconnected
+        runtime_error: RuntimeError
+            when the worker process died
+        """
+        queued = time.monotonic()
+        if self._pending >= self.max_pending:
+            if not wait:
+                self.rejected += 1
+                raise ExecutorOverloaded(self.retry_after())
+            async with self._slot_freed:
+                await self._slot_freed.wait_for(
+                    lambda: self._pending < self.max_pending
+                )
+
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        pool = self._get_pool()
+        flags = self._get_flags()
+        flag = flags.acquire()
+        try:
+            future = pool.submit(_run_until, submitted + time_limit, flag, task, *args)
+        except BrokenProcessPool as ex:
+            if flag is not None:
+                flags.release(flag)
+            self._discard(pool)
+            raise RuntimeError("the solver process died") from ex
+
+        self._pending += 1
+        future.add_done_callback(lambda _: self._on_done(loop, flag))
+        watcher = None
+        if flag is not None and disconnected is not None:
+            watcher = loop.create_task(self._watch(future, flag, disconnected))
+        try:
+            started, result, timed_out = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=time_limit + GRACE_PERIOD,
+            )
+        except BrokenProcessPool as ex:
+            self._discard(pool)
+            raise RuntimeError("the solver process died") from ex
+        except (TimeoutError, asyncio.CancelledError):
+            # nobody waits for the result anymore
+            self._cancel(future, flag)
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+        finished = time.monotonic()
+        self._record(started - submitted, finished - started)
+        if timing is not None:
+            timing.add("queue", started - queued)
+            timing.add("worker", finished - started)
+        if timed_out:
+            raise TimeoutError()
+        return result
+
+    async def _watch(
+        self,
+        future: Future,
+        flag: CancelFlag,
+        disconnected: Callable[[], Awaitable[bool]],
+    ) -> None:
+        # cancels the task once its client disconnects
+        while not await disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        self._cancel(future, flag)
+
+    def _cancel(self, future: Future, flag: CancelFlag | None) -> None:
+        # a done task has released its flag already, it may belong to another one
+        if flag is not None and not future.done() and self._flags is not None:
+            self._flags.set(flag)
+
+    def _on_done(
+        self, loop: asyncio.AbstractEventLoop, flag: CancelFlag | None
+    ) -> None:
+        # called from the pool's management thread
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._release, loop, flag)
+
+    def _release(
+        self, loop: asyncio.AbstractEventLoop, flag: CancelFlag | None
+    ) -> None:
+        self._pending -= 1
+        # the flags may have been replaced by a restart meanwhile
+        if flag is not None and self._flags is not None:
+            if flag.name == self._flags.name:
+                self._flags.release(flag)
+        loop.create_task(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._slot_freed:
+            self._slot_freed.notify()
+
+    def _record(self, waited: float, ran: float) -> None:
+        self._completed += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        self._total_run += ran
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> ExecutorStatus:
+        """
+        Returns the current load of the executor.
+
+        Returns
+        --------
+        status: ExecutorStatus
+            queue depth, waiting times, etc.
+        """
+        completed = self._completed
+        return ExecutorStatus(
+            workers=self.workers,
+            max_pending=self.max_pending,
+            pending=self._pending,
+            queued=max(0, self._pending - self.workers),
+            completed=completed,
+            rejected=self.rejected,
+            mean_wait=self._total_wait / completed if completed else 0.0,
+            max_wait=self._max_wait,
+            mean_run=self._total_run / completed if completed else 0.0,
+        )
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes and releases the cancel flags.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+        self._pool = None
+        if self._flags is not None:
+            self._flags.close()
+        self._flags = None
+
+
+_executor: SolverExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """
+    Returns the configured number of the solver processes.
+
+    Returns
+    --------
+    workers: int
+        value of the `SUDOKU_SOLVER_WORKERS` environment variable,
+        number of CPUs if it is not set
+    """
+    return int(os.environ.get(WORKERS_VARIABLE, os.cpu_count() or 1))
+
+
+def default_max_pending(workers: int) -> int:
+    """
+    Returns the configured bound of the pending tasks.
+
+    Parameters
+    -----------
+    workers: int
+        number of the solver processes
+
+    Returns
+    --------
+    max_pending: int
+        value of the `SUDOKU_MAX_PENDING` environment variable,
+        four tasks per worker if it is not set
+    """
+    return int(os.environ.get(MAX_PENDING_VARIABLE, 4 * workers))
+
+
+def get_executor() -> SolverExecutor:
+    """
+    Returns the shared executor, creating it on the first use.
+
+    Returns
+    --------
+    executor: SolverExecutor
+        the shared executor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = default_workers()
+            _executor = SolverExecutor(workers, default_max_pending(workers))
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Stops the shared executor, if it has been started.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
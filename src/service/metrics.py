@@ -0,0 +1,282 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+from src.solvers.stats import SolverStats
+
+COUNT_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""media type of the Prometheus text format"""
+
+
+@dataclass(frozen=True, slots=True)
+class Metric:
+    """
+    Describes the histogram of a `SolverStats` counter.
+    """
+
+    name: str
+    """name of the Prometheus metric"""
+    help: str
+    """description of the metric"""
+    buckets: tuple[float, ...]
+    """upper bounds of the buckets, `+Inf` is added"""
+
+
+SOLVER_METRICS = {
+    "nodes": Metric("sudoku_solver_nodes", "Search nodes per run", COUNT_BUCKETS),
+    "backtracks": Metric(
+        "sudoku_solver_backtracks", "Backtracks per run", COUNT_BUCKETS
+    ),
+    "propagations": Metric(
+        "sudoku_solver_propagations", "Propagated values per run", COUNT_BUCKETS
+    ),
+    "clauses": Metric(
+        "sudoku_solver_clauses", "Clauses of the SAT encoding", COUNT_BUCKETS
+    ),
+    "variables": Metric(
+        "sudoku_solver_variables", "Variables of the SAT encoding", COUNT_BUCKETS
+    ),
+    "presolve_time": Metric(
+        "sudoku_solver_presolve_seconds", "Time spent presolving", TIME_BUCKETS
+    ),
+    "encode_time": Metric(
+        "sudoku_solver_encode_seconds", "Time spent encoding", TIME_BUCKETS
+    ),
+    "solve_time": Metric(
+        "sudoku_solver_solve_seconds", "Time spent searching", TIME_BUCKETS
+    ),
+    "decode_time": Metric(
+        "sudoku_solver_decode_seconds", "Time spent decoding", TIME_BUCKETS
+    ),
+    "spawn_time": Metric(
+        "sudoku_solver_spawn_seconds",
+        "Time spent starting the external engines",
+        TIME_BUCKETS,
+    ),
+}
+"""the histogram of every counter of `SolverStats`"""
+RUNS_METRIC = "sudoku_solver_runs_total"
+
+
+@dataclass(slots=True)
+class Histogram:
+    """
+    A histogram with fixed buckets.
+
+    Attributes:
+    -----------
+    buckets: tuple[float, ...]
+        upper bounds of the buckets
+    counts: list[int]
+        number of the observations in every bucket (not cumulative),
+        the last one is `+Inf`
+    total: float
+        sum of the observations
+    count: int
+        number of the observations
+    maximum: float
+        the largest observation
+
+    Methods:
+    --------
+    observe(self, value: float) -> None:
+        records an observation
+    merge(self, other: Histogram) -> None:
+        adds the observations of another histogram with the same buckets
+    """
+
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)
+    total: float = 0.0
+    count: int = 0
+    maximum: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        """
+        Records an observation.
+
+        Parameters
+        -----------
+        value: float
+            the observed value
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Adds the observations of another histogram with the same buckets.
+
+        Parameters
+        -----------
+        other: Histogram
+            observations to be added
+        """
+        for bucket, count in enumerate(other.counts):
+            self.counts[bucket] += count
+        self.total += other.total
+        self.count += other.count
+        self.maximum = max(self.maximum, other.maximum)
+
+
+class SolverMetrics:
+    """
+    The counters of the solver runs aggregated into histograms
+    by the solver type and the grid size.
+
+    Only the counters kept by the engine are observed, zeros included,
+    e.g. there are no clauses outside of SAT, but a run without backtracks
+    falls into the lowest bucket.
+
+    Methods:
+    --------
+    record(self, solver: str, size: int, outcome: str, stats: SolverStats) -> None:
+        adds a run
+    merge(self, other: SolverMetrics) -> None:
+        adds the runs aggregated elsewhere, e.g. in a worker process
+    render(self) -> str:
+        the metrics in the Prometheus text format
+    summary(self) -> str:
+        a table with the number of runs, the mean and the maximum of every counter
+    """
+
+    _histograms: dict[tuple[str, str, int], Histogram]
+    _runs: dict[tuple[str, int, str], int]
+
+    def __init__(self) -> None:
+        self._histograms = {}
+        self._runs = {}
+
+    def record(self, solver: str, size: int, outcome: str, stats: SolverStats) -> None:
+        """
+        Adds a run.
+
+        Parameters
+        -----------
+        solver: str
+            the engine that ran, e.g. the winner of a portfolio
+        size: int
+            size of the puzzle
+        outcome: str
+            e.g. `solved`, `infeasible` or `timeout`
+        stats: SolverStats
+            counters of the run
+        """
+        key = (str(solver), size, outcome)
+        self._runs[key] = self._runs.get(key, 0) + 1
+        for name, value in stats.reported_items():
+            histogram = self._histograms.get((name, str(solver), size))
+            if histogram is None:
+                histogram = Histogram(SOLVER_METRICS[name].buckets)
+                self._histograms[name, str(solver), size] = histogram
+            histogram.observe(value)
+
+    def merge(self, other: "SolverMetrics") -> None:
+        """
+        Adds the runs aggregated elsewhere, e.g. in a worker process.
+
+        Parameters
+        -----------
+        other: SolverMetrics
+            runs to be added
+        """
+        for run_key, runs in other._runs.items():
+            self._runs[run_key] = self._runs.get(run_key, 0) + runs
+        for histogram_key, histogram in other._histograms.items():
+            mine = self._histograms.get(histogram_key)
+            if mine is None:
+                mine = Histogram(histogram.buckets)
+                self._histograms[histogram_key] = mine
+            mine.merge(histogram)
+
+    def render(self) -> str:
+        """
+        Formats the metrics in the Prometheus text format:
+        https://prometheus.io/docs/instrumenting/exposition_formats/
+
+        Returns
+        --------
+        text: str
+            a counter of the runs and a histogram of every counter,
+            labelled with `solver` and `size`
+        """
+        lines = [
+            f"# HELP {RUNS_METRIC} Solver runs by the outcome",
+            f"# TYPE {RUNS_METRIC} counter",
+        ]
+        for (solver, size, outcome), runs in sorted(self._runs.items()):
+            labels = f'solver="{solver}",size="{size}",outcome="{outcome}"'
+            lines.append(f"{RUNS_METRIC}{{{labels}}} {runs}")
+
+        for name, metric in SOLVER_METRICS.items():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} histogram")
+            for (counter, solver, size), histogram in sorted(self._histograms.items()):
+                if counter != name:
+                    continue
+                labels = f'solver="{solver}",size="{size}"'
+                cumulative = 0
+                bounds = [*map(_number, histogram.buckets), "+Inf"]
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{metric.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f"{metric.name}_sum{{{labels}}} {_number(histogram.total)}"
+                )
+                lines.append(f"{metric.name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        Formats the metrics as a tab-separated table for the command line.
+
+        Returns
+        --------
+        text: str
+            a row for every solver, size and counter with the number of
+            the runs that counted it, the mean and the maximum
+        """
+        order = list(SOLVER_METRICS)
+        lines = ["solver\tsize\tcounter\truns\tmean\tmax"]
+        for (counter, solver, size), histogram in sorted(
+            self._histograms.items(),
+            key=lambda item: (item[0][1], item[0][2], order.index(item[0][0])),
+        ):
+            mean = histogram.total / histogram.count
+            lines.append(
+                f"{solver}\t{size}\t{counter}\t{histogram.count}\t"
+                f"{_number(mean)}\t{_number(histogram.maximum)}"
+            )
+        return "\n".join(lines)
+
+
+def _number(value: float) -> str:
+    """
+    Formats a number without a needless fractional part, e.g. `10` or `0.0005`.
+    """
+    return str(int(value)) if float(value).is_integer() else f"{value:.6g}"
+
+
+_metrics = SolverMetrics()
+
+
+def get_metrics() -> SolverMetrics:
+    """
+    Returns the metrics of the service, they are recorded
+    in the event loop, so there's no locking.
+
+    Returns
+    --------
+    metrics: SolverMetrics
+        the shared metrics
+    """
+    return _metrics
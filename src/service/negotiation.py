@@ -0,0 +1,188 @@
+import gzip
+from collections.abc import Iterator
+from enum import StrEnum
+
+from fastapi import Response
+from src.model.grid import LINE_DIGITS, SudokuGrid
+from src.model.responses import SolveResponse
+from src.solvers.solver_type import SudokuSolverType
+
+SIZE_HEADER = "X-Sudoku-Size"
+SOLVED_BY_HEADER = "X-Sudoku-Solved-By"
+GZIP_MIN_BYTES = 1024
+"""smaller bodies are sent uncompressed, gzip wouldn't pay off"""
+GZIP_LEVEL = 1
+"""the fastest compression, the solutions compress well anyway"""
+
+
+class SolutionFormat(StrEnum):
+    """
+    Media types of the solution, in the order of preference:
+    - `JSON` - the `SolveResponse` object, the default
+    - `LINE` - the single-line format, one character per cell,
+      only for grids up to 35x35
+    - `BINARY` - the cells row by row, one byte each
+      (two little-endian bytes for grids larger than 255x255)
+
+    `LINE` and `BINARY` send the size and the engine in the headers.
+    """
+
+    JSON = "application/json"
+    LINE = "text/plain"
+    BINARY = "application/octet-stream"
+
+    def fits(self, size: int) -> bool:
+        """
+        Checks whether a solution of the given size can be sent in the format.
+        """
+        return self != SolutionFormat.LINE or size <= len(LINE_DIGITS)
+
+
+def _entries(header: str) -> Iterator[tuple[str, float]]:
+    """
+    Parses a header listing values with qualities, e.g. `Accept`.
+
+    Parameters
+    -----------
+    header: str
+        e.g. `text/plain, application/json;q=0.5`
+
+    Returns
+    --------
+    entries: Iterator[tuple[str, float]]
+        the values (lowercase) with their qualities, `1` by default
+    """
+    for entry in header.split(","):
+        value, *params = (part.strip() for part in entry.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        yield value.lower(), quality
+
+
+def _quality(accept: str, media_type: str) -> float:
+    """
+    Finds the quality the client assigned to the media type,
+    the most specific matching range decides.
+
+    Parameters
+    -----------
+    accept: str
+        value of the `Accept` header
+    media_type: str
+        a media type, e.g. `text/plain`
+
+    Returns
+    --------
+    quality: float
+        between `0` (not acceptable) and `1`
+    """
+    specific = {media_type: 2, f"{media_type.split('/')[0]}/*": 1, "*/*": 0}
+    best_specificity, best_quality = -1, 0.0
+    for media_range, quality in _entries(accept):
+        specificity = specific.get(media_range, -1)
+        if specificity > best_specificity:
+            best_specificity, best_quality = specificity, quality
+    return best_quality
+
+
+def choose_format(accept: str | None, size: int) -> SolutionFormat | None:
+    """
+    Picks the format of the solution preferred by the client.
+
+    Parameters
+    -----------
+    accept: str | None
+        value of the `Accept` header, anything is accepted if not given
+    size: int
+        size of the puzzle
+
+    Returns
+    --------
+    format: SolutionFormat | None
+        - the acceptable format with the highest quality,
+          ties are broken by the order of `SolutionFormat`
+        - `None` if no format is acceptable
+    """
+    if not accept:
+        return SolutionFormat.JSON
+    best, best_quality = None, 0.0
+    for solution_format in SolutionFormat:
+        if not solution_format.fits(size):
+            continue
+        quality = _quality(accept, solution_format.value)
+        if quality > best_quality:
+            best, best_quality = solution_format, quality
+    return best
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """
+    Checks whether the client accepts gzip-compressed responses.
+
+    Parameters
+    -----------
+    accept_encoding: str | None
+        value of the `Accept-Encoding` header
+
+    Returns
+    --------
+    accepted: bool
+        `True` if `gzip` (or `*`) is listed with a positive quality
+    """
+    if not accept_encoding:
+        return False
+    qualities = dict(_entries(accept_encoding))
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def solution_response(
+    solution: SudokuGrid,
+    solved_by: SudokuSolverType | None,
+    solution_format: SolutionFormat,
+    compress: bool = False,
+) -> Response:
+    """
+    Encodes the solution in the negotiated format.
+
+    Parameters
+    -----------
+    solution: SudokuGrid
+        the solution to be sent
+    solved_by: SudokuSolverType | None
+        the engine that found the solution, `None` if it was cached
+    solution_format: SolutionFormat
+        the format chosen by `choose_format`
+    compress: bool
+        whether to gzip the body (if it's large enough)
+
+    Returns
+    --------
+    response: Response
+        the encoded solution
+    """
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    match solution_format:
+        case SolutionFormat.JSON:
+            # the solution is valid already, only the serialization is needed
+            response = SolveResponse.model_construct(
+                solution=solution.to_list(), solved_by=solved_by
+            )
+            body = response.model_dump_json().encode()
+        case SolutionFormat.LINE:
+            body = solution.to_line().encode("ascii")
+        case SolutionFormat.BINARY:
+            body = solution.to_bytes()
+    if solution_format != SolutionFormat.JSON:
+        headers[SIZE_HEADER] = str(solution.size)
+        if solved_by is not None:
+            headers[SOLVED_BY_HEADER] = solved_by
+    if compress and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type=solution_format.value, headers=headers)
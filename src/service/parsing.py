@@ -0,0 +1,133 @@
+from timeit import default_timer as timer
+from typing import Any
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from src.model.grid import SudokuGrid
+from src.model.requests import GRID_CONTEXT, PuzzleRequest
+from src.service.negotiation import SIZE_HEADER
+from src.service.timing import RequestTiming
+
+BINARY_TYPE = "application/octet-stream"
+
+
+async def read_request[R: PuzzleRequest](
+    request: Request, model: type[R], timing: RequestTiming | None = None
+) -> R:
+    """
+    Reads and validates the body of a request carrying a puzzle.
+
+    The body is either a JSON object of the model, validated straight from
+    the bytes, or the packed cells (`application/octet-stream`, see
+    `SudokuGrid.to_bytes`) with the size in the `X-Sudoku-Size` header and
+    the other fields of the model in the query string. Either way the
+    puzzle is decoded into the grid's array only once.
+
+    Parameters
+    -----------
+    request: Request
+        the incoming request
+    model: type[R]
+        the model of the request
+    timing: RequestTiming | None
+        phases of the request, receives `validate` (the pydantic validation)
+        and `grid` (building and checking the grid), keeps the parsed request
+
+    Returns
+    --------
+    parsed: R
+        the validated request
+
+    Raises
+    -------
+    validation_error: RequestValidationError
+        when the body doesn't match the model, answered with `422`
+    """
+    body = await request.body()
+    started = timer()
+    grid_time = 0.0
+    try:
+        if request.headers.get("content-type", "").startswith(BINARY_TYPE):
+            grid = _read_cells(request, body)
+            grid_time = timer() - started
+            fields: dict[str, Any] = dict(request.query_params)
+            if "portfolio" in request.query_params:
+                fields["portfolio"] = request.query_params.getlist("portfolio")
+            parsed = model.model_validate(fields, context={GRID_CONTEXT: grid})
+        else:
+            parsed = model.model_validate_json(body)
+            grid_time = parsed.grid_time
+    except ValidationError as ex:
+        raise RequestValidationError(ex.errors(include_url=False), body=body)
+    finally:
+        if timing is not None:
+            timing.add("validate", timer() - started - grid_time)
+    if timing is not None:
+        timing.add("grid", grid_time)
+        timing.request = parsed
+    return parsed
+
+
+def _read_cells(request: Request, body: bytes) -> SudokuGrid:
+    """
+    Decodes the packed cells of a binary body.
+
+    Parameters
+    -----------
+    request: Request
+        the incoming request, with the size in the `X-Sudoku-Size` header
+    body: bytes
+        the body of the request
+
+    Returns
+    --------
+    grid: SudokuGrid
+        the checked puzzle
+    """
+    try:
+        size = int(request.headers[SIZE_HEADER])
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=422, detail=f"a binary puzzle requires the {SIZE_HEADER} header"
+        )
+    try:
+        return SudokuGrid.from_bytes(body, size)
+    except ValueError as ex:
+        raise HTTPException(status_code=422, detail=str(ex))
+
+
+def request_body(model: type[BaseModel]) -> dict[str, Any]:
+    """
+    Describes the body read by `read_request` for the OpenAPI schema,
+    as the endpoints reading it themselves don't get one generated.
+
+    Parameters
+    -----------
+    model: type[BaseModel]
+        the model of the request
+
+    Returns
+    --------
+    request_body: dict[str, Any]
+        the `requestBody` object of the OpenAPI operation
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    return {
+        "required": True,
+        "content": {
+            "application/json": {"schema": inline(schema)},
+            BINARY_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
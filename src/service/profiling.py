@@ -0,0 +1,75 @@
+import os
+import time
+import uuid
+
+from fastapi import Request
+from src.utils.profiling import ProfileFormat
+
+PROFILE_DIR_VARIABLE = "SUDOKU_PROFILE_DIR"
+PROFILE_HEADER = "X-Sudoku-Profile"
+"""requests a profile (`pstats` or `collapsed`), names the stored one in the response"""
+
+
+def profile_dir() -> str | None:
+    """
+    Returns the directory the request profiles are stored in.
+    Profiling is enabled only if the `SUDOKU_PROFILE_DIR` environment
+    variable is set, it's a debugging aid, not to be exposed to everyone.
+
+    Returns
+    --------
+    directory: str | None
+        the directory, `None` if profiling is disabled
+    """
+    return os.environ.get(PROFILE_DIR_VARIABLE) or None
+
+
+def requested_profile(request: Request) -> ProfileFormat | None:
+    """
+    Checks whether the client asks for a profile of the request
+    with the `X-Sudoku-Profile` header. The header is ignored
+    unless profiling is enabled, see `profile_dir`.
+
+    Parameters
+    -----------
+    request: Request
+        the incoming request
+
+    Returns
+    --------
+    profile_format: ProfileFormat | None
+        the format of the profile (`pstats` unless `collapsed` is asked for),
+        `None` if it's not to be profiled
+    """
+    value = request.headers.get(PROFILE_HEADER)
+    if value is None or profile_dir() is None:
+        return None
+    try:
+        return ProfileFormat(value.strip().lower())
+    except ValueError:
+        return ProfileFormat.PSTATS
+
+
+def new_profile_path(profile_format: ProfileFormat) -> tuple[str, str]:
+    """
+    Names a new profile in the profile directory, creating the directory.
+
+    Parameters
+    -----------
+    profile_format: ProfileFormat
+        the format of the profile
+
+    Returns
+    --------
+    name: str
+        name of the file, sent back in the `X-Sudoku-Profile` header
+    path: str
+        path of the file
+    """
+    directory = profile_dir()
+    if directory is None:
+        raise RuntimeError(f"profiling requires {PROFILE_DIR_VARIABLE}")
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"solve-{stamp}-{uuid.uuid4().hex[:8]}{profile_format.suffix}"
+    return name, os.path.abspath(os.path.join(directory, name))
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any
+
+from src.model.grid import LINE_DIGITS
+from src.service.timing import RequestTiming
+
+ACCESS_LOG_VARIABLE = "SUDOKU_ACCESS_LOG"
+SLOW_SECONDS_VARIABLE = "SUDOKU_SLOW_SECONDS"
+SLOW_LOG_VARIABLE = "SUDOKU_SLOW_LOG"
+DEFAULT_SLOW_LOG = "slow_requests.ndjson"
+
+
+def _json_logger(name: str, destination: str) -> logging.Logger:
+    """
+    Creates a logger writing one JSON document per line.
+
+    Parameters
+    -----------
+    name: str
+        name of the logger
+    destination: str
+        path of the file, `-` for stderr
+
+    Returns
+    --------
+    logger: logging.Logger
+        a logger not propagating to the root one
+    """
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    if destination == "-":
+        handler: logging.Handler = logging.StreamHandler(sys.stderr)
+    else:
+        handler = logging.FileHandler(destination, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+class RequestLog:
+    """
+    The structured logs of the service, both optional:
+    - the access log - a line for every request with its phases
+    - the slow requests - the requests taking longer than a threshold,
+      with the puzzle and the settings needed to replay them offline,
+      e.g. by posting the `request` back to the endpoint
+
+    Attributes:
+    -----------
+    access: logging.Logger | None
+        the access log, `None` if disabled
+    slow: logging.Logger | None
+        the log of the slow requests, `None` if disabled
+    slow_seconds: float
+        the threshold of the slow requests
+
+    Methods:
+    --------
+    record(self, method: str, path: str, status: int, timing: RequestTiming) -> None:
+        logs a finished request
+    """
+
+    access: logging.Logger | None
+    slow: logging.Logger | None
+    slow_seconds: float
+
+    def __init__(
+        self,
+        access: logging.Logger | None = None,
+        slow: logging.Logger | None = None,
+        slow_seconds: float = float("inf"),
+    ) -> None:
+        self.access = access
+        self.slow = slow
+        self.slow_seconds = slow_seconds
+
+    def record(
+        self, method: str, path: str, status: int, timing: RequestTiming
+    ) -> None:
+        """
+        Logs a finished request, `timing.finish()` has been called.
+
+        Parameters
+        -----------
+        method: str
+            the HTTP method
+        path: str
+            path of the endpoint
+        status: int
+            status code of the response
+        timing: RequestTiming
+            phases of the request
+        """
+        total = timing.phases.get("total", 0.0)
+        slow = self.slow is not None and total >= self.slow_seconds
+        if self.access is None and not slow:
+            return
+
+        entry: dict[str, Any] = {
+            "time": time.time(),
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration": total,
+        }
+        req = timing.request
+        if req is not None:
+            entry["size"] = req.grid.size
+            entry["solver"] = getattr(req, "solver", None)
+        entry["phases"] = timing.phases
+
+        if self.access is not None:
+            self.access.info(json.dumps(entry))
+        if slow and self.slow is not None and req is not None:
+            entry["request"] = _replayable(req)
+            self.slow.info(json.dumps(entry))
+
+
+def _replayable(req: Any) -> dict[str, Any]:
+    """
+    Describes the request so it can be posted again,
+    with the puzzle in the single-line format if it fits.
+
+    Parameters
+    -----------
+    req: PuzzleRequest
+        the parsed request
+
+    Returns
+    --------
+    request: dict[str, Any]
+        the JSON body of the request
+    """
+    body = req.model_dump(mode="json", exclude={"puzzle", "line", "cells", "size"})
+    grid = req.grid
+    if grid.size <= len(LINE_DIGITS):
+        return body | {"line": grid.to_line()}
+    return body | {"cells": grid.cells().tolist(), "size": grid.size}
+
+
+_log: RequestLog | None = None
+_log_lock = threading.Lock()
+
+
+def get_request_log() -> RequestLog:
+    """
+    Returns the logs of the service, configured on the first use:
+    - `SUDOKU_ACCESS_LOG` - path of the access log, `-` for stderr,
+      no access log if it is not set
+    - `SUDOKU_SLOW_SECONDS` - the threshold of the slow requests,
+      they are not sampled if it is not set
+    - `SUDOKU_SLOW_LOG` - path of the slow requests log, `-` for stderr,
+      `slow_requests.ndjson` if it is not set
+
+    Returns
+    --------
+    log: RequestLog
+        the shared logs
+    """
+    global _log
+    with _log_lock:
+        if _log is None:
+            access = os.environ.get(ACCESS_LOG_VARIABLE)
+            slow_seconds = os.environ.get(SLOW_SECONDS_VARIABLE)
+            slow = os.environ.get(SLOW_LOG_VARIABLE, DEFAULT_SLOW_LOG)
+            _log = RequestLog(
+                _json_logger("sudoku.access", access) if access else None,
+                _json_logger("sudoku.slow", slow) if slow_seconds else None,
+                float(slow_seconds) if slow_seconds else float("inf"),
+            )
+        return _log
@@ -0,0 +1,161 @@
+import time
+from collections.abc import Awaitable, Callable
+
+from src.model.grid import SudokuGrid
+from src.model.requests import SolveRequest
+from src.service.executor import get_executor
+from src.service.metrics import get_metrics
+from src.service.negotiation import SolutionFormat
+from src.service.tasks import canonicalize, profile_puzzle, solve_puzzle
+from src.service.timing import RequestTiming
+from src.solvers.cache import CacheLookup, get_cache
+from src.solvers.solver_type import SudokuSolverType
+
+
+async def solve(
+    req: SolveRequest,
+    wait: bool = False,
+    timing: RequestTiming | None = None,
+    disconnected: Callable[[], Awaitable[bool]] | None = None,
+) -> tuple[SudokuGrid | None, SudokuSolverType | None]:
+    """
+    Solves the puzzle from the request, consulting the solution cache first.
+
+    The puzzle is canonicalized in the shared executor (only if asked to,
+    it costs more than solving most of the 9x9 puzzles), the time it takes
+    counts towards the time limit. On a miss the puzzle is solved in the shared
+    executor and the outcome is cached, including infeasibility.
+    The counters of the run (a timed out one too) are added to the metrics.
+
+    Parameters
+    -----------
+    req: SolveRequest
+        the puzzle together with the solver settings
+    wait: bool
+        whether to wait for a free slot of the executor, see `SolverExecutor.run`
+    timing: RequestTiming | None
+        phases of the request, receives `cache`, the phases of the executor
+        and the ones reported by the solver
+    disconnected: Callable[[], Awaitable[bool]] | None
+        checks whether the client has gone away, the solver is cancelled then
+
+    Returns
+    --------
+    solution: SudokuGrid | None
+        - a sudoku solution if it has been found
+        - `None` if the puzzle is infeasible
+    solved_by: SudokuSolverType | None
+        the engine that answered, `None` if the answer was cached
+
+    Raises
+    -------
+    executor_overloaded: ExecutorOverloaded
+        when the executor is full and `wait` is `False`
+    timeout_error: TimeoutError
+        when the available time runs out or the client has disconnected
+    runtime_error: RuntimeError
+        when the worker process died
+    """
+    started = time.monotonic()
+    cache = get_cache()
+    lookup = CacheLookup(None)
+    if req.cache:
+        cache_started = time.monotonic()
+        canonical = None
+        if cache.accepts(req.grid):
+            canonical = await get_executor().run(
+                canonicalize,
+                req.grid,
+                time_limit=req.time_limit,
+                wait=wait,
+                disconnected=disconnected,
+            )
+        lookup = cache.lookup(canonical)
+        if timing is not None:
+            timing.add("cache", time.monotonic() - cache_started)
+        if lookup.hit:
+            return lookup.solution, None
+
+    time_limit = req.time_limit - (time.monotonic() - started)
+    if time_limit <= 0:
+        raise TimeoutError()
+    solution, solved_by, stats, timed_out = await get_executor().run(
+        solve_puzzle,
+        req,
+        time_limit=time_limit,
+        wait=wait,
+        timing=timing,
+        disconnected=disconnected,
+    )
+    if stats is not None:
+        if timing is not None:
+            timing.add_stats(stats)
+        outcome = (
+            "timeout" if timed_out else "infeasible" if solution is None else "solved"
+        )
+        get_metrics().record(solved_by, req.grid.size, outcome, stats)
+    if timed_out:
+        raise TimeoutError()
+    cache.store(lookup, solution)
+    return solution, solved_by
+
+
+async def solve_profiled(
+    req: SolveRequest,
+    body: bytes,
+    binary: bool,
+    solution_format: SolutionFormat,
+    path: str,
+    timing: RequestTiming | None = None,
+    disconnected: Callable[[], Awaitable[bool]] | None = None,
+) -> tuple[SudokuGrid | None, SudokuSolverType]:
+    """
+    Solves the puzzle from the request under the profiler, see `profile_puzzle`.
+    The cache is bypassed and the run is left out of the metrics,
+    as the profiler slows it down.
+
+    Parameters
+    -----------
+    req: SolveRequest
+        the puzzle together with the solver settings
+    body: bytes
+        the body of the request
+    binary: bool
+        whether the body holds the packed cells rather than JSON
+    solution_format: SolutionFormat
+        the format of the response
+    path: str
+        path of the profile
+    timing: RequestTiming | None
+        phases of the request
+    disconnected: Callable[[], Awaitable[bool]] | None
+        checks whether the client has gone away
+
+    Returns
+    --------
+    solution: SudokuGrid | None
+        - a sudoku solution if it has been found
+        - `None` if the puzzle is infeasible
+    solved_by: SudokuSolverType
+        the engine that answered
+
+    Raises
+    -------
+    the same as `solve`
+    """
+    solution, solved_by, stats, timed_out = await get_executor().run(
+        profile_puzzle,
+        req,
+        body,
+        binary,
+        solution_format,
+        path,
+        time_limit=req.time_limit,
+        timing=timing,
+        disconnected=disconnected,
+    )
+    if stats is not None and timing is not None:
+        timing.add_stats(stats)
+    if timed_out:
+        raise TimeoutError()
+    return solution, solved_by
@@ -0,0 +1,198 @@
+from timeit import default_timer as timer
+
+from src.model.grid import SudokuGrid
+from src.model.symmetry import Canonical
+from src.solvers.solver_type import SudokuSolverType
+from src.model.requests import SolveRequest
+from src.service.negotiation import SolutionFormat, solution_response
+from src.solvers.sat_solver import SatEncoding, SatSudokuValidator
+from src.solvers.stats import SolverStats, stats_enabled
+from src.utils.profiling import profiling
+
+
+def solve_puzzle(
+    req: SolveRequest, time_limit: float
+) -> tuple[SudokuGrid | None, SudokuSolverType, SolverStats | None, bool]:
+    """
+    Solves the puzzle from the request, runs in a worker process.
+    A timeout is returned instead of raised, so the counters of the run
+    still reach the service.
+
+    Parameters
+    -----------
+    req: SolveRequest
+        the puzzle together with the solver settings
+    time_limit: float
+        time (in seconds) left for the solver
+
+    Returns
+    --------
+    solution: SudokuGrid | None
+        - a sudoku solution if it has been found
+        - `None` if the solution has not been found
+    solved_by: SudokuSolverType
+        the engine that answered, it differs from `req.solver` for the portfolio
+    stats: SolverStats | None
+        counters of the run, `None` if disabled by `SUDOKU_STATS=0`
+    timed_out: bool
+        whether the time ran out
+    """
+    encoding = SatEncoding(req.at_most_one, req.redundant_constraints)
+    stats = SolverStats() if stats_enabled() else None
+    try:
+        solution, solved_by = req.solver.solve_by_engine(
+            req.grid, time_limit, req.presolve, encoding, req.portfolio, stats
+        )
+    except TimeoutError:
+        return None, req.solver, stats, True
+    return solution, solved_by, stats, False
+
+
+def profile_puzzle(
+    req: SolveRequest,
+    body: bytes,
+    binary: bool,
+    solution_format: SolutionFormat,
+    path: str,
+    time_limit: float,
+) -> tuple[SudokuGrid | None, SudokuSolverType, SolverStats | None, bool]:
+    """
+    Solves the puzzle like `solve_puzzle` under the profiler, runs in a worker
+    process, so the profile holds nothing but the request. To cover the grid
+    conversions of the service as well, the body is read again and the solution
+    is encoded in the negotiated format (and thrown away). The profile is written
+    even if the time runs out.
+
+    Parameters
+    -----------
+    req: SolveRequest
+        the puzzle together with the solver settings
+    body: bytes
+        the body of the request
+    binary: bool
+        whether the body holds the packed cells rather than JSON
+    solution_format: SolutionFormat
+        the format of the response
+    path: str
+        path of the profile, its format is picked by the suffix,
+        see `ProfileFormat.from_path`
+    time_limit: float
+        time (in seconds) left for the request
+
+    Returns
+    --------
+    the same as `solve_puzzle`
+    """
+    with profiling(path):
+        started = timer()
+        if binary:
+            SudokuGrid.from_bytes(body, req.grid.size)
+        else:
+            type(req).model_validate_json(body)
+        result = solve_puzzle(req, time_limit - (timer() - started))
+        solution, solved_by = result[:2]
+        if solution is not None:
+            solution_response(solution, solved_by, solution_format)
+    return result
+
+
+def canonicalize(puzzle: SudokuGrid, time_limit: float) -> Canonical | None:
+    """
+    Computes the canonical form of the puzzle for the solution cache,
+    runs in a worker process, so the service's event loop isn't held up.
+
+    Parameters
+    -----------
+    puzzle: SudokuGrid
+        the puzzle, already checked
+    time_limit: float
+        time (in seconds) left for the request
+
+    Returns
+    --------
+    canonical: Canonical | None
+        the canonical form of the puzzle, `None` if it can't be computed
+    """
+    return Canonical.of(puzzle)
+
+
+def validate_puzzle(puzzle: SudokuGrid, time_limit: float) -> bool:
+    """
+    Checks whether the puzzle has a unique solution, runs in a worker process.
+
+    Parameters
+    -----------
+    puzzle: SudokuGrid
+        the puzzle, already checked
+    time_limit: float
+        time (in seconds) left for the check
+
+    Returns
+    --------
+    valid: bool
+        `True` if there is a single solution to the puzzle
+    """
+    validator = SatSudokuValidator(puzzle, time_limit)
+    return validator.has_unique_solution()
+
+
+def count_solutions(puzzle: SudokuGrid, cap: int, time_limit: float) -> int:
+    """
+    Counts the solutions of the puzzle (up to `cap`), runs in a worker process.
+
+    Parameters
+    -----------
+    puzzle: SudokuGrid
+        the puzzle, already checked
+    cap: int
+        the maximal number of solutions to look for
+    time_limit: float
+        time (in seconds) left for counting
+
+    Returns
+    --------
+    count: int
+        the number of solutions, never more than `cap`
+    """
+    validator = SatSudokuValidator(puzzle, time_limit)
+    return validator.count_solutions(cap)
+
+
+def list_solutions(
+    puzzle: SudokuGrid, cap: int, shown: int, time_limit: float
+) -> tuple[list[SudokuGrid], int, bool]:
+    """
+    Counts the solutions of the puzzle (up to `cap`) and keeps the first `shown`
+    of them, runs in a worker process. Running out of time isn't an error,
+    the solutions found until then are returned.
+
+    Parameters
+    -----------
+    puzzle: SudokuGrid
+        the puzzle, already checked
+    cap: int
+        the maximal number of solutions to look for
+    shown: int
+        how many of the solutions to return
+    time_limit: float
+        time (in seconds) left for counting
+
+    Returns
+    --------
+    solutions: list[SudokuGrid]
+        the first `shown` solutions found
+    count: int
+        the number of solutions found, never more than `cap`
+    timed_out: bool
+        whether the time ran out before all of them were found
+    """
+    solutions: list[SudokuGrid] = []
+    count = 0
+    try:
+        for solution in SatSudokuValidator(puzzle, time_limit).solutions(cap):
+            if count < shown:
+                solutions.append(solution)
+            count += 1
+    except TimeoutError:
+        return solutions, count, True
+    return solutions, count, False
@@ -0,0 +1,132 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+from src.model.requests import PuzzleRequest
+from src.solvers.stats import SolverStats
+
+STATS_PHASES = {
+    "presolve_time": "presolve",
+    "encode_time": "encode",
+    "solve_time": "solve",
+    "decode_time": "decode",
+    "spawn_time": "spawn",
+}
+"""the phases taken from the counters of the solver run"""
+
+
+class RequestTiming:
+    """
+    Time spent in the phases of a single request, in the order they happened:
+    - `validate` - reading the body and the pydantic validation
+    - `grid` - decoding and checking the puzzle
+    - `cache` - looking the puzzle up in the solution cache
+    - `queue` - waiting for a solver process
+    - `worker` - running in the solver process, split further
+      (from `SolverStats`) into `presolve`, `encode`, `solve`, `decode`
+      and `spawn` where the engine reports them
+    - `serialize` - encoding the response
+    - `total` - the whole request
+
+    Attributes:
+    -----------
+    phases: dict[str, float]
+        time (in seconds) of every phase so far
+    request: PuzzleRequest | None
+        the parsed request, kept to describe a slow one
+    started: float
+        when the request started
+
+    Methods:
+    --------
+    add(self, phase: str, seconds: float) -> None:
+        adds time to a phase
+    measure(self, phase: str) -> Iterator[None]:
+        a context manager adding the time of its block to a phase
+    add_stats(self, stats: SolverStats) -> None:
+        adds the phases of a solver run
+    finish(self) -> float:
+        records the `total` phase
+    header(self) -> str:
+        formats the `Server-Timing` header
+    """
+
+    phases: dict[str, float]
+    request: PuzzleRequest | None
+    started: float
+
+    def __init__(self) -> None:
+        self.phases = {}
+        self.request = None
+        self.started = timer()
+
+    def add(self, phase: str, seconds: float) -> None:
+        """
+        Adds time to a phase.
+
+        Parameters
+        -----------
+        phase: str
+            name of the phase, a token of the `Server-Timing` header
+        seconds: float
+            time spent in the phase
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """
+        Adds the time of the block to a phase, even if it raises.
+
+        Parameters
+        -----------
+        phase: str
+            name of the phase
+        """
+        start = timer()
+        try:
+            yield
+        finally:
+            self.add(phase, timer() - start)
+
+    def add_stats(self, stats: SolverStats) -> None:
+        """
+        Adds the phases of a solver run, skipping the ones the engine
+        doesn't report.
+
+        Parameters
+        -----------
+        stats: SolverStats
+            counters of the run
+        """
+        for name, value in stats.items():
+            phase = STATS_PHASES.get(name)
+            if phase is not None and value:
+                self.add(phase, value)
+
+    def finish(self) -> float:
+        """
+        Records the `total` phase.
+
+        Returns
+        --------
+        total: float
+            time (in seconds) since the request started
+        """
+        total = timer() - self.started
+        self.phases["total"] = total
+        return total
+
+    def header(self) -> str:
+        """
+        Formats the `Server-Timing` header.
+
+        Returns
+        --------
+        header: str
+            e.g. `validate;dur=0.210, grid;dur=0.015`, the durations in milliseconds
+        """
+        return ", ".join(
+            f"{phase};dur={1000 * seconds:.3f}"
+            for phase, seconds in self.phases.items()
+        )
@@ -0,0 +1,321 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from timeit import default_timer as timer
+from src.solvers.solver import SudokuSolver
+from src.model.grid import SudokuGrid
+
+
+@dataclass(slots=True)
+class DancingLinks:
+    """
+    Knuth's dancing links network kept in flat integer arrays.
+
+    Node `0` is the root, nodes `1..columns` are the column headers
+    and the rest are the ones of the exact cover matrix.
+    Only the constraints not satisfied by the givens become columns
+    and only the candidates consistent with the givens become options.
+
+    Attributes:
+    -----------
+    left: list[int]
+        `left[node]` - the previous node in the node's row
+    right: list[int]
+        `right[node]` - the next node in the node's row
+    up: list[int]
+        `up[node]` - the previous node in the node's column
+    down: list[int]
+        `down[node]` - the next node in the node's column
+    column: list[int]
+        `column[node]` - the header of the node's column
+    size: list[int]
+        `size[header]` - number of the nodes left in the column
+    option: list[int]
+        `option[node]` - index of the option (row of the matrix) the node
+        belongs to, `-1` for the root and headers
+    options: list[tuple[int, int, int]]
+        `(row, col, val)` - the sudoku assignment corresponding to the option
+    """
+
+    left: list[int]
+    right: list[int]
+    up: list[int]
+    down: list[int]
+    column: list[int]
+    size: list[int]
+    option: list[int]
+    options: list[tuple[int, int, int]]
+
+    def cover(self, header: int) -> None:
+        """
+        Removes the column and all the options intersecting it.
+
+        Parameters
+        -----------
+        header: int
+            header of the column to be covered
+        """
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        i = down[header]
+        while i != header:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, header: int) -> None:
+        """
+        Reverts `cover(header)`, the covers must be undone in reverse order.
+
+        Parameters
+        -----------
+        header: int
+            header of the column to be uncovered
+        """
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, size = self.column, self.size
+
+        i = up[header]
+        while i != header:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    @staticmethod
+    def from_grid(grid: SudokuGrid) -> DancingLinks | None:
+        """
+        Builds the exact cover network of the sudoku puzzle.
+
+        There are four groups of constraints:
+        - every cell contains a value,
+        - every row contains every value,
+        - every column contains every value,
+        - every block contains every value.
+
+        Parameters
+        -----------
+        grid: SudokuGrid
+            a sudoku puzzle
+
+        Returns
+        --------
+        links: DancingLinks | None
+            - the network of the puzzle
+            - `None` if the givens violate a constraint
+        """
+        size = grid.size
+        block_size = grid.block_size
+        cells = size * size
+        values = grid.cells().tolist()
+
+        satisfied = [False] * (4 * cells)
+        for index, val in enumerate(values):
+            if val == 0:
+                continue
+            row, col = divmod(index, size)
+            for constraint in _constraints(size, block_size, row, col, val - 1):
+                if satisfied[constraint]:
+                    return None
+                satisfied[constraint] = True
+
+        header_of = [0] * (4 * cells)
+        headers = 0
+        for constraint in range(4 * cells):
+            if not satisfied[constraint]:
+                headers += 1
+                header_of[constraint] = headers
+
+        candidates: list[tuple[int, int, int, tuple[int, int, int, int]]] = []
+        for index, given in enumerate(values):
+            if given != 0:
+                continue
+            row, col = divmod(index, size)
+            for val in range(size):
+                constraints = _constraints(size, block_size, row, col, val)
+                if not any(satisfied[constraint] for constraint in constraints):
+                    candidates.append((row, col, val + 1, constraints))
+
+        # the size of the network is known now, the arrays are filled in place
+        nodes = headers + 1 + 4 * len(candidates)
+        left = [0] * nodes
+        right = [0] * nodes
+        up = [0] * nodes
+        down = [0] * nodes
+        column = [0] * nodes
+        size_of = [0] * (headers + 1)
+        option = [-1] * nodes
+        for node in range(headers + 1):
+            left[node] = (node - 1) % (headers + 1)
+            right[node] = (node + 1) % (headers + 1)
+            up[node] = down[node] = column[node] = node
+        options: list[tuple[int, int, int]] = []
+
+        first = headers + 1
+        for row, col, val, constraints in candidates:
+            for offset, constraint in enumerate(constraints):
+                node = first + offset
+                header = header_of[constraint]
+                left[node] = first + (offset - 1) % 4
+                right[node] = first + (offset + 1) % 4
+                up[node] = up[header]
+                down[node] = header
+                down[up[header]] = node
+                up[header] = node
+                column[node] = header
+                size_of[header] += 1
+                option[node] = len(options)
+            options.append((row, col, val))
+            first += 4
+
+        return DancingLinks(left, right, up, down, column, size_of, option, options)
+
+
+def _constraints(
+    size: int, block_size: int, row: int, col: int, val: int
+) -> tuple[int, int, int, int]:
+    """
+    Returns the constraints satisfied by putting the value in the cell.
+
+    Parameters
+    -----------
+    size: int
+        size of the puzzle, e.g. `9` for the classical one
+    block_size: int
+        size of the block, e.g. `3` for the classical sudoku
+    row: int
+        a row coordinate
+    col: int
+        a column coordinate
+    val: int
+        a zero-based value
+
+    Returns
+    --------
+    constraints: tuple[int, int, int, int]
+        indexes of the cell, row, column and block constraints
+    """
+    cells = size * size
+    block = (row // block_size) * block_size + col // block_size
+    return (
+        row * size + col,
+        cells + row * size + val,
+        2 * cells + col * size + val,
+        3 * cells + block * size + val,
+    )
+
+
+class AlgorithmXSudokuSolver(SudokuSolver):
+    """
+    Knuth's Algorithm X with dancing links, implemented in pure Python.
+    Contrary to `DancingLinksSudokuSolver` it runs in-process,
+    checks the deadline cooperatively and counts the visited nodes.
+
+    Properties:
+    -----------
+    nodes: int
+        number of options tried so far, kept in `stats`
+    """
+
+    REPORTED_STATS = ("nodes", "backtracks", "encode_time", "decode_time")
+
+    @property
+    def nodes(self) -> int:
+        return self.stats.nodes
+
+    def run_algorithm(self) -> SudokuGrid | None:
+        start = timer()
+        links = DancingLinks.from_grid(self._puzzle)
+        self.stats.encode_time = timer() - start
+        if links is None:
+            return None
+
+        chosen = self._search(links)
+        if chosen is None:
+            return None
+
+        start = timer()
+        for option in chosen:
+            row, col, val = links.options[option]
+            self._puzzle[row, col] = val
+        self.stats.decode_time = timer() - start
+        return self._puzzle
+
+    def _search(self, links: DancingLinks) -> list[int] | None:
+        """
+        Searches for an exact cover, always branching on the column
+        with the fewest options left.
+        The search is iterative, the stack holds the chosen nodes.
+        The deadline is checked every `token.check_every` nodes.
+
+        Parameters
+        -----------
+        links: DancingLinks
+            the network to be searched
+
+        Returns
+        --------
+        chosen: list[int] | None
+            - indexes of the options forming the cover
+            - `None` if there is no cover
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out
+        """
+        left, right, down = links.left, links.right, links.down
+        column, size = links.column, links.size
+        cover, uncover = links.cover, links.uncover
+        stats = self.stats
+        token = self.token
+        countdown = 1
+        stack: list[int] = []
+
+        while True:
+            if right[0] == 0:
+                return [links.option[node] for node in stack]
+
+            header = right[0]
+            j = right[header]
+            while j != 0 and size[header] > 0:
+                if size[j] < size[header]:
+                    header = j
+                j = right[j]
+
+            cover(header)
+            node = down[header]
+            while node == header:
+                uncover(header)
+                if not stack:
+                    return None
+                node = stack.pop()
+                stats.backtracks += 1
+                j = left[node]
+                while j != node:
+                    uncover(column[j])
+                    j = left[j]
+                header = column[node]
+                node = down[node]
+
+            stats.nodes += 1
+            countdown -= 1
+            if not countdown:
+                countdown = token.check()
+
+            stack.append(node)
+            j = right[node]
+            while j != node:
+                cover(column[j])
+                j = right[j]
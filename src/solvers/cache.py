@@ -0,0 +1,224 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+import numpy.typing as npt
+from src.model.grid import SudokuGrid
+from src.model.responses import CacheStatus
+from src.model.symmetry import Canonical
+
+CACHE_BYTES_VARIABLE = "SUDOKU_CACHE_BYTES"
+CACHE_MAX_SIZE_VARIABLE = "SUDOKU_CACHE_MAX_SIZE"
+ENTRY_OVERHEAD = 256
+"""approximate memory (in bytes) taken by a cache entry besides the grids"""
+
+
+@dataclass(frozen=True, slots=True)
+class CacheLookup:
+    """
+    A result of looking a puzzle up in the cache.
+
+    Attributes:
+    -----------
+    canonical: Canonical | None
+        canonical form of the puzzle, `None` if the puzzle isn't cacheable
+    hit: bool
+        whether the puzzle was found in the cache
+    solution: SudokuGrid | None
+        the cached solution of the puzzle, `None` on a miss or if the puzzle
+        is known to be infeasible
+    """
+
+    canonical: Canonical | None
+    hit: bool = False
+    solution: SudokuGrid | None = None
+
+
+class SolutionCache:
+    """
+    A memory-bounded LRU cache of solutions, keyed by the canonical forms
+    of the puzzles, so the puzzles equivalent up to the symmetries of sudoku
+    share the entry. Infeasible puzzles are cached as well.
+
+    Attributes:
+    -----------
+    max_bytes: int
+        memory budget of the cache
+    max_size: int
+        size of the largest grids to be canonicalized
+    hits: int
+        number of the lookups answered from the cache
+    misses: int
+        number of the lookups of the cacheable puzzles not found in the cache
+    skipped: int
+        number of the lookups of the puzzles that couldn't be canonicalized
+
+    Methods:
+    --------
+    accepts(self, puzzle: SudokuGrid) -> bool:
+        checks whether the puzzle is to be canonicalized
+    lookup(self, canonical: Canonical | None) -> CacheLookup:
+        looks the canonical form of a puzzle up in the cache
+    store(self, lookup: CacheLookup, solution: SudokuGrid | None) -> None:
+        stores the solution of the looked up puzzle
+    status(self) -> CacheStatus:
+        returns the size and the counters of the cache
+    """
+
+    max_bytes: int
+    max_size: int
+    hits: int
+    misses: int
+    skipped: int
+    _entries: OrderedDict[bytes, npt.NDArray[np.uint8] | None]
+    _bytes: int
+    _lock: threading.Lock
+
+    def __init__(self, max_bytes: int, max_size: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def bytes(self) -> int:
+        """approximate memory taken by the entries"""
+        return self._bytes
+
+    def accepts(self, puzzle: SudokuGrid) -> bool:
+        """
+        Checks whether the puzzle is small enough to be canonicalized.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle
+
+        Returns
+        --------
+        accepted: bool
+            `True` if the cache is enabled and the puzzle isn't too large
+        """
+        return puzzle.size <= self.max_size and self.max_bytes > 0
+
+    def lookup(self, canonical: Canonical | None) -> CacheLookup:
+        """
+        Looks the canonical form of a puzzle up in the cache. The form
+        is computed by the caller (see `Canonical.of`), in a worker process
+        of the service, so only the dictionary is touched here.
+
+        Parameters
+        -----------
+        canonical: Canonical | None
+            canonical form of the puzzle, `None` if the puzzle
+            isn't accepted or couldn't be canonicalized
+
+        Returns
+        --------
+        lookup: CacheLookup
+            the canonical form and the solution, if found
+        """
+        if canonical is None:
+            with self._lock:
+                self.skipped += 1
+            return CacheLookup(None)
+
+        key = canonical.key
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return CacheLookup(canonical)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            solution = self._entries[key]
+
+        if solution is None:
+            return CacheLookup(canonical, hit=True)
+        return CacheLookup(canonical, True, canonical.from_canonical(solution))
+
+    def store(self, lookup: CacheLookup, solution: SudokuGrid | None) -> None:
+        """
+        Stores the solution of the looked up puzzle,
+        evicting the least recently used entries if needed.
+
+        Parameters
+        -----------
+        lookup: CacheLookup
+            the result of `lookup` for the puzzle
+        solution: SudokuGrid | None
+            the solution of the puzzle, `None` if it's infeasible
+        """
+        canonical = lookup.canonical
+        if canonical is None or lookup.hit:
+            return
+
+        key = canonical.key
+        value = None if solution is None else canonical.to_canonical(solution)
+        cost = len(key) + (0 if value is None else value.nbytes) + ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                old_size = 0 if old_value is None else old_value.nbytes
+                self._bytes -= len(old_key) + old_size + ENTRY_OVERHEAD
+
+    def status(self) -> CacheStatus:
+        """
+        Returns the size and the counters of the cache.
+
+        Returns
+        --------
+        status: CacheStatus
+            number of the entries, hits, misses, etc.
+        """
+        with self._lock:
+            return CacheStatus(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                skipped=self.skipped,
+            )
+
+
+_cache: SolutionCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SolutionCache:
+    """
+    Returns the shared solution cache, creating it on the first use.
+    The memory budget is taken from `SUDOKU_CACHE_BYTES` (64 MiB by default),
+    the largest canonicalized grid size from `SUDOKU_CACHE_MAX_SIZE`
+    (`9` by default).
+
+    Returns
+    --------
+    cache: SolutionCache
+        the shared solution cache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SolutionCache(
+                int(os.environ.get(CACHE_BYTES_VARIABLE, 64 * 2**20)),
+                int(os.environ.get(CACHE_MAX_SIZE_VARIABLE, 9)),
+            )
+        return _cache
@@ -0,0 +1,468 @@
+import heapq
+import itertools
+import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from timeit import default_timer as timer
+
+CHECK_INTERVAL = 0.002
+"""how often (in seconds) a search aims to check its token"""
+MAX_CHECK_EVERY = 1 << 16
+"""the most search nodes between two checks of a token"""
+POLL_INTERVAL = 0.05
+"""how often (in seconds) a waiting engine looks at the cancel flags"""
+
+
+class CancelFlags:
+    """
+    Cancel flags in shared memory, a byte per slot, so a process can
+    cancel the work running in another one, e.g. the service cancels the
+    solve of a client that has gone away. The owner (the executor) creates
+    the flags and hands out the slots, the workers attach to them by name,
+    see `CancelFlag`.
+
+    Attributes:
+    -----------
+    slots: int
+        number of the flags
+
+    Properties:
+    -----------
+    name: str
+        name of the shared memory block
+
+    Methods:
+    --------
+    acquire(self) -> CancelFlag | None:
+        takes a free slot, cleared
+    release(self, flag: CancelFlag) -> None:
+        returns the slot
+    close(self) -> None:
+        releases the shared memory
+    """
+
+    slots: int
+    _memory: SharedMemory
+    _flags: memoryview
+    _free: list[int]
+    _lock: threading.Lock
+
+    def __init__(self, slots: int) -> None:
+        self.slots = slots
+        self._memory = SharedMemory(create=True, size=max(slots, 1))
+        flags = self._memory.buf
+        if flags is None:
+            raise OSError("the shared memory is not mapped")
+        self._flags = flags
+        self._flags[:slots] = bytes(slots)
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def acquire(self) -> "CancelFlag | None":
+        """
+        Takes a free slot and clears its flag.
+
+        Returns
+        --------
+        flag: CancelFlag | None
+            the flag of the slot, `None` if all the slots are taken
+        """
+        with self._lock:
+            if not self._free:
+                return None
+            slot = self._free.pop()
+        self._flags[slot] = 0
+        return CancelFlag(self.name, slot)
+
+    def set(self, flag: "CancelFlag") -> None:
+        """
+        Raises the flag, the work watching it stops.
+
+        Parameters
+        -----------
+        flag: CancelFlag
+            a flag acquired from these flags
+        """
+        self._flags[flag.slot] = 1
+
+    def release(self, flag: "CancelFlag") -> None:
+        """
+        Returns the slot of the flag, once nothing watches it anymore.
+
+        Parameters
+        -----------
+        flag: CancelFlag
+            a flag acquired from these flags
+        """
+        with self._lock:
+            self._free.append(flag.slot)
+
+    def close(self) -> None:
+        """
+        Releases the shared memory.
+        """
+        self._memory.close()
+        self._memory.unlink()
+
+
+_attached: dict[str, SharedMemory] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class CancelFlag:
+    """
+    A reference to a single flag of `CancelFlags`, it can be sent
+    to another process.
+    """
+
+    name: str
+    """name of the shared memory block"""
+    slot: int
+    """index of the flag"""
+
+    def is_set(self) -> bool:
+        """
+        Checks whether the flag has been raised.
+
+        Returns
+        --------
+        cancelled: bool
+            `True` if the work is to be cancelled
+        """
+        memory = _attached.get(self.name)
+        if memory is None:
+            try:
+                memory = SharedMemory(self.name, track=False)
+            except FileNotFoundError:
+                # the owner has gone, so there is no one to answer
+                return True
+            _attached[self.name] = memory
+        flags = memory.buf
+        # a closed block can't be raised anymore, there is no one to answer either
+        return flags is None or flags[self.slot] != 0
+
+
+_current_flag: ContextVar[CancelFlag | None] = ContextVar("cancel_flag", default=None)
+
+
+@contextmanager
+def cancel_scope(flag: CancelFlag | None) -> Iterator[None]:
+    """
+    Makes the tokens created in the block watch the flag.
+
+    Parameters
+    -----------
+    flag: CancelFlag | None
+        the flag raised to cancel the work, `None` for none
+    """
+    reset = _current_flag.set(flag)
+    try:
+        yield
+    finally:
+        _current_flag.reset(reset)
+
+
+class CancellationToken:
+    """
+    Tells a solver when to stop: after the deadline or once cancelled,
+    either by `cancel` or by raising the cancel flag of the current
+    `cancel_scope` (from another process).
+
+    Reading the clock at every search node is costly, so a search
+    calls `check` only every `check_every` nodes. The number adapts,
+    so the checks are about `CHECK_INTERVAL` apart however fast
+    the nodes are:
+
+        countdown = 1
+        while searching:
+            countdown -= 1
+            if not countdown:
+                countdown = token.check()
+            ...
+
+    Engines which can't poll (e.g. a SAT solver) are interrupted
+    by the shared timer thread instead, see `on_expiry`.
+
+    Attributes:
+    -----------
+    deadline: float
+        `default_timer()` value the work has to finish by
+    flag: CancelFlag | None
+        a flag raised by another process to cancel the work
+    check_every: int
+        number of the search nodes until the next check
+
+    Properties:
+    -----------
+    cancelled: bool
+        whether the work has been cancelled
+    remaining: float
+        time (in seconds) left until the deadline
+
+    Methods:
+    --------
+    cancel(self) -> None:
+        cancels the work
+    expired(self) -> bool:
+        checks whether the work is to stop now
+    check(self) -> int:
+        raises `TimeoutError` if the work is to stop, returns when to check next
+    on_expiry(self, callback: Callable[[], None]) -> Alarm:
+        calls back from the shared timer thread once the work is to stop
+    """
+
+    deadline: float
+    flag: CancelFlag | None
+    check_every: int
+    _cancelled: bool
+    _last_check: float
+
+    def __init__(self, time_limit: float, flag: CancelFlag | None = None) -> None:
+        """
+        Creates a token, watching the flag of the current `cancel_scope`
+        unless another one is given.
+
+        Parameters
+        -----------
+        time_limit: float
+            amount of time (in seconds) available to the work,
+            `math.inf` for no limit
+        flag: CancelFlag | None
+            a flag raised to cancel the work
+        """
+        self._last_check = timer()
+        self.deadline = self._last_check + time_limit
+        self.flag = flag if flag is not None else _current_flag.get()
+        self.check_every = 1
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        """
+        Cancels the work.
+        """
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancelled and self.flag is not None and self.flag.is_set():
+            self._cancelled = True
+        return self._cancelled
+
+    @property
+    def remaining(self) -> float:
+        return max(self.deadline - timer(), 0.0)
+
+    def expired(self) -> bool:
+        """
+        Checks whether the work is to stop now.
+
+        Returns
+        --------
+        expired: bool
+            `True` if the deadline has passed or the work has been cancelled
+        """
+        return timer() > self.deadline or self.cancelled
+
+    def check(self) -> int:
+        """
+        Checks whether the work is to stop and adapts the number of nodes
+        until the next check: doubled if the last ones were done in less
+        than half of `CHECK_INTERVAL`, halved if they took more than twice
+        as long.
+
+        Returns
+        --------
+        check_every: int
+            number of the search nodes until the next check
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the deadline has passed or the work has been cancelled
+        """
+        now = timer()
+        if now > self.deadline or self.cancelled:
+            raise TimeoutError()
+        elapsed = now - self._last_check
+        self._last_check = now
+        if elapsed < CHECK_INTERVAL / 2:
+            self.check_every = min(2 * self.check_every, MAX_CHECK_EVERY)
+        elif elapsed > 2 * CHECK_INTERVAL:
+            self.check_every = max(self.check_every // 2, 1)
+        return self.check_every
+
+    def on_expiry(self, callback: Callable[[], None]) -> "Alarm":
+        """
+        Calls back from the shared timer thread once the deadline passes
+        or the work is cancelled, e.g. to interrupt a SAT solver.
+
+        Parameters
+        -----------
+        callback: Callable[[], None]
+            a quick function, it's called at most once
+
+        Returns
+        --------
+        alarm: Alarm
+            cancel it when the work is done
+        """
+        return get_timer().schedule(self, callback)
+
+
+@dataclass(eq=False, slots=True)
+class Alarm:
+    """
+    A callback scheduled in the `SharedTimer`.
+    """
+
+    token: CancellationToken
+    """the token whose expiry fires the alarm"""
+    callback: Callable[[], None]
+    """called from the timer thread"""
+    active: bool = True
+    """whether the alarm is still to fire"""
+
+    def cancel(self) -> None:
+        """
+        Cancels the alarm. If it is firing right now, waits for the callback
+        to return, so the callback never runs after this.
+        """
+        get_timer().cancel(self)
+
+
+class SharedTimer:
+    """
+    A single thread firing the alarms of all the tokens of the process,
+    instead of a thread per solve. The alarms are kept in a heap by their
+    deadlines, the cancel flags of the pending ones are polled every
+    `POLL_INTERVAL`. There are only a few alarms pending at once,
+    one per solve running in the process.
+
+    The callbacks are called under the timer's lock, so `Alarm.cancel`
+    waits for a firing one; they must be quick and must not schedule
+    alarms themselves.
+
+    Methods:
+    --------
+    schedule(self, token: CancellationToken, callback: Callable[[], None]) -> Alarm:
+        schedules a callback for the token's expiry
+    cancel(self, alarm: Alarm) -> None:
+        cancels an alarm
+    """
+
+    _heap: list[tuple[float, int, Alarm]]
+    _counter: Iterator[int]
+    _condition: threading.Condition
+    _thread: threading.Thread | None
+
+    def __init__(self) -> None:
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, token: CancellationToken, callback: Callable[[], None]) -> Alarm:
+        """
+        Schedules a callback for the token's expiry.
+
+        Parameters
+        -----------
+        token: CancellationToken
+            the token to be watched
+        callback: Callable[[], None]
+            called once the token expires
+
+        Returns
+        --------
+        alarm: Alarm
+            the scheduled callback
+        """
+        alarm = Alarm(token, callback)
+        with self._condition:
+            heapq.heappush(self._heap, (token.deadline, next(self._counter), alarm))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="shared-timer", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return alarm
+
+    def cancel(self, alarm: Alarm) -> None:
+        """
+        Cancels an alarm, it's dropped from the heap lazily.
+
+        Parameters
+        -----------
+        alarm: Alarm
+            a scheduled alarm
+        """
+        with self._condition:
+            alarm.active = False
+
+    def _run(self) -> None:
+        with self._condition:
+            while True:
+                heap = self._heap
+                while heap and not heap[0][2].active:
+                    heapq.heappop(heap)
+                if not heap:
+                    self._condition.wait()
+                    continue
+
+                now = timer()
+                while heap and heap[0][0] <= now:
+                    self._fire(heapq.heappop(heap)[2])
+                for _, _, alarm in heap:
+                    if alarm.active and alarm.token.cancelled:
+                        self._fire(alarm)
+
+                wait = POLL_INTERVAL
+                if heap:
+                    wait = min(wait, max(heap[0][0] - timer(), 0.0))
+                self._condition.wait(wait)
+
+    @staticmethod
+    def _fire(alarm: Alarm) -> None:
+        if not alarm.active:
+            return
+        alarm.active = False
+        alarm.callback()
+
+
+_timer: SharedTimer | None = None
+_timer_lock = threading.Lock()
+
+
+def get_timer() -> SharedTimer:
+    """
+    Returns the timer of the process, its thread starts with the first alarm.
+
+    Returns
+    --------
+    timer: SharedTimer
+        the shared timer
+    """
+    global _timer
+    with _timer_lock:
+        if _timer is None:
+            _timer = SharedTimer()
+        return _timer
+
+
+def _forget_timer() -> None:
+    # a forked child doesn't inherit the thread, it starts its own timer
+    global _timer, _timer_lock
+    _timer = None
+    _timer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_timer)
@@ -0,0 +1,398 @@
+import multiprocessing
+import os
+import queue
+import threading
+from ctypes import CDLL, Array, c_int
+from multiprocessing.connection import Connection
+from multiprocessing.context import ForkServerContext
+from pathlib import Path
+from timeit import default_timer as timer
+
+import numpy as np
+from src.model.grid import SudokuGrid, cell_dtype
+from src.solvers.cancellation import POLL_INTERVAL, CancellationToken
+from src.solvers.stats import SolverStats
+
+LIB_PATH = Path(__file__).resolve().parents[2].joinpath("lib", "ss.so")
+MAX_SIZE = 256
+WORKERS_VARIABLE = "SUDOKU_DLX_WORKERS"
+
+
+def _serve(
+    connection: Connection, puzzle: Array[c_int], solution: Array[c_int]
+) -> None:
+    """
+    The main loop of a worker process.
+
+    The library is loaded once. Then, for every size received through
+    the connection, the puzzle is read from the `puzzle` buffer,
+    the solution is written into the `solution` buffer and the solver's
+    return code is sent back.
+
+    Parameters
+    -----------
+    connection: Connection
+        the worker's end of the pipe
+    puzzle: Array[c_int]
+        a shared buffer with the puzzle, `MAX_SIZE**2` cells
+    solution: Array[c_int]
+        a shared buffer for the solution, `MAX_SIZE**2` cells
+    """
+    lib = CDLL(str(LIB_PATH))
+    while True:
+        try:
+            size = connection.recv()
+        except EOFError:
+            return
+        cells = np.frombuffer(solution, dtype=np.intc, count=size * size)
+        cells.fill(0)
+        connection.send(lib.solve_puzzle(puzzle, c_int(size), solution))
+
+
+class DancingLinksWorker:
+    """
+    A single long-lived process running the external solver.
+
+    Attributes:
+    -----------
+    process: BaseProcess
+        the worker process
+    connection: Connection
+        the pool's end of the pipe
+    puzzle: Array[c_int]
+        a shared buffer the puzzle is written into
+    solution: Array[c_int]
+        a shared buffer the worker writes the solution into
+    """
+
+    def __init__(self, context: ForkServerContext) -> None:
+        self.puzzle = context.RawArray(c_int, MAX_SIZE * MAX_SIZE)
+        self.solution = context.RawArray(c_int, MAX_SIZE * MAX_SIZE)
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve,
+            args=(child, self.puzzle, self.solution),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def solve(self, puzzle: SudokuGrid, token: CancellationToken) -> SudokuGrid | None:
+        """
+        Solves the puzzle using the worker. The answer is awaited
+        in slices of `POLL_INTERVAL`, so a cancelled solve stops early.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle to be solved
+        token: CancellationToken
+            the deadline of the solve
+
+        Returns
+        --------
+        solution: SudokuGrid | None
+            `None` if the solver failed, otherwise a solution
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the worker did not answer in time or the solve is cancelled
+        eof_error: EOFError
+            when the worker died
+        """
+        size = puzzle.size
+        cells = np.frombuffer(self.puzzle, dtype=np.intc, count=size * size)
+        cells[:] = puzzle.cells()
+        self.connection.send(size)
+        while not self.connection.poll(min(token.remaining, POLL_INTERVAL)):
+            if token.expired():
+                raise TimeoutError()
+        if self.connection.recv() == 0:
+            return None
+
+        solution = np.frombuffer(self.solution, dtype=np.intc, count=size * size)
+        return SudokuGrid.trusted(solution.reshape(size, size).astype(cell_dtype(size)))
+
+    def kill(self) -> None:
+        """
+        Kills the worker process.
+        """
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class DancingLinksPool:
+    """
+    A pool of pre-warmed processes running the external dancing links solver.
+
+    Every worker loads the library once and exchanges puzzles with the pool
+    through shared `c_int` buffers. A worker that misses the deadline
+    (or whose solve is cancelled) is killed and replaced, the rest of the pool
+    is left untouched. If the replacement fails to start, the next solve
+    starts it again.
+
+    A pool without workers calls the library in the current process and
+    can't enforce the time limit. It is meant for processes which are killed
+    on the deadline anyway, e.g. the engines of a portfolio,
+    as daemonic processes can't start workers of their own.
+
+    Attributes:
+    -----------
+    workers: int
+        number of the worker processes, `0` to solve in the current process
+
+    Methods:
+    --------
+    solve(self, puzzle: SudokuGrid, token: CancellationToken,
+          stats: SolverStats | None) -> SudokuGrid | None:
+        solves the puzzle using one of the idle workers
+    close(self) -> None:
+        kills all the workers
+    """
+
+    workers: int
+    _context: ForkServerContext
+    _idle: queue.Queue[DancingLinksWorker]
+    _running: list[DancingLinksWorker]
+    _missing: int
+    _closed: bool
+    _lock: threading.Lock
+    _lib: CDLL | None
+
+    def __init__(self, workers: int) -> None:
+        if workers < 0:
+            raise ValueError("the number of workers can't be negative")
+        self.workers = workers
+        self._lib = None
+        self._context = multiprocessing.get_context("forkserver")
+        self._idle = queue.Queue()
+        self._running = []
+        self._missing = workers
+        self._closed = False
+        self._lock = threading.Lock()
+        self._respawn()
+
+    def solve(
+        self,
+        puzzle: SudokuGrid,
+        token: CancellationToken,
+        stats: SolverStats | None = None,
+    ) -> SudokuGrid | None:
+        """
+        Solves the puzzle using one of the idle workers.
+        Waiting for a worker counts towards the time limit.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle to be solved
+        token: CancellationToken
+            the deadline of the solve
+        stats: SolverStats | None
+            counters the run is added to, replacing a worker
+            (or loading the library) counts as spawning
+
+        Returns
+        --------
+        solution: SudokuGrid | None
+            `None` if the solver failed, otherwise a solution
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out or the solve is cancelled
+        runtime_error: RuntimeError
+            when the worker died, e.g. the library could not be loaded
+        """
+        if puzzle.size > MAX_SIZE:
+            raise ValueError(
+                f"puzzles larger than {MAX_SIZE}x{MAX_SIZE} are not supported"
+            )
+
+        if self.workers == 0:
+            return self._solve_here(puzzle, stats)
+
+        self._respawn(stats)
+        worker = None
+        while worker is None:
+            try:
+                worker = self._idle.get(timeout=min(token.remaining, POLL_INTERVAL))
+            except queue.Empty:
+                if token.expired():
+                    raise TimeoutError()
+
+        try:
+            result = worker.solve(puzzle, token)
+        except (EOFError, OSError) as ex:
+            self._replace(worker, stats)
+            raise RuntimeError("the dancing links worker died") from ex
+        except BaseException:
+            # e.g. a timeout, the worker may be still busy with the puzzle
+            self._replace(worker, stats)
+            raise
+        self._idle.put(worker)
+        return result
+
+    def _solve_here(
+        self, puzzle: SudokuGrid, stats: SolverStats | None = None
+    ) -> SudokuGrid | None:
+        """
+        Solves the puzzle in the current process, without a time limit.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle to be solved
+        stats: SolverStats | None
+            counters the run is added to
+
+        Returns
+        --------
+        solution: SudokuGrid | None
+            `None` if the solver failed, otherwise a solution
+        """
+        if self._lib is None:
+            start = timer()
+            self._lib = CDLL(str(LIB_PATH))
+            if stats is not None:
+                stats.spawn_time += timer() - start
+        size = puzzle.size
+        cells = (c_int * (size * size))(*puzzle.cells().tolist())
+        solution = (c_int * (size * size))()
+        if self._lib.solve_puzzle(cells, c_int(size), solution) == 0:
+            return None
+        return SudokuGrid.trusted(
+            np.array(solution, cell_dtype(size)).reshape(size, size)
+        )
+
+    def _replace(
+        self, worker: DancingLinksWorker, stats: SolverStats | None = None
+    ) -> None:
+        """
+        Kills the worker and puts a fresh one in its place.
+
+        Parameters
+        -----------
+        worker: DancingLinksWorker
+            a worker taken from the pool
+        stats: SolverStats | None
+            counters the time of starting the new worker is added to
+        """
+        worker.kill()
+        with self._lock:
+            if worker in self._running:
+                self._running.remove(worker)
+                self._missing += 1
+        self._respawn(stats)
+
+    def _respawn(self, stats: SolverStats | None = None) -> None:
+        """
+        Starts the workers missing from the pool. A worker that fails to start
+        stays missing, so it's started again by the next solve.
+
+        Parameters
+        -----------
+        stats: SolverStats | None
+            counters the time of starting the workers is added to
+        """
+        while True:
+            with self._lock:
+                if self._closed or self._missing == 0:
+                    return
+                self._missing -= 1
+            start = timer()
+            try:
+                worker = DancingLinksWorker(self._context)
+            except BaseException:
+                with self._lock:
+                    self._missing += 1
+                raise
+            if stats is not None:
+                stats.spawn_time += timer() - start
+            with self._lock:
+                closed = self._closed
+                if not closed:
+                    self._running.append(worker)
+            if closed:
+                worker.kill()
+                return
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """
+        Kills all the workers, the idle ones as well as the ones solving.
+        """
+        with self._lock:
+            self._closed = True
+            running, self._running = self._running, []
+        for worker in running:
+            worker.kill()
+
+
+_pool: DancingLinksPool | None = None
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    """
+    Returns the configured pool size.
+
+    Returns
+    --------
+    workers: int
+        value of the `SUDOKU_DLX_WORKERS` environment variable,
+        number of CPUs if it is not set
+    """
+    return int(os.environ.get(WORKERS_VARIABLE, os.cpu_count() or 1))
+
+
+def get_pool() -> DancingLinksPool:
+    """
+    Returns the shared pool, starting it on the first use.
+
+    Returns
+    --------
+    pool: DancingLinksPool
+        the shared pool of the dancing links workers
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DancingLinksPool(default_workers())
+        return _pool
+
+
+def start_pool(workers: int | None = None) -> DancingLinksPool:
+    """
+    (Re)starts the shared pool with the given number of workers.
+
+    Parameters
+    -----------
+    workers: int | None
+        number of the worker processes, `default_workers()` if not given,
+        `0` to call the library in the current process
+
+    Returns
+    --------
+    pool: DancingLinksPool
+        the shared pool of the dancing links workers
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = DancingLinksPool(default_workers() if workers is None else workers)
+        return _pool
+
+
+def stop_pool() -> None:
+    """
+    Kills the workers of the shared pool, if it has been started.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
@@ -3,7 +3,6 @@ from dataclasses import dataclass
 from typing import NewType
 from src.solvers.solver import SudokuSolver
 from src.model.grid import SudokuGrid
-from src.utils.recursion_limit import recursion_limit_set_to  # noqa
 
 
 Variable = NewType("Variable", tuple[int, int, int])
@@ -64,6 +63,22 @@ class State:
             )
         )
 
+    def domain_size(self, variable: Variable) -> int:
+        """
+        Return number of values available for the given variable.
+
+        Parameters
+        -----------
+        variable: Variable
+            a variable whose domain size we want to get
+
+        Returns
+        --------
+        size: int
+            number of values in the variable's domain
+        """
+        return len(self.domain(variable))
+
     def assign(self, variable: Variable, value: int) -> None:
         """
         Assigns a given value to a given variable.
@@ -95,7 +110,7 @@ class State:
         row, col, block = variable
         value = self.grid[row, col]
         self.grid[row, col] = 0
-        self.row_domais[row].add(int(value))
+        self.row_domains[row].add(int(value))
         self.col_domains[col].add(int(value))
         self.block_domains[block].add(int(value))
 
@@ -141,53 +156,408 @@ class State:
         )
 
 
+@dataclass(frozen=True, slots=True)
+class BitmaskState:
+    """
+    Represent the current state of the backtracking solver
+    using integer bitmasks instead of sets.
+
+    Bit `v` of a mask is set when value `v` is still available, e.g.
+        row_masks[5] = 0b11110
+    means the {1,2,3,4} can be assigned in row 5.
+
+    Attributes:
+    -----------
+    grid: SudokuGrid
+        a current state of the grid
+    free_variables: set[Variable]
+        set of the variables without assigned values
+    row_masks: list[int]
+        values available in the given row
+    col_masks: list[int]
+        values available in the given column
+    block_masks: list[int]
+        values available in the given block
+    """
+
+    grid: SudokuGrid
+    free_variables: set[Variable]
+    row_masks: list[int]
+    col_masks: list[int]
+    block_masks: list[int]
+
+    def domain_mask(self, variable: Variable) -> int:
+        """
+        Return a bitmask of values available for the given variable.
+
+        Parameters
+        -----------
+        variable: Variable
+            a variable whose domain we want to get
+
+        Returns
+        --------
+        mask: int
+            bitmask with bit `v` set for every available value `v`
+        """
+        row, col, block = variable
+        return self.row_masks[row] & self.col_masks[col] & self.block_masks[block]
+
+    def domain(self, variable: Variable) -> Domain:
+        """
+        Return domain (available values) for the given variable.
+
+        Parameters
+        -----------
+        variable: Variable
+            a variable whose domain we want to get
+
+        Returns
+        --------
+        domain: Domain
+            values available for the given domain
+        """
+        mask = self.domain_mask(variable)
+        values = set()
+        while mask:
+            lowest = mask & -mask
+            values.add(lowest.bit_length() - 1)
+            mask ^= lowest
+        return Domain(values)
+
+    def domain_size(self, variable: Variable) -> int:
+        """
+        Return number of values available for the given variable.
+
+        Parameters
+        -----------
+        variable: Variable
+            a variable whose domain size we want to get
+
+        Returns
+        --------
+        size: int
+            number of values in the variable's domain
+        """
+        return self.domain_mask(variable).bit_count()
+
+    def assign(self, variable: Variable, value: int) -> None:
+        """
+        Assigns a given value to a given variable.
+
+        Parameters
+        -----------
+        variable: Variable
+            variable to be assigned to
+        value: int
+            what value should we assign
+        """
+        self.free_variables.remove(variable)
+        row, col, block = variable
+        self.grid[row, col] = value
+        mask = ~(1 << int(value))
+        self.row_masks[row] &= mask
+        self.col_masks[col] &= mask
+        self.block_masks[block] &= mask
+
+    def remove_assignment(self, variable: Variable) -> None:
+        """
+        Removes a value assignment.
+
+        Parameters
+        -----------
+        variable: Variable
+            an already assigned variable
+        """
+        self.free_variables.add(variable)
+        row, col, block = variable
+        bit = 1 << int(self.grid[row, col])
+        self.grid[row, col] = 0
+        self.row_masks[row] |= bit
+        self.col_masks[col] |= bit
+        self.block_masks[block] |= bit
+
+    @staticmethod
+    def from_grid(grid: SudokuGrid) -> BitmaskState:
+        """
+        Creates an initial state for a given grid.
+
+        Parameters
+        -----------
+        grid: SudokuGrid
+            an initial state of the sudoku grid
+
+        Returns
+        --------
+        state: BitmaskState
+            a state matching the grid
+        """
+
+        free_variables: set[Variable] = set()
+        values = ((1 << grid.size) - 1) << 1
+        row_masks = [values] * grid.size
+        col_masks = [values] * grid.size
+        block_masks = [values] * grid.size
+
+        for (row, col), val in grid.enumerate():
+            block = grid.block_index(row, col)
+            bit = 1 << int(val)
+            if bit == 1:
+                free_variables.add(Variable((row, col, block)))
+                continue
+
+            if not row_masks[row] & col_masks[col] & block_masks[block] & bit:
+                raise ValueError("the puzzle contains repeated values")
+            row_masks[row] &= ~bit
+            col_masks[col] &= ~bit
+            block_masks[block] &= ~bit
+
+        return BitmaskState(
+            grid.copy(),
+            free_variables,
+            row_masks,
+            col_masks,
+            block_masks,
+        )
+
+
+class MrvIndex:
+    """
+    Keeps the free variables in buckets by their domain size,
+    so the most constrained variable can be found without scanning all of them.
+
+    Every change is recorded on a trail, so `undo` can restore
+    the index in the reverse order after a backtrack.
+
+    Attributes:
+    -----------
+    state: BitmaskState
+        a state whose variables are indexed
+    sizes: dict[Variable, int]
+        current domain size of every free variable
+    buckets: list[set[Variable]]
+        free variables grouped by their domain size, e.g.
+            buckets[2] = {(0, 1, 0), (4, 4, 4)}
+        means both variables have exactly two values available
+    peers: dict[Variable, list[Variable]]
+        variables sharing a row, a column or a block with the given one
+    """
+
+    state: BitmaskState
+    sizes: dict[Variable, int]
+    buckets: list[set[Variable]]
+    peers: dict[Variable, list[Variable]]
+    _trail: list[tuple[Variable, int]]
+    _marks: list[int]
+    _lowest: int
+
+    def __init__(self, state: BitmaskState) -> None:
+        self.state = state
+        self.sizes = {}
+        self.buckets = [set() for _ in range(state.grid.size + 1)]
+        self.peers = {}
+        self._trail = []
+        self._marks = []
+        self._lowest = 0
+
+        units: dict[tuple[int, int], list[Variable]] = {}
+        for variable in state.free_variables:
+            size = state.domain_size(variable)
+            self.sizes[variable] = size
+            self.buckets[size].add(variable)
+            for unit in enumerate(variable):
+                units.setdefault(unit, []).append(variable)
+
+        for variable in state.free_variables:
+            peers = {peer for unit in enumerate(variable) for peer in units[unit]}
+            peers.discard(variable)
+            self.peers[variable] = list(peers)
+
+    def select(self) -> tuple[Variable | None, int]:
+        """
+        Finds a free variable with the smallest domain.
+
+        Returns
+        --------
+        variable: Variable | None
+            a variable with the smallest domain, `None` if there are no free variables
+        scanned: int
+            number of buckets inspected to find the variable
+        """
+        buckets = self.buckets
+        scanned = 1
+        while self._lowest < len(buckets) and not buckets[self._lowest]:
+            self._lowest += 1
+            scanned += 1
+        if self._lowest == len(buckets):
+            return None, scanned
+        return next(iter(buckets[self._lowest])), scanned
+
+    def assign(self, variable: Variable) -> None:
+        """
+        Updates the index after the variable has been assigned in the state.
+        Only the free peers of the variable are touched.
+
+        Parameters
+        -----------
+        variable: Variable
+            a freshly assigned variable
+        """
+        self._marks.append(len(self._trail))
+        size = self.sizes.pop(variable)
+        self.buckets[size].remove(variable)
+        self._trail.append((variable, size))
+
+        for peer in self.peers[variable]:
+            old_size = self.sizes.get(peer)
+            if old_size is None:
+                continue
+            new_size = self.state.domain_size(peer)
+            if new_size == old_size:
+                continue
+            self.buckets[old_size].remove(peer)
+            self.buckets[new_size].add(peer)
+            self.sizes[peer] = new_size
+            self._trail.append((peer, old_size))
+            if new_size < self._lowest:
+                self._lowest = new_size
+
+    def undo(self) -> None:
+        """
+        Reverts the most recent `assign`.
+        """
+        mark = self._marks.pop()
+        while len(self._trail) > mark + 1:
+            peer, old_size = self._trail.pop()
+            self.buckets[self.sizes[peer]].remove(peer)
+            self.buckets[old_size].add(peer)
+            self.sizes[peer] = old_size
+
+        variable, size = self._trail.pop()
+        self.sizes[variable] = size
+        self.buckets[size].add(variable)
+        if size < self._lowest:
+            self._lowest = size
+
+
 class FirstFailSudokuSolver(SudokuSolver):
     """
     A first-fail backtracking sudoku solver.
     It first tries to fill cells with smallest number of available values.
+
+    Attributes:
+    -----------
+    selections: int
+        number of candidates examined while choosing variables
+
+    Properties:
+    -----------
+    nodes: int
+        number of search nodes visited so far, kept in `stats`
     """
 
-    state: State
+    REPORTED_STATS = ("nodes", "backtracks")
+
+    state: State | BitmaskState
+    state_type: type[State | BitmaskState] = State
+    selections: int
 
     def __init__(self, puzzle, time_limit):
         super().__init__(puzzle, time_limit)
-        self.state = State.from_grid(puzzle)
+        self.state = self.state_type.from_grid(puzzle)
+        self.selections = 0
+
+    @property
+    def nodes(self) -> int:
+        return self.stats.nodes
 
     def run_algorithm(self) -> SudokuGrid | None:
-        with recursion_limit_set_to(self._puzzle.size**3):
-            if self._dfs():
-                return self.state.grid
-            return None
+        if self._search():
+            return self.state.grid
+        return None
 
-    def _dfs(self) -> bool:
+    def _search(self) -> bool:
         """
         Performs a first-fail depth-first-search to solve the sudoku puzzle.
         It always chooses a variable with the smallest domain and tries it first.
 
+        The choice points are kept in preallocated lists instead of the call
+        stack, so the search is not limited by the recursion depth. There's
+        at most one choice point per free variable: at `level` the variable
+        `variables[level]` is tried with the values `domains[level]`,
+        `tried[level]` of them have been tried already. The deadline
+        is checked every `token.check_every` nodes.
+
         Returns
         --------
         solved: bool
             `True` - if method found the solution
             `False` - otherwise
         """
+        stats = self.stats
+        depth = len(self.state.free_variables)
+        # the placeholders are overwritten before they're used
+        variables = [Variable((0, 0, 0))] * depth
+        domains: list[list[int]] = [[]] * depth
+        tried = [0] * depth
+        token = self.token
+        countdown = 1
+
+        level = 0
+        descend = True
+        while True:
+            if descend:
+                stats.nodes += 1
+                var_dom = self._choose_variable()
+                if var_dom is None:
+                    return True
+
+                countdown -= 1
+                if not countdown:
+                    countdown = token.check()
+
+                variables[level], domain = var_dom
+                domains[level] = list(domain)
+                tried[level] = 0
+            else:
+                self._remove_assignment(variables[level])
+                stats.backtracks += 1
+
+            if tried[level] < len(domains[level]):
+                value = domains[level][tried[level]]
+                tried[level] += 1
+                self._assign(variables[level], value)
+                level += 1
+                descend = True
+            elif level == 0:
+                return False
+            else:
+                level -= 1
+                descend = False
+
+    def _assign(self, variable: Variable, value: int) -> None:
+        """
+        Assigns a given value to a given variable.
 
-        var_dom = self._choose_variable()
-
-        if var_dom is None:
-            return True
-
-        if self._timeout():
-            raise TimeoutError()
-
-        variable, domain = var_dom
+        Parameters
+        -----------
+        variable: Variable
+            variable to be assigned to
+        value: int
+            what value should we assign
+        """
+        self.state.assign(variable, value)
 
-        for value in domain:
-            self.state.assign(variable, value)
-            if self._dfs():
-                return True
-            self.state.remove_assignment(variable)
+    def _remove_assignment(self, variable: Variable) -> None:
+        """
+        Removes a value assignment.
 
-        return False
+        Parameters
+        -----------
+        variable: Variable
+            an already assigned variable
+        """
+        self.state.remove_assignment(variable)
 
     def _choose_variable(self) -> tuple[Variable, Domain] | None:
         """
@@ -202,5 +572,43 @@ class FirstFailSudokuSolver(SudokuSolver):
         if len(self.state.free_variables) == 0:
             return None
 
-        var_doms = [(var, self.state.domain(var)) for var in self.state.free_variables]
-        return min(var_doms, key=lambda var_dom: len(var_dom[1]))
+        self.selections += len(self.state.free_variables)
+        variable = min(self.state.free_variables, key=self.state.domain_size)
+        return variable, self.state.domain(variable)
+
+
+class BitmaskFirstFailSudokuSolver(FirstFailSudokuSolver):
+    """
+    A first-fail backtracking sudoku solver keeping the domains as bitmasks.
+    """
+
+    state_type = BitmaskState
+
+
+class IncrementalFirstFailSudokuSolver(BitmaskFirstFailSudokuSolver):
+    """
+    A first-fail backtracking sudoku solver keeping the domains as bitmasks
+    and the free variables in an incrementally updated `MrvIndex`.
+    """
+
+    state: BitmaskState
+    index: MrvIndex
+
+    def __init__(self, puzzle, time_limit):
+        super().__init__(puzzle, time_limit)
+        self.index = MrvIndex(self.state)
+
+    def _assign(self, variable: Variable, value: int) -> None:
+        self.state.assign(variable, value)
+        self.index.assign(variable)
+
+    def _remove_assignment(self, variable: Variable) -> None:
+        self.index.undo()
+        self.state.remove_assignment(variable)
+
+    def _choose_variable(self) -> tuple[Variable, Domain] | None:
+        variable, scanned = self.index.select()
+        self.selections += scanned
+        if variable is None:
+            return None
+        return variable, self.state.domain(variable)
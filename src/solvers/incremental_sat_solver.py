@@ -0,0 +1,18 @@
+from src.model.grid import SudokuGrid
+from src.solvers.sat_pool import MAX_WARM_SIZE, get_sat_pool
+from src.solvers.sat_solver import SatSudokuSolver
+
+
+class IncrementalSatSudokuSolver(SatSudokuSolver):
+    """
+    A SAT-based sudoku solver reusing warm solvers, one per grid size,
+    loaded with the constraints shared by all the puzzles of the size.
+    The givens are passed as assumptions, see `src.solvers.sat_pool`.
+    Grids larger than `MAX_WARM_SIZE` are encoded from scratch,
+    as by `SatSudokuSolver`.
+    """
+
+    def run_algorithm(self) -> SudokuGrid | None:
+        if self._puzzle.size > MAX_WARM_SIZE:
+            return super().run_algorithm()
+        return get_sat_pool().solve(self._puzzle, self.token, self.encoding, self.stats)
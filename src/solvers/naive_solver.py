@@ -1,72 +1,21 @@
-import numpy as np
 from src.solvers.solver import SudokuSolver
 from src.model.grid import SudokuGrid
-from src.utils.recursion_limit import recursion_limit_set_to  # noqa
 
 
 class NaiveSudokuSolver(SudokuSolver):
     """
     A naive sudoku solver inspired by https://www.geeksforgeeks.org/sudoku-backtracking-7/.
+    It counts the values tried as `stats.nodes` and the values taken back
+    as `stats.backtracks`.
     """
 
-    def run_algorithm(self) -> SudokuGrid | None:
-        with recursion_limit_set_to(self._puzzle.size**3):
-            if self._dfs(0, 0):
-                return self._puzzle
-            return None
-
-    def _increment_coordinates(self, row: int, col: int) -> tuple[int, int]:
-        """
-        Increments the coordinates (moves to the next cell).
-
-        Parameters
-        -----------
-        row: int
-            a row coordinate
-        col: int
-            a column coordinate
-
-        Returns
-        --------
-        next_coords: tuple[int,int]
-            coordinates (row, col) of the next cell
-        """
-        if col < self._puzzle.size - 1:
-            return row, col + 1
-        else:
-            return row + 1, 0
-
-    def _is_excluded(self, row: int, col: int, val: int) -> bool:
-        """
-        Checks whether a given value can be put in the specified cell.
-
-        Parameters
-        -----------
-        row: int
-            a row coordinate
-        col: int
-            a column coordinate
-        val: int
-            a value to be stored in the cell
+    REPORTED_STATS = ("nodes", "backtracks")
 
-        Returns
-        --------
-        excluded: bool
-            - `True` if the value can**not** be put in the cell
-            - `False` otherwise
-        """
-        if np.uint(val) in self._puzzle[row]:
-            return True
-        if val in self._puzzle[:, col]:
-            return True
-        block_index = self._puzzle.block_index(row, col)
-        return val in self._puzzle.block(block_index)
-
-    def _dfs(self, row: int, col: int) -> bool:
+    def run_algorithm(self) -> SudokuGrid | None:
         """
         Performs a depth-first-search to solve the sudoku puzzle.
-        Basically, it tries to put any acceptable value at the current cell
-        and then moves to the next cell recursively.
+        Basically, it tries to put the lowest acceptable value at the current
+        empty cell and then moves to the next one, row by row.
 
         It may happen that it is impossible to find any
         acceptable value for the given cell.
@@ -76,37 +25,73 @@ class NaiveSudokuSolver(SudokuSolver):
         - https://en.wikipedia.org/wiki/Backtracking
         - https://www.geeksforgeeks.org/introduction-to-backtracking-2/
 
-        Parameters
-        -----------
-        row: int
-            row coordinate of the currently considered cell
-        col: int
-            column coordinate of the currently considered cell
+        The search keeps its choice points in preallocated lists instead of
+        the call stack, so it's not limited by the recursion depth: `placed[i]`
+        is the value in the `i`-th empty cell, `0` until it's filled.
+        The values used in every row, column and block are kept as bitmasks,
+        bit `v` is set when value `v` is used. The deadline is checked
+        every `token.check_every` steps, not to read the clock at every one.
 
         Returns
         --------
-        solved: bool
-            `True` - if method found the solution
-            `False` - otherwise
+        solution: SudokuGrid | None:
+            - a sudoku solution if it has been found
+            - `None` if the solution has not been found
         """
-
-        if row >= self._puzzle.size:
-            return True
-
-        if self._timeout():
-            raise TimeoutError()
-
-        if self._puzzle[row, col] > 0:
-            new_row, new_col = self._increment_coordinates(row, col)
-            return self._dfs(new_row, new_col)
-
-        for val in range(self._puzzle.size + 1):
-            if self._is_excluded(row, col, val):
+        grid = self._puzzle
+        size = grid.size
+        stats = self.stats
+        rows = [0] * size
+        cols = [0] * size
+        blocks = [0] * size
+        cells: list[tuple[int, int, int]] = []
+        for (row, col), val in grid.enumerate():
+            block = grid.block_index(row, col)
+            if val == 0:
+                cells.append((row, col, block))
                 continue
-            self._puzzle[row, col] = val
-            new_row, new_col = self._increment_coordinates(row, col)
-            if self._dfs(new_row, new_col):
-                return True
-            self._puzzle[row, col] = 0
+            bit = 1 << int(val)
+            rows[row] |= bit
+            cols[col] |= bit
+            blocks[block] |= bit
+
+        token = self.token
+        countdown = 1
+        placed = [0] * len(cells)
+        level = 0
+        while 0 <= level < len(cells):
+            countdown -= 1
+            if not countdown:
+                countdown = token.check()
+
+            row, col, block = cells[level]
+            value = placed[level]
+            if value:
+                bit = 1 << value
+                rows[row] ^= bit
+                cols[col] ^= bit
+                blocks[block] ^= bit
+                stats.backtracks += 1
+
+            used = rows[row] | cols[col] | blocks[block]
+            value += 1
+            while value <= size and used >> value & 1:
+                value += 1
+            if value > size:
+                placed[level] = 0
+                level -= 1
+                continue
+
+            bit = 1 << value
+            rows[row] |= bit
+            cols[col] |= bit
+            blocks[block] |= bit
+            placed[level] = value
+            stats.nodes += 1
+            level += 1
 
-        return False
+        if level < 0:
+            return None
+        for (row, col, _), value in zip(cells, placed):
+            grid[row, col] = value
+        return grid
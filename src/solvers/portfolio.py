@@ -0,0 +1,405 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from multiprocessing.connection import Connection, wait
+from multiprocessing.context import ForkServerContext
+from timeit import default_timer as timer
+from typing import TYPE_CHECKING, Any, cast
+
+from src.model.grid import SudokuGrid
+from src.solvers.cancellation import POLL_INTERVAL, CancellationToken
+from src.solvers.dancing_links_pool import start_pool
+from src.solvers.sat_solver import SatEncoding
+from src.solvers.stats import SolverStats
+
+if TYPE_CHECKING:
+    from src.solvers.solver_type import SudokuSolverType
+
+PORTFOLIO_VARIABLE = "SUDOKU_PORTFOLIO"
+DEFAULT_PORTFOLIO = ("sat", "dancing_links", "first_fail_bitmask")
+
+
+def _serve(connection: Connection, engine: SudokuSolverType) -> None:
+    """
+    The main loop of an engine process.
+
+    For every task received through the connection the engine solves
+    the puzzle and sends back the outcome: `("solved", cells)`,
+    `("infeasible", None)`, `("timeout", None)` or `("error", message)`,
+    together with the counters of the run if the task asks for them.
+
+    Parameters
+    -----------
+    connection: Connection
+        the engine's end of the pipe
+    engine: SudokuSolverType
+        the solver run by the process
+    """
+    if engine == "dancing_links":
+        # the engine is killed on the deadline, no need for another process
+        start_pool(0)
+    while True:
+        try:
+            cells, time_limit, presolve, encoding, measure = connection.recv()
+        except EOFError:
+            return
+        stats = SolverStats() if measure else None
+        try:
+            solution = engine.solve(
+                SudokuGrid.trusted(cells), time_limit, presolve, encoding, stats
+            )
+        except TimeoutError:
+            connection.send(("timeout", None, stats))
+        except Exception as ex:
+            connection.send(("error", str(ex), stats))
+        else:
+            if solution is None:
+                connection.send(("infeasible", None, stats))
+            else:
+                solved = solution.cells().reshape(cells.shape)
+                connection.send(("solved", solved, stats))
+
+
+class EngineWorker:
+    """
+    A single long-lived process running one of the portfolio's engines.
+
+    Attributes:
+    -----------
+    engine: SudokuSolverType
+        the solver run by the process
+    process: BaseProcess
+        the engine process
+    connection: Connection
+        the portfolio's end of the pipe
+    """
+
+    def __init__(self, context: ForkServerContext, engine: SudokuSolverType) -> None:
+        self.engine = engine
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, engine), daemon=True)
+        self.process.start()
+        child.close()
+
+    def submit(
+        self,
+        puzzle: SudokuGrid,
+        time_limit: float,
+        presolve: bool,
+        encoding: SatEncoding,
+        measure: bool = False,
+    ) -> None:
+        """
+        Sends the puzzle to the engine, the outcome is read from `connection`.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle to be solved
+        time_limit: float
+            amount of time (in seconds) available to the engine
+        presolve: bool
+            whether to fill the naked and hidden singles before the search
+        encoding: SatEncoding
+            the encoding used by the SAT engine
+        measure: bool
+            whether the engine sends back the counters of the run
+        """
+        cells = puzzle.cells().reshape(puzzle.size, puzzle.size)
+        self.connection.send((cells, time_limit, presolve, encoding, measure))
+
+    def kill(self) -> None:
+        """
+        Kills the engine process.
+        """
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class Portfolio:
+    """
+    Races several engines on the same puzzle, each in its own process.
+
+    The first definitive answer (a solution or infeasibility) wins,
+    the engines still running are killed and replaced by fresh processes,
+    so they are warm for the next race. The replacements are started
+    by a background thread, the answer doesn't wait for them; a race
+    that finds an engine still missing starts it itself. An engine that
+    fails or runs out of time doesn't stop the others. A cancelled race
+    (see `cancel_scope`) replaces all of its engines as if they missed
+    the deadline.
+
+    Methods:
+    --------
+    race(self, puzzle: SudokuGrid, time_limit: float,
+         engines: list[SudokuSolverType], presolve: bool, encoding: SatEncoding,
+         stats: SolverStats | None) -> tuple[SudokuGrid | None, SudokuSolverType]:
+        solves the puzzle with the first engine to finish
+    close(self) -> None:
+        kills all the engine processes
+    """
+
+    _context: ForkServerContext
+    _idle: dict[SudokuSolverType, list[EngineWorker]]
+    _retired: list[EngineWorker]
+    _missing: dict[SudokuSolverType, int]
+    _respawning: bool
+    _closed: bool
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        self._context = multiprocessing.get_context("forkserver")
+        self._idle = {}
+        self._retired = []
+        self._missing = {}
+        self._respawning = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _take(
+        self, engine: SudokuSolverType, stats: SolverStats | None = None
+    ) -> EngineWorker:
+        with self._lock:
+            idle = self._idle.setdefault(engine, [])
+            if idle:
+                return idle.pop()
+            # the replacement isn't ready yet, it's started right here instead
+            if self._missing.get(engine, 0) > 0:
+                self._missing[engine] -= 1
+        return self._spawn(engine, stats)
+
+    def _spawn(
+        self, engine: SudokuSolverType, stats: SolverStats | None = None
+    ) -> EngineWorker:
+        start = timer()
+        worker = EngineWorker(self._context, engine)
+        if stats is not None:
+            stats.spawn_time += timer() - start
+            stats.report("spawn_time")
+        return worker
+
+    def _give_back(self, worker: EngineWorker) -> None:
+        with self._lock:
+            if not self._closed:
+                self._idle.setdefault(worker.engine, []).append(worker)
+                return
+        worker.kill()
+
+    def _replace(self, worker: EngineWorker) -> None:
+        """
+        Kills the worker and leaves starting its replacement
+        (and reaping the killed process) to the background thread.
+
+        Parameters
+        -----------
+        worker: EngineWorker
+            a worker taken for a race
+        """
+        worker.process.kill()
+        with self._lock:
+            closed = self._closed
+            start = not closed and not self._respawning
+            if not closed:
+                self._retired.append(worker)
+                self._missing[worker.engine] = self._missing.get(worker.engine, 0) + 1
+                self._respawning = True
+        if closed:
+            worker.kill()
+        elif start:
+            threading.Thread(
+                target=self._respawn, name="portfolio-respawn", daemon=True
+            ).start()
+
+    def _respawn(self) -> None:
+        """
+        The background thread reaping the killed workers and starting
+        the missing ones. A worker that fails to start stays missing,
+        so the next race starts it.
+        """
+        while True:
+            with self._lock:
+                retired, self._retired = self._retired, []
+                engine = None
+                if not self._closed:
+                    engine = next((e for e, n in self._missing.items() if n > 0), None)
+                if engine is not None:
+                    self._missing[engine] -= 1
+                elif not retired:
+                    self._respawning = False
+                    return
+            for worker in retired:
+                worker.kill()
+            if engine is None:
+                continue
+            try:
+                worker = EngineWorker(self._context, engine)
+            except Exception:
+                with self._lock:
+                    self._missing[engine] += 1
+                    self._respawning = False
+                return
+            self._give_back(worker)
+
+    def race(
+        self,
+        puzzle: SudokuGrid,
+        time_limit: float,
+        engines: list[SudokuSolverType],
+        presolve: bool = False,
+        encoding: SatEncoding = SatEncoding(),
+        stats: SolverStats | None = None,
+    ) -> tuple[SudokuGrid | None, SudokuSolverType]:
+        """
+        Solves the puzzle with all the engines at once,
+        under a single deadline. The answers are awaited in slices
+        of `POLL_INTERVAL`, so a cancelled race stops early.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle to be solved
+        time_limit: float
+            amount of time (in seconds) available to the engines
+        engines: list[SudokuSolverType]
+            the engines to be raced, each at most once
+        presolve: bool
+            whether the engines fill the naked and hidden singles first
+        encoding: SatEncoding
+            the encoding used by the SAT engine
+        stats: SolverStats | None
+            counters the winner's run is added to, starting the engine
+            processes missing at the start of the race counts as spawning
+
+        Returns
+        --------
+        solution: SudokuGrid | None
+            - a sudoku solution if it has been found
+            - `None` if the puzzle is infeasible
+        winner: SudokuSolverType
+            the engine that answered first
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when no engine answered in time or the race is cancelled
+        runtime_error: RuntimeError
+            when all the engines failed
+        """
+        engines = list(dict.fromkeys(engines))
+        if not engines:
+            raise ValueError("the portfolio needs at least one engine")
+        if "portfolio" in engines:
+            raise ValueError("the portfolio can't contain itself")
+
+        token = CancellationToken(time_limit)
+        running: dict[Connection, EngineWorker] = {}
+        for engine in engines:
+            worker = self._take(engine, stats)
+            worker.submit(
+                puzzle, token.remaining, presolve, encoding, stats is not None
+            )
+            running[worker.connection] = worker
+
+        outcome: tuple[SudokuGrid | None, SudokuSolverType] | None = None
+        errors: list[str] = []
+        try:
+            while running and outcome is None:
+                ready = wait(list(running), timeout=min(token.remaining, POLL_INTERVAL))
+                if not ready:
+                    if token.expired():
+                        break
+                    continue
+                for ready_connection in ready:
+                    # only the pipes of the engines are waited for
+                    connection = cast(Connection, ready_connection)
+                    worker = running.pop(connection)
+                    try:
+                        message: tuple[str, Any, SolverStats | None]
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        self._replace(worker)
+                        errors.append(f"the {worker.engine} engine died")
+                        continue
+                    self._give_back(worker)
+                    status, payload, engine_stats = message
+                    if status in ("solved", "infeasible") and engine_stats is not None:
+                        if stats is not None:
+                            stats.add(engine_stats)
+                    if status == "solved":
+                        outcome = SudokuGrid.trusted(payload), worker.engine
+                        break
+                    if status == "infeasible":
+                        outcome = None, worker.engine
+                        break
+                    if status == "error":
+                        errors.append(f"{worker.engine}: {payload}")
+        finally:
+            for worker in running.values():
+                self._replace(worker)
+
+        if outcome is not None:
+            return outcome
+        if len(errors) == len(engines):
+            raise RuntimeError("; ".join(errors))
+        raise TimeoutError()
+
+    def close(self) -> None:
+        """
+        Kills all the engine processes.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for workers in idle.values():
+            for worker in workers:
+                worker.kill()
+
+
+_portfolio: Portfolio | None = None
+_portfolio_lock = threading.Lock()
+
+
+def default_engines() -> list[str]:
+    """
+    Returns the names of the engines raced by default.
+
+    Returns
+    --------
+    engines: list[str]
+        value of the `SUDOKU_PORTFOLIO` environment variable split on commas,
+        SAT, dancing links and bitmask first-fail if it is not set
+    """
+    value = os.environ.get(PORTFOLIO_VARIABLE)
+    if not value:
+        return list(DEFAULT_PORTFOLIO)
+    return [name.strip().lower() for name in value.split(",") if name.strip()]
+
+
+def get_portfolio() -> Portfolio:
+    """
+    Returns the shared portfolio, creating it on the first use.
+    The engine processes are started when an engine is raced for the first time.
+
+    Returns
+    --------
+    portfolio: Portfolio
+        the shared portfolio
+    """
+    global _portfolio
+    with _portfolio_lock:
+        if _portfolio is None:
+            _portfolio = Portfolio()
+        return _portfolio
+
+
+def stop_portfolio() -> None:
+    """
+    Kills the engine processes of the shared portfolio, if it has been started.
+    """
+    global _portfolio
+    with _portfolio_lock:
+        portfolio, _portfolio = _portfolio, None
+    if portfolio is not None:
+        portfolio.close()
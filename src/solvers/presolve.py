@@ -0,0 +1,135 @@
+import math
+import numpy as np
+import numpy.typing as npt
+from src.model.grid import SudokuGrid, cell_dtype
+
+
+def _blocks(array: npt.NDArray) -> npt.NDArray:
+    """
+    Rearranges the first two axes of an array so they index blocks
+    instead of rows and columns, i.e.
+    `_blocks(array)[block, cell]` is the `cell`-th element (row-major) of
+    the block with index `block`.
+
+    Parameters
+    -----------
+    array: npt.NDArray
+        an array of shape (n, n, ...)
+
+    Returns
+    --------
+    blocks: npt.NDArray
+        an array of the same shape with elements grouped by blocks
+    """
+    size = array.shape[0]
+    block_size = math.isqrt(size)
+    rest = array.shape[2:]
+    split = array.reshape(block_size, block_size, block_size, block_size, *rest)
+    return split.swapaxes(1, 2).reshape(size, size, *rest)
+
+
+def _unit_sums(
+    tensor: npt.NDArray[np.bool_],
+) -> tuple[npt.NDArray, npt.NDArray, npt.NDArray]:
+    """
+    Counts the true values of a (row, col, val) tensor in every unit.
+
+    Parameters
+    -----------
+    tensor: npt.NDArray[np.bool_]
+        a boolean array of shape (n, n, n)
+
+    Returns
+    --------
+    row_sums: npt.NDArray
+        `row_sums[row, val]` - number of cells in the row with `val` set
+    col_sums: npt.NDArray
+        `col_sums[col, val]` - number of cells in the column with `val` set
+    block_sums: npt.NDArray
+        `block_sums[block, val]` - number of cells in the block with `val` set
+    """
+    return tensor.sum(axis=1), tensor.sum(axis=0), _blocks(tensor).sum(axis=1)
+
+
+def _block_of(size: int) -> npt.NDArray:
+    """
+    Returns an (n, n) array with the block index of every cell.
+    """
+    block_size = math.isqrt(size)
+    band = np.arange(size) // block_size
+    return band[:, None] * block_size + band[None, :]
+
+
+def propagate_singles(puzzle: SudokuGrid) -> SudokuGrid | None:
+    """
+    Fills the cells implied by naked and hidden singles until nothing changes.
+
+    - a naked single is an empty cell with only one candidate value,
+    - a hidden single is a value that fits only one cell of a row, column or block.
+
+    Parameters
+    -----------
+    puzzle: SudokuGrid
+        a sudoku puzzle to be reduced
+
+    Returns
+    --------
+    reduced: SudokuGrid | None
+        - a copy of the puzzle with all the singles filled in
+        - `None` if the propagation found a contradiction
+    """
+    size = puzzle.size
+    block_size = puzzle.block_size
+    grid = puzzle.cells().astype(np.int64).reshape(size, size)
+    values = np.arange(1, size + 1)
+    block_of = _block_of(size)
+
+    while True:
+        placed = grid[:, :, None] == values
+        row_placed, col_placed, block_placed = _unit_sums(placed)
+        if (row_placed > 1).any() or (col_placed > 1).any() or (block_placed > 1).any():
+            return None
+
+        empty = grid == 0
+        taken = (
+            (row_placed > 0)[:, None, :]
+            | (col_placed > 0)[None, :, :]
+            | (block_placed > 0)[block_of]
+        )
+        cand = empty[:, :, None] & ~taken
+
+        domain_sizes = cand.sum(axis=2)
+        if (empty & (domain_sizes == 0)).any():
+            return None
+
+        row_counts, col_counts, block_counts = _unit_sums(cand)
+        if (
+            ((row_counts == 0) & (row_placed == 0)).any()
+            or ((col_counts == 0) & (col_placed == 0)).any()
+            or ((block_counts == 0) & (block_placed == 0)).any()
+        ):
+            return None
+
+        naked = empty & (domain_sizes == 1)
+        if naked.any():
+            grid[naked] = cand[naked].argmax(axis=1) + 1
+            continue
+
+        rows, row_vals = np.nonzero(row_counts == 1)
+        cols, col_vals = np.nonzero(col_counts == 1)
+        block_ids, block_vals = np.nonzero(block_counts == 1)
+        if len(rows) + len(cols) + len(block_ids) == 0:
+            break
+
+        row_cols = cand.argmax(axis=1)[rows, row_vals]
+        col_rows = cand.argmax(axis=0)[cols, col_vals]
+        cells = _blocks(cand).argmax(axis=1)[block_ids, block_vals]
+        block_rows = (block_ids // block_size) * block_size + cells // block_size
+        block_cols = (block_ids % block_size) * block_size + cells % block_size
+
+        # conflicting singles are caught by the checks in the next iteration
+        grid[rows, row_cols] = row_vals + 1
+        grid[col_rows, cols] = col_vals + 1
+        grid[block_rows, block_cols] = block_vals + 1
+
+    return SudokuGrid.trusted(grid.astype(cell_dtype(size)))
@@ -0,0 +1,334 @@
+import os
+import threading
+from timeit import default_timer as timer
+
+import numpy as np
+from pysat.solvers import Solver  # type: ignore[import-untyped]
+from src.model.grid import SudokuGrid, cell_dtype
+from src.solvers.cancellation import CancellationToken
+from src.solvers.sat_solver import SatEncoding, SudokuCNF, count_search
+from src.solvers.stats import SolverStats
+
+SIZES_VARIABLE = "SUDOKU_SAT_SIZES"
+MAX_CONFLICTS_VARIABLE = "SUDOKU_SAT_MAX_CONFLICTS"
+DEFAULT_SIZES = (9,)
+DEFAULT_MAX_CONFLICTS = 200_000
+MAX_WARM_SIZE = 25
+"""larger grids aren't kept warm, the encoding of all their propositions
+   is too big (the pairwise one grows with `size**4`)"""
+
+
+class WarmSatSolver:
+    """
+    A SAT solver loaded with the constraints shared by all the puzzles
+    of a given size: every cell has a single value and the values in every
+    row, column and block are unique. The givens of a puzzle are passed
+    as assumptions, so the solver (and the clauses it has learnt) can be
+    reused for the next puzzle.
+
+    Attributes:
+    -----------
+    size: int
+        size of the puzzles
+    encoding: SatEncoding
+        options of the encoding
+    cnf: SudokuCNF
+        encoding of the empty grid, a proposition for every cell and value
+    solver: Solver
+        the underlying `pysat` solver
+
+    Properties:
+    -----------
+    conflicts: int
+        number of conflicts so far, each of them added a learnt clause
+
+    Methods:
+    --------
+    solve(self, puzzle: SudokuGrid, token: CancellationToken,
+          stats: SolverStats | None) -> SudokuGrid | None:
+        solves the puzzle under the assumption of its givens
+    close(self) -> None:
+        releases the solver
+    """
+
+    size: int
+    encoding: SatEncoding
+    cnf: SudokuCNF
+    solver: Solver
+
+    def __init__(self, size: int, encoding: SatEncoding) -> None:
+        self.size = size
+        self.encoding = encoding
+        empty = SudokuGrid.trusted(np.zeros((size, size), dtype=cell_dtype(size)))
+        self.cnf = SudokuCNF.encode(empty, encoding)
+        self.solver = Solver(bootstrap_with=self.cnf.cnf)
+
+    @property
+    def conflicts(self) -> int:
+        return self.solver.accum_stats().get("conflicts", 0)
+
+    def solve(
+        self,
+        puzzle: SudokuGrid,
+        token: CancellationToken,
+        stats: SolverStats | None = None,
+    ) -> SudokuGrid | None:
+        """
+        Solves the puzzle under the assumption of its givens.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle of the solver's size
+        token: CancellationToken
+            the deadline of the solve, the solver is interrupted
+            once it expires
+        stats: SolverStats | None
+            counters the run is added to, the givens count as encoding
+
+        Returns
+        --------
+        solution: SudokuGrid | None
+            - a sudoku solution if it has been found
+            - `None` if the puzzle is infeasible
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out or the solve is cancelled
+        """
+        start = timer()
+        # the propositions of the empty grid are numbered cell by cell,
+        # value by value, so "cell `i` has value `v`" is `i * size + v`
+        cells = puzzle.cells()
+        given = np.flatnonzero(cells)
+        assumptions = (given * self.size + cells[given]).tolist()
+        before = None
+        if stats is not None:
+            stats.encode_time += timer() - start
+            stats.clauses += len(self.cnf.cnf.clauses)
+            stats.variables += self.cnf.cnf.nv
+            before = self.solver.accum_stats()
+
+        alarm = token.on_expiry(self.solver.interrupt)
+        try:
+            solved = self.solver.solve_limited(
+                assumptions=assumptions, expect_interrupt=True
+            )
+        finally:
+            # waits for an interrupt being delivered, so it's cleared for good
+            alarm.cancel()
+            self.solver.clear_interrupt()
+            if stats is not None:
+                count_search(stats, self.solver.accum_stats(), before)
+
+        if solved is None:
+            raise TimeoutError()
+        if not solved:
+            return None
+        start = timer()
+        solution = self.cnf.decode(self.solver.get_model())
+        if stats is not None:
+            stats.decode_time += timer() - start
+        return solution
+
+    def close(self) -> None:
+        """
+        Releases the solver.
+        """
+        self.solver.delete()
+
+
+class SatSolverPool:
+    """
+    Warm SAT solvers, kept per grid size and encoding.
+
+    A solver is taken out of the pool for a single puzzle and put back
+    afterwards, so concurrent threads never share one. A new solver is built
+    when none is idle. A solver whose learnt-clause database has grown too
+    large (measured by the number of conflicts) is replaced by a fresh one.
+
+    Attributes:
+    -----------
+    max_conflicts: int
+        number of conflicts after which a solver is rebuilt
+
+    Methods:
+    --------
+    warm_up(self, sizes: list[int], encoding: SatEncoding) -> None:
+        builds an idle solver for each of the sizes
+    solve(self, puzzle: SudokuGrid, token: CancellationToken,
+          encoding: SatEncoding, stats: SolverStats | None) -> SudokuGrid | None:
+        solves the puzzle with a warm solver
+    close(self) -> None:
+        releases all the idle solvers
+    """
+
+    max_conflicts: int
+    _idle: dict[tuple[int, SatEncoding], list[WarmSatSolver]]
+    _lock: threading.Lock
+
+    def __init__(self, max_conflicts: int = DEFAULT_MAX_CONFLICTS) -> None:
+        self.max_conflicts = max_conflicts
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def warm_up(self, sizes: list[int], encoding: SatEncoding = SatEncoding()) -> None:
+        """
+        Builds an idle solver for each of the sizes not having one yet.
+
+        Parameters
+        -----------
+        sizes: list[int]
+            sizes of the puzzles expected to come
+        encoding: SatEncoding
+            options of the encoding
+        """
+        for size in sizes:
+            with self._lock:
+                ready = bool(self._idle.get((size, encoding)))
+            if not ready:
+                self._give_back(WarmSatSolver(size, encoding))
+
+    def _take(
+        self, size: int, encoding: SatEncoding, stats: SolverStats | None = None
+    ) -> WarmSatSolver:
+        with self._lock:
+            idle = self._idle.get((size, encoding))
+            if idle:
+                return idle.pop()
+        start = timer()
+        solver = WarmSatSolver(size, encoding)
+        if stats is not None:
+            stats.encode_time += timer() - start
+        return solver
+
+    def _give_back(self, solver: WarmSatSolver) -> None:
+        if solver.conflicts > self.max_conflicts:
+            solver.close()
+            solver = WarmSatSolver(solver.size, solver.encoding)
+        with self._lock:
+            self._idle.setdefault((solver.size, solver.encoding), []).append(solver)
+
+    def solve(
+        self,
+        puzzle: SudokuGrid,
+        token: CancellationToken,
+        encoding: SatEncoding = SatEncoding(),
+        stats: SolverStats | None = None,
+    ) -> SudokuGrid | None:
+        """
+        Solves the puzzle with a warm solver of its size.
+        Building a solver (if none is idle) counts as encoding.
+
+        Parameters
+        -----------
+        puzzle: SudokuGrid
+            a sudoku puzzle to be solved
+        token: CancellationToken
+            the deadline of the solve
+        encoding: SatEncoding
+            options of the encoding
+        stats: SolverStats | None
+            counters the run is added to
+
+        Returns
+        --------
+        solution: SudokuGrid | None
+            - a sudoku solution if it has been found
+            - `None` if the puzzle is infeasible
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out or the solve is cancelled
+        """
+        if puzzle.size > MAX_WARM_SIZE:
+            raise ValueError(
+                f"puzzles larger than {MAX_WARM_SIZE}x{MAX_WARM_SIZE} aren't kept warm"
+            )
+        solver = self._take(puzzle.size, encoding, stats)
+        try:
+            return solver.solve(puzzle, token, stats)
+        finally:
+            self._give_back(solver)
+
+    def close(self) -> None:
+        """
+        Releases all the idle solvers.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for solvers in idle.values():
+            for solver in solvers:
+                solver.close()
+
+
+_pool: SatSolverPool | None = None
+_pool_lock = threading.Lock()
+
+
+def default_sizes() -> list[int]:
+    """
+    Returns the sizes of the puzzles the solvers are built for at startup.
+
+    Returns
+    --------
+    sizes: list[int]
+        value of the `SUDOKU_SAT_SIZES` environment variable split on commas,
+        only the classical `9` if it is not set
+    """
+    value = os.environ.get(SIZES_VARIABLE)
+    if value is None:
+        return list(DEFAULT_SIZES)
+    return [int(size) for size in value.split(",") if size.strip()]
+
+
+def get_sat_pool() -> SatSolverPool:
+    """
+    Returns the shared pool, creating it (without any solvers) on the first use.
+
+    Returns
+    --------
+    pool: SatSolverPool
+        the shared pool of the warm SAT solvers
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_conflicts = os.environ.get(MAX_CONFLICTS_VARIABLE)
+            _pool = SatSolverPool(
+                DEFAULT_MAX_CONFLICTS if max_conflicts is None else int(max_conflicts)
+            )
+        return _pool
+
+
+def start_sat_pool(sizes: list[int] | None = None) -> SatSolverPool:
+    """
+    Builds the solvers of the shared pool for the given sizes,
+    with the default encoding.
+
+    Parameters
+    -----------
+    sizes: list[int] | None
+        sizes of the puzzles, `default_sizes()` if not given
+
+    Returns
+    --------
+    pool: SatSolverPool
+        the shared pool of the warm SAT solvers
+    """
+    pool = get_sat_pool()
+    pool.warm_up(default_sizes() if sizes is None else sizes)
+    return pool
+
+
+def stop_sat_pool() -> None:
+    """
+    Releases the solvers of the shared pool, if it has been created.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
@@ -1,36 +1,131 @@
 from __future__ import annotations
+from collections.abc import Iterator
 from dataclasses import dataclass
-import itertools  # noqa
-from threading import Timer  # noqa
-from typing import Iterable
+from enum import StrEnum, auto
+import math
+from timeit import default_timer as timer
+import numpy as np
+import numpy.typing as npt
+from src.solvers.cancellation import CancellationToken
 from src.solvers.solver import SudokuSolver
 from src.model.grid import SudokuGrid
+from src.solvers.stats import SolverStats
+from pysat.card import CardEnc, EncType  # type: ignore[import-untyped]
 from pysat.formula import CNF  # type: ignore[import-untyped]
 from pysat.solvers import Solver  # type: ignore[import-untyped] #noqa
-from src.utils.group_by import group_by
 
 
-@dataclass(frozen=True)
-class Coordinates:
+class AtMostOneEncoding(StrEnum):
     """
-    Represent coordinates of a sudoku variable (empty cell).
+    Type representing the ways of encoding an "at most one of these is true"
+    constraint in CNF:
+    - `PAIRWISE` - a binary clause for every pair, no auxiliary variables
+    - `SEQUENTIAL_COUNTER` - Sinz's sequential counter, O(k) clauses
+    - `LADDER` - ladder (regular) encoding, O(k) clauses
+    - `BITWISE` - binary (bitwise/product-like) encoding, O(k log k) clauses
+
+    Properties:
+    -----------
+    enc_type: int
+        the matching `pysat.card.EncType`
     """
 
-    row: int
-    col: int
-    block: int
+    PAIRWISE = auto()
+    SEQUENTIAL_COUNTER = auto()
+    LADDER = auto()
+    BITWISE = auto()
+
+    @property
+    def enc_type(self) -> int:
+        match self:
+            case AtMostOneEncoding.PAIRWISE:
+                return EncType.pairwise
+            case AtMostOneEncoding.SEQUENTIAL_COUNTER:
+                return EncType.seqcounter
+            case AtMostOneEncoding.LADDER:
+                return EncType.ladder
+            case AtMostOneEncoding.BITWISE:
+                return EncType.bitwise
+            case _:
+                raise NotImplementedError()
 
 
 @dataclass(frozen=True)
-class Proposition:
+class SatEncoding:
+    """
+    Options of the sudoku CNF encoding.
+    """
+
+    at_most_one: AtMostOneEncoding = AtMostOneEncoding.PAIRWISE
+    """how the at-most-one constraints are encoded"""
+    redundant: bool = False
+    """whether to add the (implied) at-least-one clauses for every
+       row/column/block and value, which strengthens the propagation"""
+
+
+def _groups(keys: npt.NDArray) -> tuple[npt.NDArray, npt.NDArray]:
+    """
+    Groups propositions by a key, keeping the groups in the order of
+    their first appearance and the propositions within a group in the id order.
+
+    Parameters
+    ----------
+    keys: npt.NDArray
+        group label of every proposition (in the id order)
+
+    Returns
+    -------
+    members: npt.NDArray
+        proposition indices ordered group by group
+    sizes: npt.NDArray
+        number of propositions in every group
     """
-    A single proposition:
-    "Sudoku cell at coordinates: `coords` has value `val`"
+    _, first, inverse, counts = np.unique(
+        keys, return_index=True, return_inverse=True, return_counts=True
+    )
+    by_appearance = np.argsort(first, kind="stable")
+    rank = np.empty_like(by_appearance)
+    rank[by_appearance] = np.arange(len(by_appearance))
+    members = np.argsort(rank[inverse], kind="stable")
+    return members, counts[by_appearance]
+
+
+def _pairwise(
+    literals: npt.NDArray, sizes: npt.NDArray
+) -> tuple[npt.NDArray, npt.NDArray]:
     """
+    Builds the pairwise at-most-one clauses `[-p, -q]` for consecutive groups
+    of literals, in the same order as `itertools.combinations` would.
+
+    Parameters
+    ----------
+    literals: npt.NDArray
+        literals ordered group by group
+    sizes: npt.NDArray
+        number of literals in every group
+
+    Returns
+    -------
+    clauses: npt.NDArray
+        an array of shape (m, 2) with the binary clauses
+    offsets: npt.NDArray
+        index of the first clause of every group
+        (with an extra element equal to the number of clauses)
+    """
+    starts = np.cumsum(sizes) - sizes
+    pair_counts = sizes * (sizes - 1) // 2
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(pair_counts, out=offsets[1:])
+    clauses = np.empty((offsets[-1], 2), dtype=np.int64)
+
+    for size in np.unique(sizes[sizes > 1]):
+        groups = np.nonzero(sizes == size)[0]
+        first, second = np.triu_indices(size, 1)
+        positions = offsets[groups][:, None] + np.arange(len(first))
+        clauses[positions, 0] = -literals[starts[groups][:, None] + first]
+        clauses[positions, 1] = -literals[starts[groups][:, None] + second]
 
-    coords: Coordinates
-    val: int
-    id: int
+    return clauses, offsets
 
 
 @dataclass
@@ -40,6 +135,11 @@ class SudokuCNF:
     - https://en.wikipedia.org/wiki/Conjunctive_normal_form
     - https://equaeghe.github.io/ecyglpki/cnfsat.html
 
+    A proposition with identifier `id` reads:
+    "Sudoku cell at (`rows[id - 1]`, `cols[id - 1]`) has value `vals[id - 1]`".
+    Propositions exist only for the values still available in the empty cells
+    and are numbered row by row, cell by cell, value by value.
+
     Usage
     -----
     Given a sudoku `grid: SudokuGrid` one should use static method `encode`
@@ -60,56 +160,150 @@ class SudokuCNF:
 
     cnf: CNF
     """a `Conjunctive Normal Form` encoding as used by a SAT solver"""
-    propositions: dict[int, Proposition]
-    """mapping from propositions identifiers (as used in the CNF)
-       to the propositions themselves"""
+    rows: npt.NDArray[np.int64]
+    """row of the cell referred by every proposition"""
+    cols: npt.NDArray[np.int64]
+    """column of the cell referred by every proposition"""
+    vals: npt.NDArray[np.int64]
+    """value referred by every proposition"""
     puzzle: SudokuGrid
     """a puzzle encoded in the CNF"""
+    encoding: SatEncoding = SatEncoding()
+    """options of the encoding"""
 
     def __post_init__(self) -> None:
-        self._every_cell_has_a_single_value()
-        self._every_row_contains_unique_values()
-        self._every_col_contains_unique_values()
-        self._every_block_contains_unique_values()
-
-    def _at_least_one(self, propositions: Iterable[Proposition]) -> None:
-        self.cnf.append([p.id for p in propositions])
-
-    def _at_most_one(self, propositions: Iterable[Proposition]) -> None:
-        for p, q in itertools.combinations(propositions, 2):
-            self.cnf.append([-p.id, -q.id])
-
-    def _exactly_one(self, propositions: Iterable[Proposition]) -> None:
-        self._at_most_one(propositions)
-        self._at_least_one(propositions)
-
-    def _every_cell_has_a_single_value(self):
-        for cell_propositions in group_by(
-            self.propositions.values(), lambda p: p.coords
-        ).values():
-            self._exactly_one(cell_propositions)
-
-    def _every_row_contains_unique_values(self):
-        for row_val_proposition in group_by(
-            self.propositions.values(), lambda p: (p.coords.row, p.val)
-        ).values():
-            self._at_most_one(row_val_proposition)
-
-    def _every_col_contains_unique_values(self):
-        for col_val_proposition in group_by(
-            self.propositions.values(), lambda p: (p.coords.col, p.val)
-        ).values():
-            self._at_most_one(col_val_proposition)
-
-    def _every_block_contains_unique_values(self):
-        for block_val_proposition in group_by(
-            self.propositions.values(),
-            lambda p: (self.puzzle.block_index(p.coords.row, p.coords.col), p.val),
-        ).values():
-            self._at_most_one(block_val_proposition)
+        self.cnf.nv = len(self.vals)
+        clauses = self._every_cell_has_a_single_value()
+        clauses += self._every_row_contains_unique_values()
+        clauses += self._every_col_contains_unique_values()
+        clauses += self._every_block_contains_unique_values()
+        if self.encoding.redundant:
+            clauses += self._every_row_contains_all_values()
+            clauses += self._every_col_contains_all_values()
+            clauses += self._every_block_contains_all_values()
+        self.cnf.clauses = clauses
+
+    @property
+    def ids(self) -> npt.NDArray[np.int64]:
+        """identifiers of all the propositions"""
+        return np.arange(1, len(self.vals) + 1)
+
+    def _at_most_one_groups(
+        self, literals: npt.NDArray, sizes: npt.NDArray
+    ) -> tuple[list[list[int]], list[int]]:
+        """
+        Encodes at-most-one constraints over consecutive groups of literals.
+        Auxiliary variables (if the encoding needs any) are numbered after
+        all the variables used so far.
+
+        Parameters
+        ----------
+        literals: npt.NDArray
+            literals ordered group by group
+        sizes: npt.NDArray
+            number of literals in every group
+
+        Returns
+        -------
+        clauses: list[list[int]]
+            clauses of all the groups
+        offsets: list[int]
+            index of the first clause of every group
+            (with an extra element equal to the number of clauses)
+        """
+        if self.encoding.at_most_one == AtMostOneEncoding.PAIRWISE:
+            pairs, pair_offsets = _pairwise(literals, sizes)
+            return pairs.tolist(), pair_offsets.tolist()
+
+        clauses: list[list[int]] = []
+        offsets = [0]
+        start = 0
+        for size in sizes.tolist():
+            if size > 1:
+                group = CardEnc.atmost(
+                    literals[start : start + size].tolist(),
+                    bound=1,
+                    top_id=self.cnf.nv,
+                    encoding=self.encoding.at_most_one.enc_type,
+                )
+                clauses += group.clauses
+                self.cnf.nv = max(self.cnf.nv, group.nv)
+            offsets.append(len(clauses))
+            start += size
+        return clauses, offsets
+
+    def _at_most_one(self, keys: npt.NDArray) -> list[list[int]]:
+        members, sizes = _groups(keys)
+        clauses, _ = self._at_most_one_groups(self.ids[members], sizes)
+        return clauses
+
+    def _at_least_one(self, keys: npt.NDArray, expected: int) -> list[list[int]]:
+        members, sizes = _groups(keys)
+        literals = self.ids[members].tolist()
+        starts = (np.cumsum(sizes) - sizes).tolist()
+        clauses = [
+            literals[start : start + size]
+            for start, size in zip(starts, sizes.tolist())
+        ]
+        # a group without any proposition cannot be satisfied
+        if len(clauses) < expected:
+            clauses.append([])
+        return clauses
+
+    def _every_cell_has_a_single_value(self) -> list[list[int]]:
+        # propositions of a cell are consecutive, so the groups are already in order
+        size = self.puzzle.size
+        cells = self.rows * size + self.cols
+        _, sizes = np.unique(cells, return_counts=True)
+        amo_clauses, amo_offsets = self._at_most_one_groups(self.ids, sizes)
+        id_list = self.ids.tolist()
+
+        clauses: list[list[int]] = []
+        start = 0
+        for cell, cell_size in enumerate(sizes.tolist()):
+            clauses += amo_clauses[amo_offsets[cell] : amo_offsets[cell + 1]]
+            clauses.append(id_list[start : start + cell_size])
+            start += cell_size
+
+        # an empty cell without any available value makes the puzzle infeasible
+        if len(sizes) < int((self.puzzle.cells() == 0).sum()):
+            clauses.append([])
+        return clauses
+
+    def _every_row_contains_unique_values(self) -> list[list[int]]:
+        return self._at_most_one(self.rows * (self.puzzle.size + 1) + self.vals)
+
+    def _every_col_contains_unique_values(self) -> list[list[int]]:
+        return self._at_most_one(self.cols * (self.puzzle.size + 1) + self.vals)
+
+    def _every_block_contains_unique_values(self) -> list[list[int]]:
+        return self._at_most_one(self._blocks * (self.puzzle.size + 1) + self.vals)
+
+    def _every_row_contains_all_values(self) -> list[list[int]]:
+        keys = self.rows * (self.puzzle.size + 1) + self.vals
+        return self._at_least_one(keys, self._missing_values)
+
+    def _every_col_contains_all_values(self) -> list[list[int]]:
+        keys = self.cols * (self.puzzle.size + 1) + self.vals
+        return self._at_least_one(keys, self._missing_values)
+
+    def _every_block_contains_all_values(self) -> list[list[int]]:
+        keys = self._blocks * (self.puzzle.size + 1) + self.vals
+        return self._at_least_one(keys, self._missing_values)
+
+    @property
+    def _blocks(self) -> npt.NDArray[np.int64]:
+        """block index of the cell referred by every proposition"""
+        block_size = self.puzzle.block_size
+        return (self.rows // block_size) * block_size + self.cols // block_size
+
+    @property
+    def _missing_values(self) -> int:
+        """number of values still missing in all the rows (columns, blocks) together"""
+        return int((self.puzzle.cells() == 0).sum())
 
     @staticmethod
-    def encode(puzzle: SudokuGrid) -> SudokuCNF:
+    def encode(puzzle: SudokuGrid, encoding: SatEncoding = SatEncoding()) -> SudokuCNF:
         """
         Encodes a given sudoku puzzle into its Conjunctive Normal Form
         suitable for SAT solvers.
@@ -118,15 +312,16 @@ class SudokuCNF:
         ----------
         puzzle: SudokuGrid
             a sudoku puzzle to be encoded
+        encoding: SatEncoding
+            options of the encoding
 
         Returns
         -------
         encoding: SudokuCNF
             Conjunctive Normal Form encoding of the specified puzzle
         """
-        cnf = CNF()
-        propositions = SudokuCNF._possible_propositions(puzzle)
-        return SudokuCNF(cnf, propositions, puzzle)
+        rows, cols, vals = SudokuCNF._possible_propositions(puzzle)
+        return SudokuCNF(CNF(), rows, cols, vals, puzzle, encoding)
 
     def decode(self, results: list[int]) -> SudokuGrid:
         """
@@ -137,57 +332,72 @@ class SudokuCNF:
         results: list[int]
             list of true propositions (their identifiers, to be exact)
             [1,-2,3,-4,5] would mean, that propositions 1,3,5 are true
-            and 2 and 5 are false.
+            and 2 and 5 are false. Auxiliary variables are ignored.
 
         Returns
         -------
         solution: SudokuGrid
             a sudoku grid filled according the SAT results
         """
-        valid_ids = [prop_id for prop_id in results if prop_id >= 0]
-        valid_propositions = [
-            self.propositions[valid_prop_id] for valid_prop_id in valid_ids
-        ]
+        literals = np.asarray(results, dtype=np.int64)
+        valid = literals[(literals > 0) & (literals <= len(self.vals))] - 1
         solved_puzzle = self.puzzle.copy()
-
-        for valid_proposition in valid_propositions:
-            solved_puzzle[
-                valid_proposition.coords.row, valid_proposition.coords.col
-            ] = valid_proposition.val
-
+        solved_puzzle[self.rows[valid], self.cols[valid]] = self.vals[valid]
         return solved_puzzle
 
     @staticmethod
-    def _possible_propositions(puzzle: SudokuGrid) -> dict[int, Proposition]:
+    def _possible_propositions(
+        puzzle: SudokuGrid,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
         size = puzzle.size
-        id_counter = 1
-        result = {}
-        default_domain = set(range(1, size + 1))
-        row_taken = {i: set() for i in range(size)}
-        col_taken = {i: set() for i in range(size)}
-        block_taken = {i: set() for i in range(size)}
-
-        for (row, col), val in puzzle.enumerate():
-            if val != 0:
-                block = puzzle.block_index(row, col)
-                row_taken[row].add(val)
-                col_taken[col].add(val)
-                block_taken[block].add(val)
-
-        for (row, col), val in puzzle.enumerate():
-            if val != 0:
-                continue
-            block = puzzle.block_index(row, col)
-            valid = default_domain - (
-                row_taken[row] | col_taken[col] | block_taken[block]
-            )
-            for val in valid:
-                result[id_counter] = Proposition(
-                    Coordinates(row, col, block), val, id_counter
-                )
-                id_counter += 1
-
-        return result
+        block_size = puzzle.block_size
+        grid = puzzle.cells().astype(np.int64).reshape(size, size)
+        band = np.arange(size) // block_size
+        blocks = band[:, None] * block_size + band[None, :]
+
+        row_taken = np.zeros((size, size + 1), dtype=np.bool_)
+        col_taken = np.zeros((size, size + 1), dtype=np.bool_)
+        block_taken = np.zeros((size, size + 1), dtype=np.bool_)
+        filled_rows, filled_cols = np.nonzero(grid)
+        filled_vals = grid[filled_rows, filled_cols]
+        row_taken[filled_rows, filled_vals] = True
+        col_taken[filled_cols, filled_vals] = True
+        block_taken[blocks[filled_rows, filled_cols], filled_vals] = True
+
+        empty_rows, empty_cols = np.nonzero(grid == 0)
+        taken = (
+            row_taken[empty_rows]
+            | col_taken[empty_cols]
+            | block_taken[blocks[empty_rows, empty_cols]]
+        )
+        cells, vals = np.nonzero(~taken[:, 1:])
+        return empty_rows[cells], empty_cols[cells], vals + 1
+
+
+def count_search(
+    stats: SolverStats, search: dict[str, int], before: dict[str, int] | None = None
+) -> None:
+    """
+    Adds the search counters of a `pysat` solver to the stats:
+    the decisions are the nodes, the conflicts are the backtracks.
+
+    Parameters
+    ----------
+    stats: SolverStats
+        counters of the run
+    search: dict[str, int]
+        the solver's `accum_stats()`
+    before: dict[str, int] | None
+        the solver's `accum_stats()` before the run, if it's been used already
+    """
+    before = before or {}
+    for name, key in (
+        ("nodes", "decisions"),
+        ("backtracks", "conflicts"),
+        ("propagations", "propagations"),
+    ):
+        done = search.get(key, 0) - before.get(key, 0)
+        setattr(stats, name, getattr(stats, name) + done)
 
 
 class SatSudokuSolver(SudokuSolver):
@@ -195,28 +405,47 @@ class SatSudokuSolver(SudokuSolver):
     A SAT-based sudoku solver using the python-sat library:
     """
 
-    def __init__(self, puzzle, time_limit):
+    MUTATES_PUZZLE = False
+    REPORTED_STATS = (
+        "nodes",
+        "backtracks",
+        "propagations",
+        "clauses",
+        "variables",
+        "encode_time",
+        "decode_time",
+    )
+
+    encoding: SatEncoding
+
+    def __init__(self, puzzle, time_limit, encoding: SatEncoding = SatEncoding()):
         super().__init__(puzzle, time_limit)
+        self.encoding = encoding
 
     def run_algorithm(self) -> SudokuGrid | None:
-        sudoku_cnf = SudokuCNF.encode(self._puzzle)
-
-        def interrupt(s):
-            s.interrupt()
+        start = timer()
+        sudoku_cnf = SudokuCNF.encode(self._puzzle, self.encoding)
+        self.stats.clauses = len(sudoku_cnf.cnf.clauses)
+        self.stats.variables = sudoku_cnf.cnf.nv
 
         with Solver(bootstrap_with=sudoku_cnf.cnf) as solver:
-            timer = Timer(self._time_limit, interrupt, [solver])
-            timer.start()
+            self.stats.encode_time = timer() - start
+            alarm = self.token.on_expiry(solver.interrupt)
             try:
                 solved = solver.solve_limited(expect_interrupt=True)
-                timer.cancel()
                 if solved is None:
                     raise TimeoutError
                 if solved:
-                    return sudoku_cnf.decode(solver.get_model())
+                    start = timer()
+                    solution = sudoku_cnf.decode(solver.get_model())
+                    self.stats.decode_time = timer() - start
+                    return solution
                 return None
             except TimeoutError:
                 raise TimeoutError
+            finally:
+                alarm.cancel()
+                count_search(self.stats, solver.accum_stats())
 
 
 @dataclass
@@ -224,30 +453,95 @@ class SatSudokuValidator:
     """
     Class responsible for checking if the given sudoku puzzle
     has only a single unique solution.
+    All the solutions are enumerated by a single incremental SAT solver,
+    each found solution is excluded with a blocking clause.
     """
 
     _puzzle: SudokuGrid
     """a puzzle to be validated"""
+    _time_limit: float | None = None
+    """how much time (in seconds) the check may take, `None` means no limit,
+    it can be cancelled by the flag of the current `cancel_scope` anyway"""
 
     def has_unique_solution(self) -> bool:
         """
         Checks whether the puzzle has only single solution.
+        Stops as soon as the second solution is found.
 
         Returns
         -------
         has_one_solution: bool
             `True` if there is a single solution to the puzzle
             `False` otherwise
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out or the check is cancelled
+        """
+        return self.count_solutions(2) == 1
+
+    def count_solutions(self, cap: int) -> int:
+        """
+        Counts the solutions of the puzzle, but no more than `cap`.
+
+        Parameters
+        ----------
+        cap: int
+            the maximal number of solutions to look for
+
+        Returns
+        -------
+        count: int
+            the exact number of solutions if it's lower than `cap`,
+            `cap` otherwise
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out or the check is cancelled
+        """
+        return sum(1 for _ in self.solutions(cap))
+
+    def solutions(self, cap: int) -> Iterator[SudokuGrid]:
         """
+        Lazily enumerates distinct solutions of the puzzle.
+
+        Parameters
+        ----------
+        cap: int
+            the maximal number of solutions to be generated
 
+        Returns
+        -------
+        solutions: Iterator[SudokuGrid]
+            at most `cap` distinct solutions
+
+        Raises
+        -------
+        timeout_error: TimeoutError
+            when the available time runs out or the check is cancelled
+        """
         sudoku_cnf = SudokuCNF.encode(self._puzzle)
+        propositions = len(sudoku_cnf.vals)
+
+        time_limit = math.inf if self._time_limit is None else self._time_limit
+        token = CancellationToken(time_limit)
 
         with Solver(bootstrap_with=sudoku_cnf.cnf) as solver:
-            return len([m for m in solver.enum_models()]) == 1
-
-        # TODO:
-        # Use SAT solver to check the uniqueness of the solution.
-        # tips:
-        # - this time we ignore timeout so the code will be simpler
-        # - instead of the `solve_limited` us `enum_model`:
-        #   https://pysathq.github.io/docs/html/api/solvers.html#pysat.solvers.Solver.enum_models
+            alarm = token.on_expiry(solver.interrupt)
+            try:
+                for _ in range(cap):
+                    solved = solver.solve_limited(expect_interrupt=True)
+                    if solved is None:
+                        raise TimeoutError()
+                    if not solved:
+                        return
+                    model = solver.get_model()
+                    yield sudoku_cnf.decode(model)
+                    chosen = [lit for lit in model[:propositions] if lit > 0]
+                    if not chosen:
+                        return
+                    solver.add_clause([-lit for lit in chosen])
+            finally:
+                alarm.cancel()
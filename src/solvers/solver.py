@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
+from src.solvers.cancellation import CancellationToken
 from src.model.grid import SudokuGrid
+from src.solvers.presolve import propagate_singles
+from src.solvers.stats import SolverStats
 from timeit import default_timer as timer
 
 
@@ -12,16 +15,23 @@ class SudokuSolver(ABC):
     Protected Attributes:
     ---------------------
     _puzzle: SudokuGrid
-        **copy** of the sudoku puzzle to be solved. Solvers can modify this grid.
+        **copy** of the sudoku puzzle to be solved. Solvers can modify this grid,
+        unless `MUTATES_PUZZLE` is `False`, then it's a read-only view.
     _time_limit: float
         how much time is available for the solver
-    _deadline: float
-        a deadline used in the built-in _timeout() method
+
+    Attributes:
+    -----------
+    token: CancellationToken
+        the deadline of the run, cancelled also by the flag of the current
+        `cancel_scope`; searches check it every few nodes, see `check`
+    stats: SolverStats
+        counters of the run, every engine fills in the ones it keeps
 
     Methods:
     --------
     _timeout() -> bool:
-        checks whether the available time has run out
+        checks whether the available time has run out or the run is cancelled
 
     Abstract Methods:
     -----------------
@@ -30,30 +40,40 @@ class SudokuSolver(ABC):
 
     Class Methods:
     --------------
-    solve(cls, puzzle: SudokuGrid, time_limit: float, *args, **kwargs) -> SudokuGrid | None:
+    solve(cls, puzzle: SudokuGrid, time_limit: float, *args, presolve: bool,
+          stats: SolverStats | None, **kwargs) -> SudokuGrid | None:
         an interface method supposed dispatch correct algorithm
     """
 
+    MUTATES_PUZZLE = True
+    """whether the solver writes to `_puzzle`, the others get it without a copy"""
+    REPORTED_STATS: tuple[str, ...] = ()
+    """the counters of `stats` the engine keeps, besides the solve time"""
+
     _puzzle: SudokuGrid
     _time_limit: float
-    _deadline: float
+    token: CancellationToken
+    stats: SolverStats
 
     def __init__(self, puzzle: SudokuGrid, time_limit: float) -> None:
-        self._puzzle = puzzle.copy()
+        self._puzzle = puzzle.copy() if self.MUTATES_PUZZLE else puzzle.view()
         self._time_limit = time_limit
-        self._deadline = timer() + time_limit
+        self.token = CancellationToken(time_limit)
+        self.stats = SolverStats()
 
     def _timeout(self) -> bool:
         """
-        Checks whether the available time has run out.
+        Checks whether the available time has run out or the run
+        has been cancelled. It reads the clock, searches call `token.check`
+        every `token.check_every` nodes instead.
 
         Returns
         --------
         timeout: bool
-            - `True` if solver has missed the deadline
+            - `True` if solver has missed the deadline or it's cancelled
             - `False` otherwise
         """
-        return timer() > self._deadline
+        return self.token.expired()
 
     @abstractmethod
     def run_algorithm(self) -> SudokuGrid | None:
@@ -74,7 +94,13 @@ class SudokuSolver(ABC):
 
     @classmethod
     def solve(
-        cls, puzzle: SudokuGrid, time_limit: float, *args, **kwargs
+        cls,
+        puzzle: SudokuGrid,
+        time_limit: float,
+        *args,
+        presolve: bool = False,
+        stats: SolverStats | None = None,
+        **kwargs,
     ) -> SudokuGrid | None:
         """
         Solves the given sudoku puzzle within a specified time limit using
@@ -89,7 +115,7 @@ class SudokuSolver(ABC):
         Raises
         -------
         timeout_error: TimeoutError
-            when the available time runs out
+            when the available time runs out or the run is cancelled
 
         Parameters
         -----------
@@ -99,7 +125,42 @@ class SudokuSolver(ABC):
             amount of time (in seconds) available to the solver
         *args: Any
             extra arguments passed to the solver constructor
+        presolve: bool
+            whether to fill the naked and hidden singles before the search,
+            the time spent there counts towards the time limit
+        stats: SolverStats | None
+            counters the run is added to (even if it times out),
+            the time not reported by the engine as encoding, decoding
+            or spawning counts as solving; `None` skips the measurements
         **kwargs: Any
             extra named arguments passed to the solver constructor
         """
-        return cls(puzzle, time_limit, *args, **kwargs).run_algorithm()
+        if presolve:
+            start = timer()
+            reduced = propagate_singles(puzzle)
+            if stats is not None:
+                stats.presolve_time += timer() - start
+                stats.report("presolve_time", "propagations")
+            if reduced is None:
+                return None
+            if stats is not None:
+                filled = (reduced.cells() != 0).sum() - (puzzle.cells() != 0).sum()
+                stats.propagations += int(filled)
+            if reduced.cells().all():
+                return reduced
+            puzzle = reduced
+            time_limit -= timer() - start
+            if time_limit <= 0:
+                raise TimeoutError()
+
+        solver = cls(puzzle, time_limit, *args, **kwargs)
+        if stats is None:
+            return solver.run_algorithm()
+
+        start = timer()
+        try:
+            return solver.run_algorithm()
+        finally:
+            solver.stats.solve_time = timer() - start - solver.stats.overhead_time
+            solver.stats.report("solve_time", *solver.REPORTED_STATS)
+            stats.add(solver.stats)
@@ -1,37 +1,121 @@
 from enum import StrEnum, auto
 
-from src.solvers.sat_solver import SatSudokuSolver
+from src.solvers.sat_solver import SatEncoding, SatSudokuSolver
+from src.solvers.incremental_sat_solver import IncrementalSatSudokuSolver
 from src.model.grid import SudokuGrid
-from src.solvers.first_fail_solver import FirstFailSudokuSolver
+from src.solvers.solver import SudokuSolver
+from src.solvers.stats import SolverStats
+from src.solvers.first_fail_solver import (
+    BitmaskFirstFailSudokuSolver,
+    FirstFailSudokuSolver,
+    IncrementalFirstFailSudokuSolver,
+)
 from src.solvers.naive_solver import NaiveSudokuSolver
 from src.solvers.dancing_links_solver import DancingLinksSudokuSolver
+from src.solvers.algorithm_x_solver import AlgorithmXSudokuSolver
+from src.solvers.portfolio import default_engines, get_portfolio
 
 
 class SudokuSolverType(StrEnum):
     """
     Type representing various solver types.
 
+    Properties:
+    -----------
+    solver_class: type[SudokuSolver]
+        a solver class corresponding to the enum value
+
     Methods:
     --------
-    solve(self, puzzle: SudokuGrid, time_limit: float) -> SudokuGrid:
+    solve(self, puzzle: SudokuGrid, time_limit: float, presolve: bool,
+          encoding: SatEncoding, stats: SolverStats | None) -> SudokuGrid:
         solves the given puzzle with a time limit
-        uses a solver corresponding to the enum value
+        uses a solver corresponding to the enum value,
+        optionally filling the naked and hidden singles first,
+        `encoding` is used only by the SAT solver,
+        the counters of the run are added to `stats` if given
+    solve_by_engine(self, puzzle: SudokuGrid, time_limit: float, presolve: bool,
+                    encoding: SatEncoding, engines: list[SudokuSolverType] | None,
+                    stats: SolverStats | None)
+                    -> tuple[SudokuGrid | None, SudokuSolverType]:
+        solves the given puzzle and tells which engine answered,
+        which matters only for `PORTFOLIO`
+
+    `SAT_INCREMENTAL` reuses warm SAT solvers, one per grid size,
+    see `SatSolverPool`.
+    `PORTFOLIO` races several engines in separate processes
+    and takes the first answer, see `Portfolio`.
+    The engines are taken from `SUDOKU_PORTFOLIO` unless given.
     """
 
     NAIVE = auto()
     FIRST_FAIL = auto()
+    FIRST_FAIL_BITMASK = auto()
+    FIRST_FAIL_INCREMENTAL = auto()
     DANCING_LINKS = auto()
+    ALGORITHM_X = auto()
     SAT = auto()
+    SAT_INCREMENTAL = auto()
+    PORTFOLIO = auto()
 
-    def solve(self, puzzle: SudokuGrid, time_limit: float) -> SudokuGrid | None:
+    @property
+    def solver_class(self) -> type[SudokuSolver]:
         match self:
             case SudokuSolverType.NAIVE:
-                return NaiveSudokuSolver.solve(puzzle, time_limit)
+                return NaiveSudokuSolver
             case SudokuSolverType.FIRST_FAIL:
-                return FirstFailSudokuSolver.solve(puzzle, time_limit)
+                return FirstFailSudokuSolver
+            case SudokuSolverType.FIRST_FAIL_BITMASK:
+                return BitmaskFirstFailSudokuSolver
+            case SudokuSolverType.FIRST_FAIL_INCREMENTAL:
+                return IncrementalFirstFailSudokuSolver
             case SudokuSolverType.DANCING_LINKS:
-                return DancingLinksSudokuSolver.solve(puzzle, time_limit)
+                return DancingLinksSudokuSolver
+            case SudokuSolverType.ALGORITHM_X:
+                return AlgorithmXSudokuSolver
             case SudokuSolverType.SAT:
-                return SatSudokuSolver.solve(puzzle, time_limit)
+                return SatSudokuSolver
+            case SudokuSolverType.SAT_INCREMENTAL:
+                return IncrementalSatSudokuSolver
             case _:
                 raise NotImplementedError()
+
+    def solve(
+        self,
+        puzzle: SudokuGrid,
+        time_limit: float,
+        presolve: bool = False,
+        encoding: SatEncoding = SatEncoding(),
+        stats: SolverStats | None = None,
+    ) -> SudokuGrid | None:
+        match self:
+            case SudokuSolverType.SAT | SudokuSolverType.SAT_INCREMENTAL:
+                return self.solver_class.solve(
+                    puzzle, time_limit, encoding, presolve=presolve, stats=stats
+                )
+            case SudokuSolverType.PORTFOLIO:
+                solution, _ = self.solve_by_engine(
+                    puzzle, time_limit, presolve, encoding, stats=stats
+                )
+                return solution
+            case _:
+                return self.solver_class.solve(
+                    puzzle, time_limit, presolve=presolve, stats=stats
+                )
+
+    def solve_by_engine(
+        self,
+        puzzle: SudokuGrid,
+        time_limit: float,
+        presolve: bool = False,
+        encoding: SatEncoding = SatEncoding(),
+        engines: list["SudokuSolverType"] | None = None,
+        stats: SolverStats | None = None,
+    ) -> tuple[SudokuGrid | None, "SudokuSolverType"]:
+        if self is not SudokuSolverType.PORTFOLIO:
+            return self.solve(puzzle, time_limit, presolve, encoding, stats), self
+        if engines is None:
+            engines = [SudokuSolverType(name) for name in default_engines()]
+        return get_portfolio().race(
+            puzzle, time_limit, engines, presolve, encoding, stats
+        )
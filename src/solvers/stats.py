@@ -0,0 +1,141 @@
+import os
+from dataclasses import dataclass, field, fields
+
+STATS_VARIABLE = "SUDOKU_STATS"
+
+
+@dataclass(slots=True)
+class SolverStats:
+    """
+    Counters of a single solver run, filled in by the engine.
+    A counter the engine doesn't keep stays `0` and is left out of `reported`,
+    so it can be told apart from one that had nothing to count.
+
+    Attributes:
+    -----------
+    nodes: int
+        search nodes visited (decisions of the SAT solver)
+    backtracks: int
+        assignments undone after a dead end (conflicts of the SAT solver)
+    propagations: int
+        values inferred instead of guessed, by the presolve
+        or by the unit propagation of the SAT solver
+    clauses: int
+        clauses of the SAT encoding
+    variables: int
+        variables of the SAT encoding, the auxiliary ones included
+    presolve_time: float
+        time (in seconds) spent filling in the forced values before the search
+    encode_time: float
+        time (in seconds) spent building the engine's representation
+    solve_time: float
+        time (in seconds) spent searching
+    decode_time: float
+        time (in seconds) spent translating the answer back to a grid
+    spawn_time: float
+        time (in seconds) spent starting the processes (or loading
+        the library) of an external engine
+    reported: set[str]
+        names of the counters kept by the engines of the run
+
+    Properties:
+    -----------
+    overhead_time: float
+        time (in seconds) spent on anything but the search itself
+
+    Methods:
+    --------
+    add(self, other: SolverStats) -> None:
+        adds the counters of another run
+    report(self, *names: str) -> None:
+        marks the counters as kept
+    items(self) -> list[tuple[str, float]]:
+        names and values of all the counters
+    reported_items(self) -> list[tuple[str, float]]:
+        names and values of the kept counters
+    """
+
+    nodes: int = 0
+    backtracks: int = 0
+    propagations: int = 0
+    clauses: int = 0
+    variables: int = 0
+    presolve_time: float = 0.0
+    encode_time: float = 0.0
+    solve_time: float = 0.0
+    decode_time: float = 0.0
+    spawn_time: float = 0.0
+    reported: set[str] = field(default_factory=set)
+
+    def add(self, other: "SolverStats") -> None:
+        """
+        Adds the counters of another run, e.g. of an engine
+        run on behalf of the portfolio.
+
+        Parameters
+        -----------
+        other: SolverStats
+            counters to be added
+        """
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.reported |= other.reported
+
+    def report(self, *names: str) -> None:
+        """
+        Marks the counters as kept by the engine, even if they stay `0`.
+
+        Parameters
+        -----------
+        *names: str
+            names of the counters
+        """
+        self.reported.update(names)
+
+    def items(self) -> list[tuple[str, float]]:
+        """
+        Returns the names and the values of all the counters.
+
+        Returns
+        --------
+        items: list[tuple[str, float]]
+            e.g. `[("nodes", 120), ("backtracks", 3), ...]`
+        """
+        return [(name, getattr(self, name)) for name in COUNTERS]
+
+    def reported_items(self) -> list[tuple[str, float]]:
+        """
+        Returns the names and the values of the counters kept by the engines.
+
+        Returns
+        --------
+        items: list[tuple[str, float]]
+            e.g. `[("nodes", 120), ("backtracks", 0), ...]`
+        """
+        return [
+            (name, getattr(self, name)) for name in COUNTERS if name in self.reported
+        ]
+
+    @property
+    def overhead_time(self) -> float:
+        """time (in seconds) spent on anything but the search itself"""
+        return self.encode_time + self.decode_time + self.spawn_time
+
+
+COUNTERS = tuple(
+    counter.name for counter in fields(SolverStats) if counter.name != "reported"
+)
+"""names of the counters of `SolverStats`"""
+
+
+def stats_enabled() -> bool:
+    """
+    Checks whether the solver runs of the service are instrumented.
+
+    Returns
+    --------
+    enabled: bool
+        `False` if the `SUDOKU_STATS` environment variable is `0`,
+        `True` otherwise
+    """
+    return os.environ.get(STATS_VARIABLE, "1").strip() != "0"
@@ -20,13 +20,37 @@ def all_different_except(array: npt.ArrayLike, excluded: set) -> bool:
         `False` otherwise
     """
     uniq = np.unique_counts(array)
-    for i in range(len(uniq.values)):
-        if uniq.values[i] not in excluded:
-            if uniq.counts[i] != 1:
-                return False
-    return True
-    # TODO:
-    # Implement the function as described in the docstring
-    # tip. `np.unique_counts` may be useful, but feel free to improvise
-    #      https://numpy.org/devdocs/reference/generated/numpy.unique_counts.html
-    # raise NotImplementedError("not implemented yet")
+    checked = ~np.isin(uniq.values, list(excluded))
+    return bool((uniq.counts[checked] == 1).all())
+
+
+def repeated_in_groups(
+    values: npt.NDArray, groups: npt.NDArray, n_groups: int, n_values: int
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """
+    Finds the values repeated within groups, all the groups at once.
+    Every value is paired with its group as `group * n_values + value`,
+    so a single `np.bincount` counts each value in each group.
+
+    Parameters
+    ----------
+    values: npt.NDArray
+        non-negative integers lower than `n_values`
+    groups: npt.NDArray
+        group of every value, broadcastable with `values`,
+        an element may belong to several groups along a leading axis
+    n_groups: int
+        number of the groups
+    n_values: int
+        upper bound of the values
+
+    Returns
+    -------
+    groups: npt.NDArray[np.intp]
+        the groups with a repeated value, in increasing order
+    values: npt.NDArray[np.intp]
+        the value repeated in the corresponding group
+    """
+    keys = groups.astype(np.intp) * n_values + values
+    counts = np.bincount(keys.ravel(), minlength=n_groups * n_values)
+    return np.divmod(np.flatnonzero(counts > 1), n_values)
@@ -0,0 +1,201 @@
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from enum import StrEnum
+from timeit import default_timer as timer
+from types import FrameType
+
+COLLAPSED_SUFFIXES = (".folded", ".collapsed")
+SAMPLING_INTERVAL = 0.001
+"""how often (in seconds) the stack is sampled for the collapsed stacks"""
+
+
+class ProfileFormat(StrEnum):
+    """
+    Formats of a profile:
+    - `PSTATS` - the `cProfile` statistics, e.g. for `snakeviz`, `gprof2dot`
+      or `python -m pstats`
+    - `COLLAPSED` - the sampled stacks, one `frame;frame;... microseconds`
+      per line, e.g. for `flamegraph.pl`, `inferno` or speedscope
+    """
+
+    PSTATS = "pstats"
+    COLLAPSED = "collapsed"
+
+    @staticmethod
+    def from_path(path: str | os.PathLike) -> "ProfileFormat":
+        """
+        Picks the format by the suffix of the file,
+        `.folded` and `.collapsed` are the collapsed stacks.
+
+        Parameters
+        -----------
+        path: str | os.PathLike
+            path of the profile
+
+        Returns
+        --------
+        profile_format: ProfileFormat
+            the format of the profile
+        """
+        if os.fspath(path).endswith(COLLAPSED_SUFFIXES):
+            return ProfileFormat.COLLAPSED
+        return ProfileFormat.PSTATS
+
+    @property
+    def suffix(self) -> str:
+        """the usual suffix of a file with the profile"""
+        return ".pstats" if self == ProfileFormat.PSTATS else ".folded"
+
+
+class StackSampler:
+    """
+    A sampling profiler of a single thread. A background thread looks
+    at the stack of the profiled one every `interval` and attributes
+    the time since the previous sample to the stack it sees.
+    Unlike `cProfile` it barely slows the profiled code down,
+    and it records the whole stacks, as the flame graphs need.
+
+    The sampler needs the GIL, so the switch interval of the interpreter
+    is shortened to `interval` while sampling. A long call of a C extension
+    holding the GIL (e.g. the SAT solver) is still sampled once it returns,
+    as a single sample with all of its time.
+
+    Attributes:
+    -----------
+    thread_id: int
+        identifier of the profiled thread
+    interval: float
+        time (in seconds) between the samples
+    stacks: Counter[str]
+        time (in microseconds) of every collapsed stack
+
+    Methods:
+    --------
+    start(self) -> None:
+        starts sampling
+    stop(self) -> None:
+        stops sampling
+    write(self, path: str | os.PathLike) -> None:
+        writes the collapsed stacks
+    """
+
+    thread_id: int
+    interval: float
+    stacks: Counter[str]
+    _stopped: threading.Event
+    _sampler: threading.Thread | None
+    _switch_interval: float
+
+    def __init__(self, thread_id: int, interval: float = SAMPLING_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._sampler = None
+        self._switch_interval = sys.getswitchinterval()
+
+    def start(self) -> None:
+        """
+        Starts sampling in a daemon thread.
+        """
+        self._stopped.clear()
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.interval, self._switch_interval))
+        self._sampler = threading.Thread(
+            target=self._sample, name="stack-sampler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling, the last sample is taken first.
+        """
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        sys.setswitchinterval(self._switch_interval)
+
+    def _sample(self) -> None:
+        last = timer()
+        while True:
+            stopped = self._stopped.wait(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            now = timer()
+            if frame is not None:
+                self.stacks[_collapse(frame)] += round(1e6 * (now - last))
+            last = now
+            if stopped:
+                return
+
+    def write(self, path: str | os.PathLike) -> None:
+        """
+        Writes the collapsed stacks, the root frame first.
+
+        Parameters
+        -----------
+        path: str | os.PathLike
+            path of the file
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, micros in sorted(self.stacks.items()):
+                if micros > 0:
+                    f.write(f"{stack} {micros}\n")
+
+
+def _collapse(frame: FrameType | None) -> str:
+    """
+    Joins the frames of a stack with `;`, the root first.
+    A frame is named `function (file:line)` after the start of the function.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        names.append(f"{code.co_qualname} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+@contextmanager
+def profiling(
+    path: str | os.PathLike, profile_format: ProfileFormat | None = None
+) -> Iterator[None]:
+    """
+    Profiles the block in the current thread and writes the profile
+    when it ends, even if it raises. Other threads and processes,
+    e.g. the portfolio's engines or the Dancing Links workers, are not profiled.
+
+    Parameters
+    -----------
+    path: str | os.PathLike
+        path of the profile
+    profile_format: ProfileFormat | None
+        format of the profile, picked by the suffix of `path` if `None`,
+        see `ProfileFormat.from_path`
+    """
+    if profile_format is None:
+        profile_format = ProfileFormat.from_path(path)
+
+    if profile_format == ProfileFormat.PSTATS:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+        return
+
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        sampler.write(path)